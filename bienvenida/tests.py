@@ -1,3 +1,249 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import time
+from unittest.mock import Mock, patch
 
-# Create your tests here.
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, OperationalError, connection
+from django.test import TestCase, Client, override_settings
+
+from catalogo import respaldo
+from catalogo.cache import get_cache
+from catalogo.checks import cache_catalogo_compartida
+from catalogo.models import Producto
+from miwebsite.db import Circuito, CircuitoAbierto, circuito_db
+
+
+# Sin collectstatic no hay manifest: usar el storage simple en las pruebas
+STORAGES_TEST = {
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+@override_settings(STORAGES=STORAGES_TEST)
+class IndexGridCacheTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = Client()
+        Producto.objects.create(titulo='Gundam', descripcion='d', foto='productos/a.webp')
+
+    def test_segunda_visita_no_consulta_la_base(self):
+        resp = self.client.get('/')
+        assert resp.status_code == 200
+        assert 'Gundam' in resp.content.decode()
+
+        with self.assertNumQueries(0):
+            resp = self.client.get('/')
+        assert 'Gundam' in resp.content.decode()
+
+    def test_guardar_producto_invalida_la_grilla(self):
+        self.client.get('/')
+        Producto.objects.create(titulo='Zaku', descripcion='d', foto='productos/b.webp')
+
+        resp = self.client.get('/')
+        assert 'Zaku' in resp.content.decode()
+
+
+@override_settings(STORAGES=STORAGES_TEST)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = Client()
+        Producto.objects.create(titulo='Gundam', descripcion='d', foto='productos/a.webp')
+
+    def test_home_y_api_responden_304_hasta_que_cambia_el_catalogo(self):
+        for url in ('/', '/api/productos/'):
+            etag = self.client.get(url)['ETag']
+            with self.assertNumQueries(0):
+                resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            assert resp.status_code == 304
+
+        Producto.objects.create(titulo='Zaku', descripcion='d', foto='productos/b.webp')
+        resp = self.client.get('/api/productos/', HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 200
+
+    def test_un_deploy_nuevo_invalida_el_etag(self):
+        etag = self.client.get('/')['ETag']
+        with override_settings(VERSION_DEPLOY='otro-deploy'):
+            resp = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 200 and resp['ETag'] != etag
+
+    def test_avisa_cache_local_con_varios_workers(self):
+        assert cache_catalogo_compartida(None) == []
+        with override_settings(WEB_CONCURRENCY=4):
+            assert [w.id for w in cache_catalogo_compartida(None)] == ['catalogo.W001']
+
+    def test_base_caida_no_deja_validador(self):
+        with patch('catalogo.models.Producto.objects.filter') as mock_filter:
+            mock_filter.side_effect = DatabaseError('DB down')
+            resp = self.client.get('/api/productos/')
+        assert 'ETag' not in resp
+        assert 'no-store' in resp['Cache-Control']
+
+
+MEDIA_TMP = tempfile.mkdtemp(prefix='media-tests-')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TMP, MEDIA_X_ACCEL_PREFIX='')
+class MediaTests(TestCase):
+    CONTENIDO = bytes(range(256)) * 40  # 10240 bytes
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_TMP, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = Client()
+        os.makedirs(os.path.join(MEDIA_TMP, 'productos'), exist_ok=True)
+        self.hash = 'productos/' + 'a' * 40 + '.webp'
+        self.legacy = 'productos/figura_imagen.jpg'
+        for nombre in (self.hash, self.legacy):
+            with open(os.path.join(MEDIA_TMP, nombre), 'wb') as f:
+                f.write(self.CONTENIDO)
+
+    def test_archivo_completo_con_validadores(self):
+        resp = self.client.get('/media/' + self.hash)
+        assert resp.status_code == 200
+        assert b''.join(resp.streaming_content) == self.CONTENIDO
+        assert resp['Content-Type'] == 'image/webp'
+        assert resp['Content-Length'] == str(len(self.CONTENIDO))
+        assert resp['Accept-Ranges'] == 'bytes'
+        assert 'immutable' in resp['Cache-Control']
+        assert resp['ETag'].startswith('"') and not resp['ETag'].startswith('W/')
+
+        resp = self.client.get('/media/' + self.legacy)
+        assert 'no-cache' in resp['Cache-Control']
+        assert 'immutable' not in resp['Cache-Control']
+
+    def test_304_con_etag(self):
+        etag = self.client.get('/media/' + self.hash)['ETag']
+        resp = self.client.get('/media/' + self.hash, HTTP_IF_NONE_MATCH=etag)
+        assert resp.status_code == 304
+        assert resp['ETag'] == etag
+        assert 'immutable' in resp['Cache-Control']
+
+    def test_rangos(self):
+        url = '/media/' + self.hash
+        resp = self.client.get(url, HTTP_RANGE='bytes=100-199')
+        assert resp.status_code == 206
+        assert resp['Content-Range'] == f'bytes 100-199/{len(self.CONTENIDO)}'
+        assert resp['Content-Length'] == '100'
+        assert b''.join(resp.streaming_content) == self.CONTENIDO[100:200]
+
+        resp = self.client.get(url, HTTP_RANGE='bytes=-10')
+        assert b''.join(resp.streaming_content) == self.CONTENIDO[-10:]
+
+        resp = self.client.get(url, HTTP_RANGE='bytes=20000-')
+        assert resp.status_code == 416
+        assert resp['Content-Range'] == f'bytes */{len(self.CONTENIDO)}'
+
+        # If-Range con otro validador: el archivo cambió, va entero
+        resp = self.client.get(url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"otro"')
+        assert resp.status_code == 200
+
+    def test_rutas_fuera_de_media_y_metodos(self):
+        assert self.client.get('/media/../manage.py').status_code == 404
+        assert self.client.get('/media/%2e%2e/manage.py').status_code == 404
+        assert self.client.get('/media/productos/').status_code == 404
+        assert self.client.get('/media/productos/no-existe.webp').status_code == 404
+
+        # Subidas en cola de procesamiento: nunca se sirven
+        os.makedirs(os.path.join(MEDIA_TMP, 'productos', 'originales'), exist_ok=True)
+        with open(os.path.join(MEDIA_TMP, 'productos', 'originales', 'x.png'), 'wb') as f:
+            f.write(self.CONTENIDO)
+        assert self.client.get('/media/productos/originales/x.png').status_code == 404
+        assert self.client.get('/media/productos/../productos/originales/x.png').status_code == 404
+        assert self.client.post('/media/' + self.hash).status_code == 405
+
+    @override_settings(MEDIA_X_ACCEL_PREFIX='/_media_interno/')
+    def test_x_accel_redirect(self):
+        resp = self.client.get('/media/' + self.hash)
+        assert resp.status_code == 200
+        assert resp['X-Accel-Redirect'] == '/_media_interno/' + self.hash
+        assert resp.content == b''
+        assert resp['Content-Type'] == 'image/webp'
+
+
+class ConexionesTests(TestCase):
+    def test_conexion_persistente_con_timeouts(self):
+        ajustes = connection.settings_dict
+        assert ajustes['CONN_MAX_AGE'] == (0 if settings.DB_POOL else settings.DB_CONN_MAX_AGE)
+        if connection.vendor != 'postgresql':
+            self.skipTest("timeouts sólo en PostgreSQL")
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT EXTRACT(epoch FROM current_setting('statement_timeout')::interval) * 1000")
+            assert cursor.fetchone()[0] == settings.DB_STATEMENT_TIMEOUT
+
+
+@override_settings(STORAGES=STORAGES_TEST, CATALOGO_RESPALDO_ARCHIVO='')
+class CircuitoRespaldoTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        respaldo.descartar()
+        self.client = Client()
+        Producto.objects.create(titulo='Gundam', descripcion='d', foto='productos/a.webp')
+
+    def tearDown(self):
+        if circuito_db.abierto:
+            with self.assertLogs('miwebsite.db', 'WARNING'):
+                circuito_db.cerrar()
+
+    def caida(self):
+        return patch('catalogo.models.Producto.objects.filter', side_effect=OperationalError('timeout'))
+
+    def test_circuito_abre_tras_el_umbral_y_la_sonda_lo_cierra(self):
+        sonda = Mock(side_effect=[OperationalError('sigue caída'), None])
+        circuito = Circuito(sonda, umbral=2, intervalo=0.01)
+        with self.assertLogs('miwebsite.db', 'INFO'):
+            for _ in range(2):
+                with self.assertRaises(OperationalError), circuito.proteger():
+                    raise OperationalError('timeout')
+            assert circuito.abierto
+
+            ejecutado = Mock()
+            with self.assertRaises(CircuitoAbierto), circuito.proteger():
+                ejecutado()
+            ejecutado.assert_not_called()
+
+            limite = time.monotonic() + 2
+            while circuito.abierto and time.monotonic() < limite:
+                time.sleep(0.01)
+            assert not circuito.abierto
+        assert sonda.call_count == 2
+
+    def test_errores_de_datos_no_abren_el_circuito(self):
+        circuito = Circuito(Mock(), umbral=1)
+        with self.assertRaises(IntegrityError), circuito.proteger():
+            raise IntegrityError('duplicado')
+        assert not circuito.abierto
+
+    def test_base_caida_sirve_el_ultimo_catalogo_bueno(self):
+        assert self.client.get('/api/productos/').json()['productos'][0]['titulo'] == 'Gundam'
+
+        with patch.object(circuito_db, 'sonda', side_effect=OperationalError('caída')), \
+                self.caida() as filtro, self.assertLogs('miwebsite.db', 'ERROR'):
+            for _ in range(circuito_db.umbral):
+                resp = self.client.get('/api/productos/?fields=id,titulo')
+                assert resp.json()['productos'][0]['titulo'] == 'Gundam'
+                assert 'X-Catalogo-Respaldo' in resp
+                assert 'no-store' in resp['Cache-Control']
+            assert circuito_db.abierto
+            llamadas = filtro.call_count
+
+            # Abierto: ni se intenta la consulta
+            with self.assertNumQueries(0):
+                resp = self.client.get('/api/productos/?limit=1')
+                home = self.client.get('/')
+            assert filtro.call_count == llamadas
+            assert resp.json()['productos'][0]['titulo'] == 'Gundam'
+            assert 'Gundam' in home.content.decode()
+            assert 'no-store' in home['Cache-Control']
+
+    def test_sin_respaldo_la_lista_queda_vacia(self):
+        with self.caida():
+            resp = self.client.get('/api/productos/')
+        assert resp.json() == {'productos': []}
+        assert 'X-Catalogo-Respaldo' not in resp
@@ -1,10 +1,14 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, views_async
+
+# Perfil ASGI: api_productos en su variante async (ver miwebsite/asgi.py)
+api = views_async if settings.VISTAS_ASYNC else views
 
 app_name = 'bienvenida'
 
 urlpatterns = [
     path('', views.index, name='index'),
-    path('api/productos/', views.api_productos, name='api_productos'),
+    path('api/productos/', api.api_productos, name='api_productos'),
     path('debug/product-photos/', views.debug_product_photos, name='debug_product_photos'),
 ]
\ No newline at end of file
@@ -1,101 +1,329 @@
 from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+from django.utils.safestring import mark_safe
 from django.core.paginator import Paginator
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.db import DatabaseError
+from django.db.models import Q
 
+from catalogo import respaldo
 from catalogo.models import Producto
+from catalogo.cache import get_cache, version_catalogo
+from catalogo.paginacion import CursorInvalido, format_cursor, parse_cursor, parse_limit
+from miwebsite.db import circuito_db
+from miwebsite.http_utils import etag_condicional
 from django.conf import settings
 from django.core.files.storage import default_storage
+from datetime import datetime
+import json
 import os
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def etag_catalogo(request, *args, **kwargs):
+    """
+    Validador de todo lo derivado del listado de productos: la generación
+    del catálogo y el deploy (cambian templates, estáticos o serialización).
+    """
+    return f"catalogo-{settings.VERSION_DEPLOY}-{version_catalogo()}"
+
+
+@etag_condicional(etag_catalogo)
 def index(request):
     """
     Vista para mostrar la página de bienvenida usando los modelos de Django.
 
+    La grilla de productos se renderiza aparte y se cachea por página,
+    versionada con la generación del catálogo (ver
+    catalogo.cache.version_catalogo), así que una visita no hace consultas
+    hasta que un Producto cambia. La misma versión es el ETag de la página:
+    un navegador que ya la tiene recibe 304 sin renderizar nada.
+
     Si la base de datos local no está disponible (por ejemplo, PC apagada),
-    capturamos DatabaseError y devolvemos una lista vacía junto con
-    un flag `db_unavailable` para que el front-end muestre el mensaje
-    y pueda intentar reintentos en segundo plano.
+    capturamos DatabaseError y mostramos el último catálogo bueno o, si no
+    hay, el catálogo vacío (sin cachearlo). Con el circuito abierto
+    (miwebsite.db.circuito_db) ni se intenta la consulta.
     """
-    productos = []
-
     try:
-        productos_list = Producto.objects.filter(activo=True).order_by('orden', '-fecha_creacion')
-
-        if productos_list.exists():
-            paginator = Paginator(productos_list, 20)
-            page_number = request.GET.get('page', 1)
-            productos = paginator.get_page(page_number)
-
-            # Añadir foto_url absoluto a cada producto para evitar llamadas a
-            # métodos desde la plantilla (request.build_absolute_uri no es
-            # invocable desde templates). Esto facilita mostrar imágenes
-            # con URLs absolutas en el modal y en las miniaturas.
-            for p in productos:
-                # Priorizar un atributo externo `foto_url` si existe (ej. CDN)
-                if getattr(p, 'foto_url', None):
-                    # si ya es absoluto, dejarlo
-                    if str(p.foto_url).startswith('http'):
-                        p.foto_url = str(p.foto_url)
-                    else:
-                        p.foto_url = request.build_absolute_uri(str(p.foto_url))
-                elif p.foto:
-                    try:
-                        p.foto_url = request.build_absolute_uri(p.foto.url)
-                    except Exception:
-                        p.foto_url = None
-
-            # Debug: si estamos en modo DEBUG, loguear información útil sobre
-            # las primeras entradas para facilitar diagnóstico de imágenes
-            if settings.DEBUG:
-                for p in list(productos)[:5]:
-                    foto_name = getattr(p, 'foto', None) and getattr(p.foto, 'name', None)
-                    foto_url = getattr(p, 'foto_url', None)
-                    # Comprobar existencia usando el storage por defecto (MinIO/S3)
-                    exists = False
-                    if foto_name:
-                        try:
-                            exists = default_storage.exists(foto_name)
-                        except Exception:
-                            exists = False
-                    logger.debug('Producto %s: foto_name=%s, foto_url=%s, stored_exists=%s',
-                                 p.id, foto_name, foto_url, exists)
+        page_number = max(1, int(request.GET.get('page', 1)))
+    except (TypeError, ValueError):
+        page_number = 1
 
-    except DatabaseError:
-        # Silently treat DB errors as "no products" to the user
-        productos = []
+    cache = get_cache()
+    clave = 'grid:{}:{}:{}:{}'.format(
+        settings.VERSION_DEPLOY, version_catalogo(), request.build_absolute_uri('/'), page_number
+    )
+    productos_html = cache.get(clave)
+    disponible = True
+
+    if productos_html is None:
+        productos_html, disponible = render_grid_productos(request, page_number)
+        if disponible:
+            cache.set(clave, productos_html)
 
     context = {
-        'productos': productos,
+        'productos_html': mark_safe(productos_html),
         'usando_supabase': False,
     }
 
-    return render(request, 'bienvenida/index.html', context)
+    response = render(request, 'bienvenida/index.html', context)
+    if not disponible:
+        # Catálogo de respaldo o vacío por base caída: que no quede cacheado ni validado
+        patch_cache_control(response, no_store=True)
+    return response
+
+
+def render_grid_productos(request, page_number):
+    """
+    Renderiza el fragmento de la grilla de productos para una página.
+    Retorna (html, disponible); disponible=False si la base no respondió
+    (o el circuito está abierto): en ese caso la grilla sale del último
+    catálogo bueno (catalogo.respaldo), si lo hay.
+    """
+    productos = []
+    disponible = True
+
+    try:
+        with circuito_db.proteger():
+            productos_list = Producto.activos()
+
+            if productos_list.exists():
+                paginator = Paginator(productos_list, 20)
+                productos = paginator.get_page(page_number)
+                agregar_foto_url(request, productos)
 
+                # Debug: si estamos en modo DEBUG, loguear información útil sobre
+                # las primeras entradas para facilitar diagnóstico de imágenes
+                if settings.DEBUG:
+                    for p in list(productos)[:5]:
+                        foto_name = getattr(p, 'foto', None) and getattr(p.foto, 'name', None)
+                        foto_url = getattr(p, 'foto_url', None)
+                        # Comprobar existencia usando el storage por defecto (MinIO/S3)
+                        exists = False
+                        if foto_name:
+                            try:
+                                exists = default_storage.exists(foto_name)
+                            except Exception:
+                                exists = False
+                        logger.debug('Producto %s: foto_name=%s, foto_url=%s, stored_exists=%s',
+                                     p.id, foto_name, foto_url, exists)
 
+            respaldo.actualizar()
+
+    except DatabaseError:
+        # Base caída: último catálogo bueno o, si no hay, ningún producto
+        disponible = False
+        productos = respaldo.productos() or []
+        if productos:
+            productos = Paginator(productos, 20).get_page(page_number)
+            agregar_foto_url(request, productos)
+
+    html = render_to_string('bienvenida/_productos.html', {'productos': productos}, request)
+    return html, disponible
+
+
+def agregar_foto_url(request, productos):
+    """
+    Añadir foto_url absoluto a cada producto para evitar llamadas a
+    métodos desde la plantilla (request.build_absolute_uri no es
+    invocable desde templates). Esto facilita mostrar imágenes
+    con URLs absolutas en el modal y en las miniaturas.
+    """
+    for p in productos:
+        # Priorizar un atributo externo `foto_url` si existe (ej. CDN)
+        if getattr(p, 'foto_url', None):
+            # si ya es absoluto, dejarlo
+            if str(p.foto_url).startswith('http'):
+                p.foto_url = str(p.foto_url)
+            else:
+                p.foto_url = request.build_absolute_uri(str(p.foto_url))
+        elif p.foto:
+            try:
+                p.foto_url = request.build_absolute_uri(p.foto.url)
+            except Exception:
+                p.foto_url = None
+
+
+# Campos expuestos por api_productos (?fields=) y columnas que necesitan
+CAMPOS_API_PRODUCTOS = {
+    'id': (),
+    'titulo': ('titulo',),
+    'descripcion': ('descripcion',),
+    'foto': ('foto',),
+    'srcset': ('foto', 'variantes'),
+}
+PRODUCTOS_POR_PAGINA_MAX = 100
+EXPORT_CHUNK_SIZE = 500
+
+
+def serializar_producto(p, campos):
+    data = {}
+    for campo in campos:
+        if campo == 'foto':
+            data['foto'] = p.foto.url if p.foto else None
+        elif campo == 'srcset':
+            data['srcset'] = p.srcset
+        else:
+            data[campo] = getattr(p, campo)
+    return data
+
+
+@etag_condicional(etag_catalogo)
 def api_productos(request):
     """Endpoint JSON para obtener productos activos.
 
-    Devuelve 503 si la base de datos no está disponible.
+    Parámetros opcionales:
+    - fields=id,titulo,...: sólo esos campos (no lee de la base el resto,
+      p.ej. omitir `descripcion` evita traer el TextField).
+    - limit=N[&cursor=...]: paginación por cursor sobre
+      (orden, -fecha_creacion, -id); la respuesta trae `next`.
+    - formato=ndjson: exporta todo el catálogo como NDJSON en streaming,
+      leyendo en lotes con .iterator() (memoria constante).
+    Sin `limit` ni `formato` devuelve la lista completa, como siempre.
+
+    Responde 304 si el cliente ya tiene la versión actual del catálogo.
+    Si la base de datos no está disponible (o el circuito está abierto)
+    responde el último catálogo bueno con `X-Catalogo-Respaldo: <fecha>`,
+    o una lista vacía si no hay respaldo.
     """
     try:
-        productos_qs = Producto.objects.filter(activo=True).order_by('orden', '-fecha_creacion')
-        productos = []
-        for p in productos_qs:
-            productos.append({
-                'id': p.id,
-                'titulo': p.titulo,
-                'descripcion': p.descripcion,
-                'foto': p.foto_url if getattr(p, 'foto_url', None) else (p.foto.url if p.foto else None),
-            })
-        return JsonResponse({'productos': productos}, status=200)
+        campos, columnas = campos_pedidos(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    try:
+        with circuito_db.proteger():
+            productos_qs = Producto.activos(*columnas)
+
+            if request.GET.get('formato') == 'ndjson':
+                return StreamingHttpResponse(
+                    exportar_ndjson(productos_qs, campos),
+                    content_type='application/x-ndjson',
+                )
+
+            response = responder_productos(request, productos_qs, campos)
+            respaldo.actualizar()
+            return response
+    except DatabaseError:
+        return responder_respaldo(request, campos)
+
+
+def campos_pedidos(request):
+    """
+    (campos, columnas) de ?fields=: los campos a serializar, en orden, y
+    las columnas a leer. ValueError si hay campos desconocidos.
+    """
+    campos = [c for c in request.GET.get('fields', '').split(',') if c] or list(CAMPOS_API_PRODUCTOS)
+    invalidos = set(campos) - set(CAMPOS_API_PRODUCTOS)
+    if invalidos:
+        raise ValueError(f'Campos desconocidos: {", ".join(sorted(invalidos))}')
+
+    columnas = {'orden', 'fecha_creacion'}
+    for campo in campos:
+        columnas.update(CAMPOS_API_PRODUCTOS[campo])
+    return campos, columnas
+
+
+def responder_respaldo(request, campos):
+    """
+    Base caída o circuito abierto: el último catálogo bueno (sin cachear
+    ni validar); si no hay, lista vacía para que el frontend lo trate
+    como "no hay productos".
+    """
+    ultimo = respaldo.leer()
+    if ultimo is None:
+        response = JsonResponse({'productos': []}, status=200)
+    elif request.GET.get('formato') == 'ndjson':
+        response = StreamingHttpResponse(
+            (json.dumps(serializar_producto(p, campos), ensure_ascii=False) + '\n'
+             for p in respaldo.productos(ultimo)),
+            content_type='application/x-ndjson',
+        )
+    else:
+        response = responder_productos(request, respaldo.productos(ultimo), campos)
+    if ultimo is not None:
+        response['X-Catalogo-Respaldo'] = ultimo.fecha
+    patch_cache_control(response, no_store=True)
+    return response
+
+
+def responder_productos(request, productos, campos):
+    """
+    Lista completa o página por cursor (?limit=&cursor=) de `productos`:
+    un queryset de Producto.activos o la lista del respaldo, ya en orden
+    (orden, -fecha_creacion, -id).
+    """
+    try:
+        limit, cursor = paginacion_pedida(request)
+    except CursorInvalido:
+        return JsonResponse({'error': 'Cursor inválido.'}, status=400)
+    if limit is None:
+        return JsonResponse({'productos': [serializar_producto(p, campos) for p in productos]}, status=200)
+
+    if cursor:
+        productos = filtrar_desde_cursor(productos, cursor)
+    return pagina_productos(list(productos[:limit + 1]), limit, campos)
+
+
+def paginacion_pedida(request):
+    """
+    (limit, cursor) de ?limit=&cursor=; limit None si no se pagina y
+    cursor (orden, fecha_creacion, id) o None. CursorInvalido si no se
+    puede leer.
+    """
+    limit = request.GET.get('limit')
+    if not limit:
+        return None, None
+    limit = parse_limit(limit, PRODUCTOS_POR_PAGINA_MAX, PRODUCTOS_POR_PAGINA_MAX)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        cursor = parse_cursor(cursor, (int, datetime, int))
+    return limit, cursor or None
+
+
+def filtrar_desde_cursor(productos, cursor):
+    """Los productos que siguen a `cursor` (queryset o lista del respaldo)."""
+    orden, fecha, ultimo_id = cursor
+    if isinstance(productos, list):
+        return [
+            p for p in productos
+            if p.orden > orden
+            or (p.orden == orden and p.fecha_creacion < fecha)
+            or (p.orden == orden and p.fecha_creacion == fecha and p.id < ultimo_id)
+        ]
+    # orden >= o acota el rango; el resto desempata dentro del mismo orden
+    return productos.filter(orden__gte=orden).filter(
+        Q(orden__gt=orden)
+        | Q(fecha_creacion__lt=fecha)
+        | Q(fecha_creacion=fecha, id__lt=ultimo_id)
+    )
+
+
+def pagina_productos(filas, limit, campos):
+    """Respuesta paginada a partir de hasta `limit` + 1 filas leídas."""
+    siguiente = None
+    if len(filas) > limit:
+        filas = filas[:limit]
+        ultimo = filas[-1]
+        siguiente = format_cursor(ultimo.orden, ultimo.fecha_creacion, ultimo.id)
+
+    return JsonResponse({
+        'productos': [serializar_producto(p, campos) for p in filas],
+        'next': siguiente,
+    }, status=200)
+
+
+def exportar_ndjson(productos_qs, campos):
+    """Genera una línea JSON por producto, leyendo de a EXPORT_CHUNK_SIZE."""
+    try:
+        for p in productos_qs.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield json.dumps(serializar_producto(p, campos), ensure_ascii=False) + '\n'
     except DatabaseError:
-        # If DB is down, return empty list so frontend treats it as "no products"
-        return JsonResponse({'productos': []}, status=200)
+        # Los headers ya salieron: cortar el stream y dejarlo en el log
+        logger.exception('Exportación NDJSON interrumpida por error de base de datos')
 
 
 def debug_product_photos(request):
@@ -107,7 +335,7 @@ def debug_product_photos(request):
     if not settings.DEBUG:
         return JsonResponse({'error': 'disabled'}, status=403)
 
-    productos_qs = Producto.objects.filter(activo=True).order_by('orden', '-fecha_creacion')[:20]
+    productos_qs = Producto.activos('titulo', 'foto')[:20]
     out = []
     for p in productos_qs:
         foto_name = getattr(p.foto, 'name', None) if getattr(p, 'foto', None) else None
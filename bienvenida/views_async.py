@@ -0,0 +1,85 @@
+"""
+Variante async (ASGI) de api_productos.
+
+Mismo contrato que bienvenida.views.api_productos; bienvenida.urls la
+enruta en su lugar con settings.VISTAS_ASYNC (ver miwebsite/asgi.py).
+El 304 por ETag sale de la caché sin ocupar un hilo; el listado se lee
+con el ORM async y la exportación NDJSON con aiterator, así que un
+cliente lento no retiene un hilo del servidor mientras descarga.
+"""
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError
+from django.http import JsonResponse, StreamingHttpResponse
+
+from catalogo import respaldo
+from catalogo.cache import asincrono
+from catalogo.models import Producto
+from catalogo.paginacion import CursorInvalido
+from miwebsite.db import circuito_db
+from miwebsite.http_utils import etag_condicional
+from .views import (
+    EXPORT_CHUNK_SIZE,
+    campos_pedidos,
+    etag_catalogo,
+    filtrar_desde_cursor,
+    pagina_productos,
+    paginacion_pedida,
+    responder_respaldo,
+    serializar_producto,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@etag_condicional(asincrono(etag_catalogo))
+async def api_productos(request):
+    """Productos activos (ver views.api_productos: fields, limit/cursor, formato=ndjson)."""
+    try:
+        campos, columnas = campos_pedidos(request)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    try:
+        with circuito_db.proteger():
+            productos_qs = Producto.activos(*columnas)
+
+            if request.GET.get('formato') == 'ndjson':
+                return StreamingHttpResponse(
+                    exportar_ndjson(productos_qs, campos),
+                    content_type='application/x-ndjson',
+                )
+
+            response = await responder_productos(request, productos_qs, campos)
+            await sync_to_async(respaldo.actualizar)()
+            return response
+    except DatabaseError:
+        return responder_respaldo(request, campos)
+
+
+async def responder_productos(request, productos_qs, campos):
+    """Como views.responder_productos, leyendo el queryset con el ORM async."""
+    try:
+        limit, cursor = paginacion_pedida(request)
+    except CursorInvalido:
+        return JsonResponse({'error': 'Cursor inválido.'}, status=400)
+    if limit is None:
+        return JsonResponse(
+            {'productos': [serializar_producto(p, campos) async for p in productos_qs]}, status=200
+        )
+
+    if cursor:
+        productos_qs = filtrar_desde_cursor(productos_qs, cursor)
+    return pagina_productos([p async for p in productos_qs[:limit + 1]], limit, campos)
+
+
+async def exportar_ndjson(productos_qs, campos):
+    """Una línea JSON por producto, leyendo de a EXPORT_CHUNK_SIZE con aiterator."""
+    try:
+        async for p in productos_qs.aiterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield json.dumps(serializar_producto(p, campos), ensure_ascii=False) + '\n'
+    except DatabaseError:
+        # Los headers ya salieron: cortar el stream y dejarlo en el log
+        logger.exception('Exportación NDJSON interrumpida por error de base de datos')
@@ -3,12 +3,15 @@ from django.http import HttpResponseRedirect
 from django.urls import path, reverse
 from django.shortcuts import render
 from django.contrib import messages
-from django.core.files.storage import default_storage
-from .models import Producto, ProductoLike, ProductoComentario
+from django.conf import settings
+from django.db import transaction
+from miwebsite.image_utils import ImageProcessor
+from .cache import incrementar_version_catalogo, invalidar_stats
+from .models import Producto, ProductoLike, ProductoComentario, TrabajoImagen, eliminador_productos
 
 @admin.register(Producto)
 class ProductoAdmin(admin.ModelAdmin):
-    list_display = ('titulo', 'activo', 'orden', 'fecha_creacion')
+    list_display = ('titulo', 'activo', 'orden', 'likes_count', 'dislikes_count', 'estado_imagen', 'fecha_creacion')
     list_filter = ('activo', 'fecha_creacion')
     search_fields = ('titulo', 'descripcion')
     list_editable = ('activo', 'orden')
@@ -27,35 +30,34 @@ class ProductoAdmin(admin.ModelAdmin):
         }),
     )
     
-    def delete_model(self, request, obj):
-        """
-        Override delete_model to ensure S3/MinIO files are cleaned up
-        even when deleting via Admin (which bypasses post_delete signals).
-        """
-        foto_name = getattr(obj.foto, 'name', None)
-        if foto_name:
-            try:
-                if default_storage.exists(foto_name):
-                    default_storage.delete(foto_name)
-            except Exception:
-                # log if needed, but don't block deletion
-                pass
-        super().delete_model(request, obj)
+    def formfield_for_dbfield(self, db_field, request, **kwargs):
+        field = super().formfield_for_dbfield(db_field, request, **kwargs)
+        if db_field.name == 'foto':
+            field.help_text = ImageProcessor('producto').descripcion()
+        return field
     
     def delete_queryset(self, request, queryset):
         """
-        Override delete_queryset to ensure S3/MinIO files are cleaned up
-        when using bulk delete action (which also bypasses signals).
+        Bulk delete action: only pk/foto/variantes are read (values_list),
+        files are removed after COMMIT in one batch (no per-file `exists`).
+        Above CATALOGO_ADMIN_BORRADO_MAX products the rows are hidden at once
+        (activo=False, fecha_baja set) and deleted by a background thread, so
+        the request time does not grow with the selection. If the process
+        restarts first, `manage.py eliminar_bajas` finishes the job.
         """
-        for obj in queryset:
-            foto_name = getattr(obj.foto, 'name', None)
-            if foto_name:
-                try:
-                    if default_storage.exists(foto_name):
-                        default_storage.delete(foto_name)
-                except Exception:
-                    pass
-        super().delete_queryset(request, queryset)
+        pks = list(queryset.values_list('pk', flat=True))
+        if len(pks) <= getattr(settings, 'CATALOGO_ADMIN_BORRADO_MAX', 200):
+            Producto.eliminar_en_lote(pks)
+            return
+        
+        Producto.marcar_baja(pks)
+        invalidar_stats(pks)
+        incrementar_version_catalogo()
+        transaction.on_commit(lambda: eliminador_productos.programar(pks))
+        messages.info(
+            request,
+            f"{len(pks)} productos ocultados; se eliminan en segundo plano.",
+        )
 
 
 @admin.register(ProductoLike)
@@ -106,5 +108,16 @@ class ProductoComentarioAdmin(admin.ModelAdmin):
         """Los comentarios son inmutables."""
         return False
 
+@admin.register(TrabajoImagen)
+class TrabajoImagenAdmin(admin.ModelAdmin):
+    list_display = ('producto', 'estado', 'intentos', 'fecha_creacion', 'fecha_actualizacion')
+    list_filter = ('estado',)
+    readonly_fields = ('producto', 'original', 'estado', 'intentos', 'error', 'fecha_creacion', 'fecha_actualizacion')
+
+    def has_add_permission(self, request):
+        """Los trabajos se crean al guardar un Producto."""
+        return False
+
+
 # Nota: Se eliminó la integración con Supabase. El admin gestiona ahora solo
 # los modelos de Django definidos en `catalogo.models`.
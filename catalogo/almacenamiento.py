@@ -0,0 +1,158 @@
+"""
+Operaciones por lote sobre el storage de media (MinIO/S3 o disco).
+
+- borrar_en_lote(): DeleteObjects de a 1000 claves en S3 y un pool de
+  hilos en los demás storages, sin cortar por el primer error.
+- BorradorDiferido: hilo en segundo plano que junta borrados durante
+  un instante y los ejecuta juntos; las señales de Producto le encolan
+  los archivos con transaction.on_commit y el admin, las bajas masivas
+  (ver catalogo.models).
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+LOTE_S3 = 1000  # máximo de claves por DeleteObjects
+HILOS_BORRADO = 8  # borrados simultáneos en storages sin API por lote
+
+
+def es_s3(storage):
+    """S3Storage de django-storages (MinIO incluido)."""
+    return hasattr(storage, 'bucket') and hasattr(storage, 'location')
+
+
+def prefijo_s3(storage):
+    location = storage.location.strip('/')
+    return f"{location}/" if location else ''
+
+
+def borrar_en_lote(storage, nombres):
+    """
+    Borra `nombres` del storage. Retorna {nombre: error} de los que
+    fallaron (los demás se borran igual).
+    """
+    nombres = list(dict.fromkeys(nombres))
+    errores = {}
+    if not nombres:
+        return errores
+    if es_s3(storage):
+        base = prefijo_s3(storage)
+        for i in range(0, len(nombres), LOTE_S3):
+            lote = nombres[i:i + LOTE_S3]
+            try:
+                respuesta = storage.bucket.delete_objects(
+                    Delete={'Objects': [{'Key': base + n} for n in lote], 'Quiet': True}
+                )
+            except Exception as exc:
+                errores.update((n, str(exc)) for n in lote)
+                continue
+            for error in respuesta.get('Errors', []):
+                errores[error['Key'][len(base):]] = error.get('Message', error.get('Code'))
+        return errores
+
+    def borrar(nombre):
+        try:
+            storage.delete(nombre)
+        except Exception as exc:
+            return nombre, str(exc)
+        return None
+
+    resultados = None
+    if len(nombres) > 1:
+        try:
+            with ThreadPoolExecutor(max_workers=min(HILOS_BORRADO, len(nombres))) as pool:
+                resultados = list(pool.map(borrar, nombres))
+        except RuntimeError:
+            # Al salir del intérprete (el atexit de BorradorDiferido) ya no
+            # se aceptan hilos nuevos: se borra en serie
+            resultados = None
+    if resultados is None:
+        resultados = [borrar(nombre) for nombre in nombres]
+    errores.update(r for r in resultados if r)
+    return errores
+
+
+class BorradorDiferido:
+    """
+    Cola de borrados que atiende un hilo daemon: espera hasta `espera`
+    segundos (o `lote` elementos) para juntar pedidos y los pasa todos
+    juntos a `procesar(lote)`.
+
+    Con CATALOGO_BORRADO_DIFERIDO=False (tests, scripts) `programar`
+    procesa en el momento. Con `vaciar_al_salir`, lo pendiente al salir
+    del proceso se vacía con atexit (hasta 5 s); si el proceso muere
+    antes, `manage.py gc_media` lo recoge. Sin él, quien programa tiene
+    que dejar el trabajo registrado en la base (ver Producto.marcar_baja).
+    """
+
+    def __init__(self, procesar, espera=0.5, lote=500, nombre='borrador-media', vaciar_al_salir=True):
+        self.procesar = procesar
+        self.nombre = nombre
+        self.espera = espera
+        self.lote = lote
+        self._cola = queue.Queue()
+        self._hilo = None
+        self._lock = threading.Lock()
+        if vaciar_al_salir:
+            atexit.register(self.esperar, timeout=5)
+
+    def programar(self, elementos):
+        if not elementos:
+            return
+        if not getattr(settings, 'CATALOGO_BORRADO_DIFERIDO', True):
+            self._ejecutar(list(elementos))
+            return
+        for elemento in elementos:
+            self._cola.put(elemento)
+        self._asegurar_hilo()
+
+    def esperar(self, timeout=None):
+        """Bloquea hasta que la cola quede vacía (o pase `timeout`)."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        while self._cola.unfinished_tasks:
+            if limite is not None and time.monotonic() > limite:
+                return False
+            if self._hilo is None or not self._hilo.is_alive():
+                self._asegurar_hilo()
+            time.sleep(0.01)
+        return True
+
+    def _asegurar_hilo(self):
+        with self._lock:
+            # Tras un fork el hilo del padre no existe en el hijo
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._bucle, name=self.nombre, daemon=True)
+                self._hilo.start()
+
+    def _bucle(self):
+        while True:
+            lote = [self._cola.get()]
+            limite = time.monotonic() + self.espera
+            while len(lote) < self.lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+            try:
+                close_old_connections()
+                self._ejecutar(lote)
+            finally:
+                for _ in lote:
+                    self._cola.task_done()
+
+    def _ejecutar(self, lote):
+        try:
+            self.procesar(lote)
+        except Exception:
+            logger.exception("%s: falló un lote de %d elemento(s)", self.nombre, len(lote))
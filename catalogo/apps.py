@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CatalogoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'catalogo'
+
+    def ready(self):
+        from .checks import avisar_al_arrancar
+        avisar_al_arrancar()
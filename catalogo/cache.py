@@ -0,0 +1,164 @@
+"""
+Caché del catálogo: estadísticas de votos y versión del catálogo.
+
+Guarda por producto los contadores (likes, dislikes) y, por cliente, su
+voto actual, para que abrir el modal de un producto "caliente" no toque la
+base de datos. Usa el alias `catalogo` de settings.CACHES (LocMemCache por
+defecto, acotado por TIMEOUT y MAX_ENTRIES); con varios workers conviene
+apuntarlo a un backend compartido (Redis/Memcached) para que la
+actualización write-through se vea en todos los procesos.
+"""
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# Centinela para "el cliente no votó" (None significa "no está en caché")
+SIN_VOTO = ''
+
+CLAVE_VERSION = 'version'
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOGO_CACHE_ALIAS', 'catalogo')]
+
+
+def cache_local_al_proceso():
+    """
+    True si el alias vive en la memoria de cada proceso (LocMemCache): lo
+    que se incremente desde un comando de manage.py o un worker no lo ven
+    los procesos web (ver management/commands/_cache.py).
+    """
+    return isinstance(get_cache(), LocMemCache)
+
+
+def asincrono(func):
+    """
+    Versión async de un helper de este módulo, para las vistas ASGI. Las
+    cachés en memoria (o Redis/Memcached, de latencia sub-ms) se consultan
+    sin salir del event loop; DatabaseCache usa el ORM, que desde código
+    async sólo corre en un hilo (sync_to_async).
+    """
+    @wraps(func)
+    async def inner(*args, **kwargs):
+        if isinstance(get_cache(), DatabaseCache):
+            return await sync_to_async(func)(*args, **kwargs)
+        return func(*args, **kwargs)
+    return inner
+
+
+def clave_stats(producto_id):
+    return f"stats:{producto_id}"
+
+
+def clave_voto(producto_id, cliente_id):
+    return f"voto:{producto_id}:{cliente_id}"
+
+
+def leer_stats(producto_ids, cliente_id):
+    """
+    Lee en una sola operación los contadores y el voto del cliente para
+    varios productos. Retorna {producto_id: {likes, dislikes, voto_actual}}
+    sólo con los productos que estaban completos en caché.
+    """
+    claves = {}
+    for pk in producto_ids:
+        claves[clave_stats(pk)] = pk
+        claves[clave_voto(pk, cliente_id)] = pk
+    encontrados = get_cache().get_many(list(claves))
+
+    resultado = {}
+    for pk in producto_ids:
+        contadores = encontrados.get(clave_stats(pk))
+        voto = encontrados.get(clave_voto(pk, cliente_id))
+        if contadores is None or voto is None:
+            continue
+        resultado[pk] = {
+            'likes': contadores[0],
+            'dislikes': contadores[1],
+            'voto_actual': voto or None,
+        }
+    return resultado
+
+
+def guardar_stats(stats, cliente_id):
+    """Guarda {producto_id: {likes, dislikes, voto_actual}} en caché."""
+    valores = {}
+    for pk, datos in stats.items():
+        valores[clave_stats(pk)] = (datos['likes'], datos['dislikes'])
+        valores[clave_voto(pk, cliente_id)] = datos['voto_actual'] or SIN_VOTO
+    if valores:
+        get_cache().set_many(valores)
+
+
+def registrar_voto(producto_id, cliente_id, accion, tipo, likes, dislikes):
+    """
+    Write-through tras ProductoLike.votar: actualiza los contadores y el
+    voto del cliente con lo que devolvió la base de datos.
+    """
+    cache = get_cache()
+    cache.set(clave_stats(producto_id), (likes, dislikes))
+    if accion == 'unchanged':
+        # Perdimos una carrera contra otro request: el voto real es incierto
+        cache.delete(clave_voto(producto_id, cliente_id))
+    else:
+        cache.set(clave_voto(producto_id, cliente_id), SIN_VOTO if accion == 'removed' else tipo)
+
+
+def invalidar_stats(producto_ids):
+    """Descarta los contadores cacheados (los votos por cliente expiran por TTL)."""
+    get_cache().delete_many([clave_stats(pk) for pk in producto_ids])
+
+
+# ============================================================
+#  Versiones (generaciones) para invalidar por lote
+# ============================================================
+
+def _version(clave):
+    """
+    Número de generación guardado en `clave`. Expira con el TTL del alias:
+    con caché local por proceso, un worker que no vio el incremento deja
+    de servir datos viejos como mucho un TTL después.
+    """
+    cache = get_cache()
+    version = cache.get(clave)
+    if version is None:
+        # Semilla basada en el reloj: si la clave se pierde nunca se reusa
+        # una versión vieja
+        cache.add(clave, time.time_ns())
+        version = cache.get(clave, 0)
+    return version
+
+
+def _incrementar_version(clave):
+    cache = get_cache()
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, time.time_ns())
+
+
+def version_catalogo():
+    """
+    Generación del catálogo; cambia cada vez que se guarda o borra un
+    Producto. Versiona todo lo que se cachea a partir del listado (grilla
+    de la home, ETag de api_productos).
+    """
+    return _version(CLAVE_VERSION)
+
+
+def incrementar_version_catalogo():
+    _incrementar_version(CLAVE_VERSION)
+
+
+def version_comentarios(producto_id):
+    """Generación de los comentarios de un producto (para ETag)."""
+    return _version(f"comentarios:{producto_id}")
+
+
+def incrementar_version_comentarios(producto_id):
+    _incrementar_version(f"comentarios:{producto_id}")
@@ -0,0 +1,40 @@
+"""
+Chequeos de configuración del catálogo.
+
+Las versiones del catálogo y de los comentarios (catalogo.cache) viven en
+el alias `catalogo` de CACHES. Con LocMemCache cada proceso tiene las
+suyas: con varios workers, guardar un Producto sólo invalida la grilla y
+los ETag del worker que atendió el request, y los demás siguen sirviendo
+lo viejo (o respondiendo 304) hasta que vence CATALOGO_CACHE_TTL.
+"""
+import logging
+
+from django.conf import settings
+from django.core.checks import Warning, register
+
+from .cache import cache_local_al_proceso
+
+logger = logging.getLogger(__name__)
+
+
+def problemas_cache():
+    if settings.WEB_CONCURRENCY > 1 and cache_local_al_proceso():
+        return [Warning(
+            f"La caché 'catalogo' es LocMemCache con WEB_CONCURRENCY={settings.WEB_CONCURRENCY}: "
+            "cada worker tiene su propia versión del catálogo y de los comentarios.",
+            hint="Configurar CATALOGO_CACHE_BACKEND con un backend compartido (p. ej. RedisCache).",
+            id='catalogo.W001',
+        )]
+    return []
+
+
+@register('caches', deploy=True)
+def cache_catalogo_compartida(app_configs, **kwargs):
+    """`manage.py check --deploy`."""
+    return problemas_cache()
+
+
+def avisar_al_arrancar():
+    """Lo mismo, en el log de cada proceso (gunicorn no corre los checks)."""
+    for problema in problemas_cache():
+        logger.warning("%s %s", problema.msg, problema.hint)
@@ -2,7 +2,7 @@
 Formularios para productos de Supabase
 """
 from django import forms
-from miwebsite.image_utils import validate_image_file
+from miwebsite.image_utils import ImageProcessor, validate_image_file
 
 class ProductoSupabaseForm(forms.Form):
     """
@@ -29,7 +29,6 @@ class ProductoSupabaseForm(forms.Form):
     foto = forms.ImageField(
         label="Foto",
         required=False,
-        help_text="Imagen será automáticamente optimizada y convertida a WebP (máximo 2MB)",
         widget=forms.FileInput(attrs={
             'class': 'form-control',
             'accept': 'image/*'
@@ -55,6 +54,11 @@ class ProductoSupabaseForm(forms.Form):
         })
     )
     
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # El texto sale del perfil que realmente procesa la foto
+        self.fields['foto'].help_text = ImageProcessor('producto').descripcion()
+
     def clean_foto(self):
         """Validar el archivo de imagen"""
         foto = self.cleaned_data.get('foto')
@@ -0,0 +1,34 @@
+"""
+Chequeo compartido por los comandos que cambian el catálogo fuera de los
+procesos web (procesar_imagenes, reprocess_images, import_catalogo).
+
+La versión del catálogo (catalogo.cache.version_catalogo) vive en el
+alias `catalogo` de CACHES. Con LocMemCache cada proceso tiene la suya:
+lo que el comando incremente no lo ve ningún worker web, que sigue
+sirviendo grilla y ETag con URLs a fotos que el comando ya borró hasta
+que vence el TTL. Por eso estos comandos exigen un backend compartido
+(Redis, Memcached, DatabaseCache o FileBasedCache).
+"""
+from django.core.management.base import CommandError
+
+from catalogo.cache import cache_local_al_proceso
+
+
+def agregar_opcion_cache_local(parser):
+    parser.add_argument(
+        '--cache-local', action='store_true',
+        help="Correr aunque la caché 'catalogo' sea LocMemCache (los procesos web "
+             "no ven los cambios hasta que vence CATALOGO_CACHE_TTL)",
+    )
+
+
+def exigir_cache_compartida(options):
+    """CommandError si la caché del catálogo es local al proceso y no se pasó --cache-local."""
+    if options['cache_local'] or not cache_local_al_proceso():
+        return
+    raise CommandError(
+        "La caché 'catalogo' es LocMemCache (local a cada proceso): los procesos web no "
+        "verían la nueva versión del catálogo y seguirían sirviendo fotos ya borradas. "
+        "Configurar CATALOGO_CACHE_BACKEND con un backend compartido (p. ej. RedisCache) "
+        "o pasar --cache-local para correrlo igual."
+    )
@@ -0,0 +1,290 @@
+"""
+Prueba de carga: vistas sync bajo gunicorn contra el perfil ASGI.
+
+Levanta un solo worker de cada perfil en un puerto local:
+- sync: gunicorn miwebsite.wsgi (--hilos hilos, conexiones persistentes);
+- asgi: gunicorn miwebsite.asgi -k uvicorn_worker.UvicornWorker
+  (VISTAS_ASYNC, pool de psycopg de --pool-max conexiones en PostgreSQL);
+y le manda carga con --concurrencia clientes HTTP/1.1 keep-alive durante
+--duracion segundos, repartidos entre --urls. Informa req/s, p50/p95/p99
+y cuántos requests atiende el worker en paralelo: req/s x la latencia
+sin carga (p50 con un solo cliente). Un worker sync no pasa de
+--hilos; el perfil ASGI llega hasta el tamaño del pool en lo que
+consulta la base, y no tiene tope en lo que sale de la caché.
+
+Con --latencia-db (sólo PostgreSQL) los workers se conectan a la base a
+través de un proxy TCP que demora cada tramo ese tiempo en cada sentido,
+como una base en otra red (la de Render, p.ej.). Sin latencia de red un
+worker sync rara vez espera a la base y las diferencias se achican.
+
+Uso:
+    python manage.py bench_asgi --concurrencia 4 32 128 --latencia-db 5
+    python manage.py bench_asgi --perfiles asgi --urls /api/productos/?limit=20
+"""
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from catalogo.management.commands.bench_votos import percentil
+from catalogo.models import Producto
+
+PERFILES = ('sync', 'asgi')
+URLS = (
+    '/api/productos/?limit=20&fields=id,titulo',
+    '/catalogo/api/productos/{id}/comentarios/?limit=20',
+    '/catalogo/api/productos/{id}/stats/',
+)
+
+
+class Command(BaseCommand):
+    help = "Compara la concurrencia por worker de las vistas sync (gunicorn) y async (uvicorn)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--perfiles', nargs='+', choices=PERFILES, default=list(PERFILES))
+        parser.add_argument('--concurrencia', nargs='+', type=int, default=[4, 32, 128],
+                            help="Clientes simultáneos (una corrida por valor)")
+        parser.add_argument('--duracion', type=float, default=10, help="Segundos por corrida")
+        parser.add_argument('--urls', nargs='+', default=list(URLS),
+                            help="URLs a pedir en ronda; {id} es un producto activo")
+        parser.add_argument('--hilos', type=int, default=4, help="gunicorn --threads del perfil sync")
+        parser.add_argument('--pool-max', type=int, default=10, help="DB_POOL_MAX_SIZE del perfil asgi")
+        parser.add_argument('--latencia-db', type=float, default=0,
+                            help="ms agregados en cada sentido entre los workers y la base")
+        parser.add_argument('--puerto', type=int, default=8765)
+
+    def handle(self, *args, **options):
+        postgresql = connection.vendor == 'postgresql'
+        if options['latencia_db'] and not postgresql:
+            raise CommandError("--latencia-db requiere PostgreSQL")
+
+        producto = Producto.activos('id').first()
+        if producto is None:
+            raise CommandError("No hay productos activos para pedir")
+        urls = [u.format(id=producto.pk) for u in options['urls']]
+
+        base = dict(connection.settings_dict)
+        proxy = None
+        if options['latencia_db']:
+            proxy = ProxyLento((base['HOST'] or 'localhost', int(base['PORT'] or 5432)),
+                               options['latencia_db'] / 1000)
+            base['HOST'], base['PORT'] = '127.0.0.1', proxy.puerto
+
+        entorno = dict(os.environ)
+        if postgresql:
+            entorno['DATABASE_URL'] = (
+                f"postgres://{base['USER']}:{base['PASSWORD'] or ''}"
+                f"@{base['HOST'] or 'localhost'}:{base['PORT'] or 5432}/{base['NAME']}"
+            )
+        self.stdout.write(
+            f"motor: {connection.vendor}  latencia agregada: {options['latencia_db']} ms por sentido  "
+            f"{len(urls)} URL(s), {options['duracion']:.0f}s por corrida"
+        )
+
+        try:
+            for perfil in options['perfiles']:
+                with Servidor(perfil, options, entorno) as servidor:
+                    latencias, errores, _ = asyncio.run(
+                        cargar(servidor.puerto, urls, 1, min(options['duracion'], 3))
+                    )
+                    if not latencias:
+                        raise CommandError(f"[{perfil}] sin respuestas: {errores[:3]}")
+                    sin_carga = statistics.median(latencias)
+                    self.stdout.write(f"[{perfil:>4}] latencia sin carga p50={sin_carga * 1000:.2f} ms")
+                    for clientes in options['concurrencia']:
+                        resultado = asyncio.run(cargar(servidor.puerto, urls, clientes, options['duracion']))
+                        self.informar(perfil, clientes, resultado, sin_carga)
+        finally:
+            if proxy:
+                proxy.cerrar()
+
+    def informar(self, perfil, clientes, resultado, sin_carga):
+        latencias, errores, total = resultado
+        if not latencias:
+            self.stderr.write(f"[{perfil}] {clientes} clientes: sin respuestas; errores: {errores[:3]}")
+            return
+        ms = [x * 1000 for x in latencias]
+        por_segundo = len(ms) / total
+        self.stdout.write(
+            f"[{perfil:>4} c={clientes:>4}] {por_segundo:7.0f} req/s | p50={percentil(ms, 50):7.2f}  "
+            f"p95={percentil(ms, 95):7.2f}  p99={percentil(ms, 99):7.2f} ms | "
+            f"en paralelo ~{por_segundo * sin_carga:5.1f}"
+            + (f" | {len(errores)} error(es): {errores[0]}" if errores else "")
+        )
+
+
+class Servidor:
+    """Un worker del perfil pedido, vivo mientras dura el `with`."""
+
+    def __init__(self, perfil, options, entorno):
+        self.perfil = perfil
+        self.puerto = options['puerto'] + PERFILES.index(perfil)
+        entorno = dict(entorno, DJANGO_SETTINGS_MODULE='miwebsite.settings')
+        comando = [sys.executable, '-m', 'gunicorn', '-w', '1', '-b', f'127.0.0.1:{self.puerto}',
+                   '--graceful-timeout', '5', '--log-level', 'warning']
+        if perfil == 'sync':
+            comando += ['--threads', str(options['hilos']), 'miwebsite.wsgi:application']
+            entorno.update(VISTAS_ASYNC='False', DB_POOL='False')
+        else:
+            comando += ['-k', 'uvicorn_worker.UvicornWorker', 'miwebsite.asgi:application']
+            entorno.update(VISTAS_ASYNC='True', DB_POOL='True', DB_CONN_MAX_AGE='0',
+                           DB_POOL_MAX_SIZE=str(options['pool_max']))
+        self.comando, self.entorno = comando, entorno
+
+    def __enter__(self):
+        with socket.socket() as prueba:
+            try:
+                prueba.bind(('127.0.0.1', self.puerto))
+            except OSError:
+                raise CommandError(f"El puerto {self.puerto} está en uso (ver --puerto)")
+        self.proceso = subprocess.Popen(self.comando, env=self.entorno, cwd=settings.BASE_DIR)
+        limite = time.monotonic() + 30
+        while time.monotonic() < limite:
+            if self.proceso.poll() is not None:
+                raise CommandError(f"El servidor {self.perfil} terminó con código {self.proceso.returncode}")
+            try:
+                socket.create_connection(('127.0.0.1', self.puerto), timeout=0.5).close()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__()
+        raise CommandError(f"El servidor {self.perfil} no respondió en el puerto {self.puerto}")
+
+    def __exit__(self, *exc):
+        self.proceso.terminate()
+        try:
+            self.proceso.wait(10)
+        except subprocess.TimeoutExpired:
+            self.proceso.kill()
+
+
+async def cargar(puerto, urls, clientes, duracion):
+    """`clientes` conexiones keep-alive pidiendo `urls` en ronda durante `duracion` s."""
+    latencias, errores = [], []
+    fin = time.perf_counter() + duracion
+
+    async def cliente(n):
+        lector, escritor = await asyncio.open_connection('127.0.0.1', puerto)
+        try:
+            # Un request sin medir: abre la conexión (y las del pool)
+            await pedir(lector, escritor, urls[n % len(urls)])
+            i = n
+            while time.perf_counter() < fin:
+                i += 1
+                inicio = time.perf_counter()
+                try:
+                    await pedir(lector, escritor, urls[i % len(urls)])
+                except Exception as exc:
+                    errores.append(exc)
+                    escritor.close()
+                    lector, escritor = await asyncio.open_connection('127.0.0.1', puerto)
+                    continue
+                latencias.append(time.perf_counter() - inicio)
+        finally:
+            escritor.close()
+
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(*(cliente(n) for n in range(clientes)), return_exceptions=True)
+    errores.extend(r for r in resultados if isinstance(r, Exception))
+    return latencias, errores, time.perf_counter() - inicio
+
+
+async def pedir(lector, escritor, url):
+    escritor.write(f"GET {url} HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept: application/json\r\n\r\n".encode())
+    await escritor.drain()
+    estado = await lector.readline()
+    if not estado:
+        raise ConnectionError("conexión cerrada por el servidor")
+    largo, chunked = None, False
+    while (linea := await lector.readline()) not in (b'\r\n', b''):
+        nombre, _, valor = linea.decode('latin-1').partition(':')
+        nombre = nombre.strip().lower()
+        if nombre == 'content-length':
+            largo = int(valor)
+        elif nombre == 'transfer-encoding' and 'chunked' in valor.lower():
+            chunked = True
+    if chunked:
+        while (tamano := int((await lector.readline()).split(b';')[0], 16)):
+            await lector.readexactly(tamano + 2)
+        await lector.readline()
+    elif largo:
+        await lector.readexactly(largo)
+    codigo = estado.split()[1]
+    if codigo != b'200':
+        raise RuntimeError(f"HTTP {codigo.decode()} en {url}")
+
+
+class ProxyLento:
+    """Proxy TCP en un hilo que demora `demora` s cada tramo, en cada sentido."""
+
+    def __init__(self, destino, demora):
+        self.destino, self.demora = destino, demora
+        self.conexiones = set()
+        self.loop = asyncio.new_event_loop()
+        listo = threading.Event()
+        threading.Thread(target=self._correr, args=(listo,), name='proxy-lento', daemon=True).start()
+        listo.wait()
+
+    def _correr(self, listo):
+        asyncio.set_event_loop(self.loop)
+        self.servidor = self.loop.run_until_complete(asyncio.start_server(self._atender, '127.0.0.1', 0))
+        self.puerto = self.servidor.sockets[0].getsockname()[1]
+        listo.set()
+        self.loop.run_forever()
+
+    async def _atender(self, lector, escritor):
+        try:
+            lector_db, escritor_db = await asyncio.open_connection(*self.destino)
+        except OSError:
+            escritor.close()
+            return
+        self.conexiones.update((escritor, escritor_db))
+        try:
+            await asyncio.gather(self._copiar(lector, escritor_db), self._copiar(lector_db, escritor))
+        finally:
+            self.conexiones.difference_update((escritor, escritor_db))
+
+    async def _copiar(self, lector, escritor):
+        # Cada tramo sale `demora` después de llegar, sin frenar a los siguientes
+        cola = asyncio.Queue()
+
+        async def enviar():
+            while (item := await cola.get()) is not None:
+                llegada, datos = item
+                await asyncio.sleep(max(0, llegada + self.demora - self.loop.time()))
+                escritor.write(datos)
+                await escritor.drain()
+
+        envio = asyncio.ensure_future(enviar())
+        try:
+            while datos := await lector.read(65536):
+                cola.put_nowait((self.loop.time(), datos))
+        except OSError:
+            pass
+        cola.put_nowait(None)
+        try:
+            await envio
+        except OSError:
+            pass
+        finally:
+            escritor.close()
+
+    def cerrar(self):
+        asyncio.run_coroutine_threadsafe(self._cerrar(), self.loop).result(10)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+    async def _cerrar(self):
+        # Cerrar los sockets termina las copias pendientes (read() devuelve b'')
+        self.servidor.close()
+        for escritor in list(self.conexiones):
+            escritor.close()
+        while self.conexiones:
+            await asyncio.sleep(0.01)
@@ -0,0 +1,168 @@
+"""
+Benchmark del límite de un comentario por día sobre una tabla grande.
+
+Carga --filas comentarios repartidos en el último año y compara:
+- la consulta anterior (`fecha_creacion__date=hoy`) contra el rango
+  semiabierto del día de Buenos Aires y la igualdad sobre `fecha_local`
+  (plan y latencia);
+- chequeo previo + INSERT contra ProductoComentario.comentar con
+  --hilos requests simultáneos del mismo usuario.
+
+Los datos de prueba se borran al terminar.
+
+Uso (contra la base configurada, idealmente PostgreSQL):
+    python manage.py bench_comentarios --filas 1000000 --consultas 500
+"""
+import random
+import statistics
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from catalogo.management.commands.bench_votos import percentil
+from catalogo.models import Producto, ProductoComentario, dia_local, rango_del_dia
+
+
+class Command(BaseCommand):
+    help = "Compara el chequeo diario de comentarios por __date contra el rango del día y la restricción única"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=200_000, help="Comentarios a cargar")
+        parser.add_argument('--productos', type=int, default=50, help="Productos entre los que repartirlos")
+        parser.add_argument('--usuarios', type=int, default=5000, help="Usuarios distintos")
+        parser.add_argument('--consultas', type=int, default=300, help="Chequeos a medir por variante")
+        parser.add_argument('--hilos', type=int, default=8, help="Requests simultáneos del mismo usuario")
+
+    def handle(self, *args, **options):
+        productos = Producto.objects.bulk_create(
+            Producto(titulo=f'bench-comentarios-{i}', descripcion='-', activo=False)
+            for i in range(options['productos'])
+        )
+        ids = [p.pk for p in productos]
+        try:
+            self.cargar(ids, options)
+            self.medir_consultas(ids, options)
+            self.medir_concurrencia(ids[0], options['hilos'])
+        finally:
+            ProductoComentario.objects.filter(producto_id__in=ids).delete()
+            Producto.objects.filter(pk__in=ids).delete()
+
+    def cargar(self, ids, options):
+        inicio = time.perf_counter()
+        ahora = timezone.now()
+        azar = random.Random(0)
+        lote = []
+        usados = set()
+        for _ in range(options['filas']):
+            fecha = ahora - timedelta(seconds=azar.randrange(365 * 24 * 3600))
+            clave = (azar.choice(ids), f"bench_{azar.randrange(options['usuarios'])}", dia_local(fecha))
+            if clave in usados:
+                continue
+            usados.add(clave)
+            lote.append(ProductoComentario(
+                producto_id=clave[0], usuario_id=clave[1], texto='-',
+                fecha_creacion=fecha, fecha_local=clave[2],
+            ))
+            if len(lote) >= 5000:
+                ProductoComentario.objects.bulk_create(lote)
+                lote = []
+        ProductoComentario.objects.bulk_create(lote)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {ProductoComentario._meta.db_table}')
+        self.stdout.write(
+            f"motor: {connection.vendor}  {len(usados)} comentarios cargados "
+            f"en {time.perf_counter() - inicio:.1f}s"
+        )
+
+    def medir_consultas(self, ids, options):
+        hoy = dia_local()
+        inicio_dia, fin_dia = rango_del_dia(hoy)
+        variantes = {
+            '__date': lambda p, u: ProductoComentario.objects.filter(
+                producto_id=p, usuario_id=u, fecha_creacion__date=hoy
+            ),
+            'rango': lambda p, u: ProductoComentario.objects.filter(
+                producto_id=p, usuario_id=u,
+                fecha_creacion__gte=inicio_dia, fecha_creacion__lt=fin_dia,
+            ),
+            'fecha_local': lambda p, u: ProductoComentario.objects.filter(
+                producto_id=p, usuario_id=u, fecha_local=hoy
+            ),
+        }
+        azar = random.Random(1)
+        muestras = [
+            (azar.choice(ids), f"bench_{azar.randrange(options['usuarios'])}")
+            for _ in range(options['consultas'])
+        ]
+        for nombre, consulta in variantes.items():
+            plan = consulta(*muestras[0]).order_by().explain(analyze=connection.vendor == 'postgresql')
+            self.stdout.write(f"\n[{nombre}] plan:\n  " + plan.replace('\n', '\n  '))
+            ms = []
+            for producto_id, usuario_id in muestras:
+                inicio = time.perf_counter()
+                consulta(producto_id, usuario_id).exists()
+                ms.append((time.perf_counter() - inicio) * 1000)
+            self.stdout.write(
+                f"[{nombre}] latencia ms  p50={percentil(ms, 50):.3f}  "
+                f"p99={percentil(ms, 99):.3f}  media={statistics.mean(ms):.3f}"
+            )
+
+    def medir_concurrencia(self, producto_id, hilos):
+        """Mismo usuario, `hilos` requests a la vez, con cada estrategia."""
+        resultados = {}
+        barrera = threading.Barrier(hilos)
+        lock = threading.Lock()
+
+        def chequeo_previo(usuario_id):
+            # Lo que hacía la vista: consultar y después insertar
+            if not ProductoComentario.puede_comentar_hoy(producto_id, usuario_id):
+                return 'rechazado'
+            try:
+                with transaction.atomic():
+                    ProductoComentario.objects.create(producto_id=producto_id, usuario_id=usuario_id, texto='-')
+            except IntegrityError:
+                return 'pasó el chequeo'  # sin la restricción, un duplicado
+            return 'creado'
+
+        def restriccion(usuario_id):
+            creado = ProductoComentario.comentar(producto_id, usuario_id, '-')
+            return 'creado' if creado else 'rechazado'
+
+        for nombre, estrategia in (('chequeo previo', chequeo_previo), ('restricción única', restriccion)):
+            usuario_id = f"bench_concurrente_{nombre}"
+            conteo = {}
+
+            def request():
+                try:
+                    barrera.wait()
+                    resultado = estrategia(usuario_id)
+                except Exception as exc:
+                    resultado = f"error: {exc}"
+                finally:
+                    connection.close()
+                with lock:
+                    conteo[resultado] = conteo.get(resultado, 0) + 1
+
+            trabajadores = [threading.Thread(target=request) for _ in range(hilos)]
+            for hilo in trabajadores:
+                hilo.start()
+            for hilo in trabajadores:
+                hilo.join()
+            barrera.reset()
+            resultados[nombre] = conteo
+
+        self.stdout.write("")
+        for nombre, conteo in resultados.items():
+            detalle = ", ".join(f"{n} {r}" for r, n in sorted(conteo.items()))
+            self.stdout.write(f"[{nombre}] {hilos} requests simultáneos: {detalle}")
+        duplicados = resultados['chequeo previo'].get('pasó el chequeo', 0)
+        estilo = self.style.SUCCESS if resultados['restricción única'].get('creado') == 1 else self.style.ERROR
+        self.stdout.write(estilo(
+            f"restricción única: {resultados['restricción única'].get('creado', 0)} comentario(s) creado(s); "
+            f"el chequeo previo habría dejado {duplicados} duplicado(s)"
+        ))
@@ -0,0 +1,152 @@
+"""
+Benchmark de latencia por request según cómo se obtiene la conexión a
+la base.
+
+Pasa --requests requests por el handler WSGI de Django (con las señales
+request_started / request_finished, que son las que abren y cierran
+conexiones según CONN_MAX_AGE) contra --url, repartidos en --hilos
+hilos, en cada modo:
+- nuevas: CONN_MAX_AGE=0, conexión nueva por request (sin persistencia);
+- persistentes: CONN_MAX_AGE=--max-age, con health checks;
+- pool: pool de psycopg 3 (sólo PostgreSQL con psycopg[pool]).
+
+Informa p50/p95/p99 y cuántas conexiones físicas se abrieron.
+
+Uso (contra la base configurada, idealmente PostgreSQL):
+    python manage.py bench_conexiones --requests 2000 --hilos 4
+    python manage.py bench_conexiones --modos nuevas persistentes --url /
+"""
+import statistics
+import threading
+import time
+from io import BytesIO
+from urllib.parse import urlsplit
+from wsgiref.util import setup_testing_defaults
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+
+from catalogo.management.commands.bench_votos import percentil
+from miwebsite.db import cerrar_conexiones
+
+MODOS = ('nuevas', 'persistentes', 'pool')
+
+
+class Command(BaseCommand):
+    help = "Mide la latencia por request con conexiones nuevas, persistentes (CONN_MAX_AGE) y pool de psycopg"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/api/productos/?limit=20&fields=id,titulo', help="URL a pedir")
+        parser.add_argument('--requests', type=int, default=1000, help="Requests por modo")
+        parser.add_argument('--hilos', type=int, default=4, help="Hilos concurrentes (como gunicorn --threads)")
+        parser.add_argument('--max-age', type=int, default=60, help="CONN_MAX_AGE del modo persistentes")
+        parser.add_argument('--pool-max', type=int, default=4, help="max_size del pool")
+        parser.add_argument('--modos', nargs='+', choices=MODOS, default=list(MODOS))
+
+    def handle(self, *args, **options):
+        if 'pool' in options['modos'] and connection.vendor != 'postgresql':
+            raise CommandError("El modo pool requiere PostgreSQL (usar --modos nuevas persistentes)")
+
+        ajustes = connections.settings['default']
+        originales = (ajustes['CONN_MAX_AGE'], ajustes['CONN_HEALTH_CHECKS'], dict(ajustes['OPTIONS']))
+        handler = WSGIHandler()
+        self.stdout.write(
+            f"motor: {connection.vendor}  url: {options['url']}  "
+            f"{options['requests']} requests x modo, {options['hilos']} hilo(s)"
+        )
+        try:
+            for modo in options['modos']:
+                cerrar_conexiones()
+                ajustes['OPTIONS'] = dict(originales[2])
+                ajustes['OPTIONS'].pop('pool', None)
+                ajustes['CONN_HEALTH_CHECKS'] = True
+                if modo == 'nuevas':
+                    ajustes['CONN_MAX_AGE'] = 0
+                elif modo == 'persistentes':
+                    ajustes['CONN_MAX_AGE'] = options['max_age']
+                else:
+                    ajustes['CONN_MAX_AGE'] = 0
+                    ajustes['OPTIONS']['pool'] = {
+                        'min_size': 1, 'max_size': options['pool_max'], 'timeout': 10,
+                    }
+                self.medir(modo, handler, options)
+        finally:
+            cerrar_conexiones()
+            ajustes['CONN_MAX_AGE'], ajustes['CONN_HEALTH_CHECKS'], ajustes['OPTIONS'] = originales
+
+    def medir(self, modo, handler, options):
+        partes = urlsplit(options['url'])
+        latencias = []
+        fisicas = set()
+        aperturas = 0
+        errores = []
+        lock = threading.Lock()
+
+        def al_conectar(sender, connection, **kwargs):
+            # Con pool, connection_created se emite en cada préstamo: las
+            # conexiones físicas se cuentan por pid del backend
+            nonlocal aperturas
+            pid = getattr(getattr(connection.connection, 'info', None), 'backend_pid', None)
+            with lock:
+                aperturas += 1
+                fisicas.add(pid if pid is not None else aperturas)
+
+        def pedir():
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'PATH_INFO': partes.path,
+                'QUERY_STRING': partes.query,
+                'wsgi.input': BytesIO(),
+            }
+            setup_testing_defaults(environ)
+            estado = []
+            respuesta = handler(environ, lambda status, headers, exc_info=None: estado.append(status))
+            try:
+                b''.join(respuesta)
+            finally:
+                respuesta.close()  # request_finished: aquí se cierra o se conserva la conexión
+            if not estado[0].startswith('200'):
+                raise RuntimeError(estado[0])
+
+        def cliente(cantidad):
+            propias = []
+            try:
+                for _ in range(cantidad):
+                    inicio = time.perf_counter()
+                    pedir()
+                    propias.append(time.perf_counter() - inicio)
+            except Exception as exc:
+                errores.append(exc)
+            finally:
+                connection.close()
+                with lock:
+                    latencias.extend(propias)
+
+        connection_created.connect(al_conectar)
+        try:
+            por_hilo, resto = divmod(options['requests'], options['hilos'])
+            hilos = [
+                threading.Thread(target=cliente, args=(por_hilo + (n < resto),))
+                for n in range(options['hilos'])
+            ]
+            inicio = time.perf_counter()
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            total = time.perf_counter() - inicio
+        finally:
+            connection_created.disconnect(al_conectar)
+
+        if not latencias:
+            self.stderr.write(f"[{modo}] sin mediciones; errores: {errores[:3]}")
+            return
+        ms = [x * 1000 for x in latencias]
+        self.stdout.write(
+            f"[{modo:>12}] p50={percentil(ms, 50):6.2f}  p95={percentil(ms, 95):6.2f}  "
+            f"p99={percentil(ms, 99):6.2f}  media={statistics.mean(ms):6.2f} ms | "
+            f"{len(ms) / total:5.0f} req/s | {len(fisicas)} conexión(es) física(s)"
+            + (f" | {len(errores)} error(es): {errores[0]}" if errores else "")
+        )
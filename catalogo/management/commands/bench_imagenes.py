@@ -0,0 +1,174 @@
+"""
+Benchmark del codificador con presupuesto de bytes (encode_to_budget)
+contra los bucles lineales anteriores de Producto.save y
+process_image_for_web.
+
+Uso:
+    python manage.py bench_imagenes                       # imágenes de media/productos
+    python manage.py bench_imagenes foto1.jpg foto2.png --max-kb 400
+    python manage.py bench_imagenes --formato jpeg --max-kb 300
+    python manage.py bench_imagenes --decodificacion --lado 1920   # Image.open+resize vs abrir_imagen
+"""
+import glob
+import io
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from miwebsite.image_utils import abrir_imagen, encode_to_budget
+
+
+def legacy_webp(img, max_bytes, storage):
+    """Bucle anterior de Producto.save (incluye los round trips al storage)."""
+    encodes = 0
+
+    def encode(imagen, quality):
+        nonlocal encodes
+        encodes += 1
+        buffer = io.BytesIO()
+        imagen.save(buffer, format="WEBP", quality=quality, method=6)
+        return buffer.getvalue()
+
+    path = 'bench/legacy.webp'
+    storage.save(path, ContentFile(encode(img, 80)))
+    size = storage.size(path)
+    if size > max_bytes:
+        for quality in (70, 60, 50, 40, 30):
+            data = encode(img, quality)
+            storage.delete(path)
+            storage.save(path, ContentFile(data))
+            size = storage.size(path)
+            if size <= max_bytes:
+                break
+    if size > max_bytes:
+        width, height = img.size
+        scale = 0.9
+        while size > max_bytes and min(width, height) > 200:
+            width, height = int(width * scale), int(height * scale)
+            data = encode(img.resize((width, height), Image.LANCZOS), 30)
+            storage.delete(path)
+            storage.save(path, ContentFile(data))
+            size = storage.size(path)
+            scale -= 0.05
+    storage.delete(path)
+    return size, encodes
+
+
+def legacy_jpeg(img, max_bytes):
+    """Bucle anterior de process_image_for_web."""
+    encodes = 0
+
+    def encode(imagen, quality):
+        nonlocal encodes
+        encodes += 1
+        buffer = io.BytesIO()
+        imagen.save(buffer, format='JPEG', quality=quality, optimize=True)
+        return buffer.getvalue()
+
+    quality = 85
+    while quality >= 30:
+        data = encode(img, quality)
+        if len(data) <= max_bytes:
+            break
+        quality -= 10
+    scale_factor = 0.8
+    while len(data) > max_bytes and scale_factor > 0.3:
+        img = img.resize((int(img.width * scale_factor), int(img.height * scale_factor)), Image.LANCZOS)
+        data = encode(img, 75)
+        scale_factor -= 0.1
+    return len(data), encodes
+
+
+class Command(BaseCommand):
+    help = "Compara codificaciones y tiempo del codificador por presupuesto contra los bucles lineales"
+
+    def add_arguments(self, parser):
+        parser.add_argument('imagenes', nargs='*', help="Rutas de imágenes (por defecto media/productos/*.jpg)")
+        parser.add_argument('--formato', choices=['webp', 'jpeg'], default='webp')
+        parser.add_argument('--max-kb', type=int, default=None, help="Presupuesto (por defecto 3072 webp / 2048 jpeg)")
+        parser.add_argument('--decodificacion', action='store_true',
+                            help="Medir sólo decodificación + reescalado (Image.open completo vs abrir_imagen)")
+        parser.add_argument('--lado', type=int, default=1920, help="Lado máximo para --decodificacion")
+
+    def handle(self, *args, **options):
+        rutas = options['imagenes'] or sorted(glob.glob(os.path.join(settings.MEDIA_ROOT, 'productos', '*.jpg')))
+        if options['decodificacion']:
+            return self.bench_decodificacion(rutas, options['lado'])
+        formato = options['formato']
+        max_kb = options['max_kb'] or (3072 if formato == 'webp' else 2048)
+        max_bytes = max_kb * 1024
+        storage = FileSystemStorage(location=tempfile.mkdtemp())
+
+        totales = {'legacy': [0, 0.0], 'nuevo': [0, 0.0]}
+        self.stdout.write(f"formato={formato} presupuesto={max_kb} KB")
+        self.stdout.write(f"{'imagen':40} {'legacy enc':>10} {'legacy s':>9} {'nuevo enc':>10} {'sondas':>7} {'nuevo s':>8} {'KB':>7}")
+
+        for ruta in rutas:
+            with Image.open(ruta) as original:
+                img = original.convert('RGB')
+
+            inicio = time.perf_counter()
+            if formato == 'webp':
+                _, legacy_enc = legacy_webp(img, max_bytes, storage)
+            else:
+                _, legacy_enc = legacy_jpeg(img, max_bytes)
+            legacy_s = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            if formato == 'webp':
+                resultado = encode_to_budget(img, 'WEBP', max_bytes, quality=80, min_quality=30, method=6)
+            else:
+                resultado = encode_to_budget(img, 'JPEG', max_bytes, quality=85, min_quality=30, optimize=True)
+            nuevo_s = time.perf_counter() - inicio
+
+            totales['legacy'][0] += legacy_enc
+            totales['legacy'][1] += legacy_s
+            totales['nuevo'][0] += resultado.encodes
+            totales['nuevo'][1] += nuevo_s
+            self.stdout.write(
+                f"{os.path.basename(ruta)[:40]:40} {legacy_enc:>10} {legacy_s:>9.2f} "
+                f"{resultado.encodes:>10} {resultado.sondas:>7} {nuevo_s:>8.2f} {len(resultado.data) / 1024:>7.0f}"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"total legacy: {totales['legacy'][0]} codificaciones, {totales['legacy'][1]:.2f}s | "
+            f"nuevo: {totales['nuevo'][0]} codificaciones, {totales['nuevo'][1]:.2f}s"
+        ))
+
+    def bench_decodificacion(self, rutas, lado):
+        """
+        Tiempo y mayor buffer decodificado (MB, 4 bytes/píxel como guarda
+        Pillow RGB/RGBA) al llevar cada imagen a `lado` px como máximo.
+        """
+        def mb(img):
+            return img.width * img.height * 4 / 2 ** 20
+
+        self.stdout.write(f"lado máximo={lado}")
+        self.stdout.write(f"{'imagen':40} {'antes s':>8} {'antes MB':>9} {'ahora s':>8} {'ahora MB':>9}")
+        totales = [0.0, 0.0]
+        for ruta in rutas:
+            inicio = time.perf_counter()
+            with Image.open(ruta) as original:
+                completa = original.convert('RGB')
+            pico_antes = mb(completa)
+            completa.thumbnail((lado, lado), Image.Resampling.LANCZOS, reducing_gap=None)
+            antes_s = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            with open(ruta, 'rb') as archivo:
+                reducida = abrir_imagen(archivo, max_size=(lado, lado)).convert('RGB')
+            ahora_s = time.perf_counter() - inicio
+
+            totales[0] += antes_s
+            totales[1] += ahora_s
+            self.stdout.write(
+                f"{os.path.basename(ruta)[:40]:40} {antes_s:>8.2f} {pico_antes:>9.0f} "
+                f"{ahora_s:>8.2f} {mb(reducida):>9.0f}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"total antes: {totales[0]:.2f}s | ahora: {totales[1]:.2f}s"))
@@ -0,0 +1,104 @@
+"""
+Benchmark del endpoint de votos: consultas por voto y latencia bajo
+votantes concurrentes.
+
+Uso (contra la base configurada, idealmente PostgreSQL):
+    python manage.py bench_votos --votantes 16 --votos 200
+    python manage.py bench_votos --ruta orm    # compara con la ruta ORM
+"""
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from catalogo.models import Producto, ProductoLike
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+class Command(BaseCommand):
+    help = "Mide consultas por voto y latencia p50/p99 de ProductoLike.votar con votantes concurrentes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--votantes', type=int, default=8, help="Hilos concurrentes")
+        parser.add_argument('--votos', type=int, default=100, help="Votos por votante")
+        parser.add_argument(
+            '--ruta', choices=['auto', 'sql', 'orm'], default='auto',
+            help="auto: según el motor; sql: sentencia única (PostgreSQL); orm: sentencias condicionales",
+        )
+
+    def handle(self, *args, **options):
+        votar = {
+            'auto': ProductoLike.votar,
+            'sql': ProductoLike._votar_postgresql,
+            'orm': ProductoLike._votar_orm,
+        }[options['ruta']]
+
+        producto = Producto.objects.create(titulo='bench-votos', descripcion='-', activo=False)
+        latencias = []
+        consultas = []
+        errores = []
+        lock = threading.Lock()
+
+        def votante(n):
+            propias_lat, propias_q = [], []
+            try:
+                for i in range(options['votos']):
+                    # Dos hilos comparten usuario para simular dobles clics
+                    usuario = f"bench_{n // 2}"
+                    tipo = 'like' if i % 3 else 'dislike'
+                    with CaptureQueriesContext(connection) as ctx:
+                        inicio = time.perf_counter()
+                        votar(producto.pk, usuario, tipo)
+                        propias_lat.append(time.perf_counter() - inicio)
+                    propias_q.append(len(ctx.captured_queries))
+            except Exception as exc:
+                errores.append(exc)
+            finally:
+                connection.close()
+                with lock:
+                    latencias.extend(propias_lat)
+                    consultas.extend(propias_q)
+
+        try:
+            hilos = [threading.Thread(target=votante, args=(n,)) for n in range(options['votantes'])]
+            inicio = time.perf_counter()
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            total = time.perf_counter() - inicio
+
+            producto.refresh_from_db()
+            likes = ProductoLike.objects.filter(producto=producto, tipo='like').count()
+            dislikes = ProductoLike.objects.filter(producto=producto, tipo='dislike').count()
+        finally:
+            producto.delete()
+
+        if not latencias:
+            self.stderr.write(f"Sin mediciones; errores: {errores[:3]}")
+            return
+
+        ms = [x * 1000 for x in latencias]
+        self.stdout.write(f"motor: {connection.vendor}  ruta: {options['ruta']}")
+        self.stdout.write(f"votos: {len(ms)}  errores: {len(errores)}  tiempo total: {total:.2f}s")
+        self.stdout.write(f"consultas/voto: {statistics.mean(consultas):.2f} (máx {max(consultas)})")
+        self.stdout.write(
+            f"latencia ms  p50={percentil(ms, 50):.2f}  p95={percentil(ms, 95):.2f}  "
+            f"p99={percentil(ms, 99):.2f}  máx={max(ms):.2f}"
+        )
+        self.stdout.write(f"votos/s: {len(ms) / total:.0f}")
+
+        coherente = (producto.likes_count, producto.dislikes_count) == (likes, dislikes)
+        estilo = self.style.SUCCESS if coherente else self.style.ERROR
+        self.stdout.write(estilo(
+            f"contadores {producto.likes_count}/{producto.dislikes_count} "
+            f"vs recuento {likes}/{dislikes}"
+        ))
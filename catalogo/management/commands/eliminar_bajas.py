@@ -0,0 +1,24 @@
+"""
+Borra los productos que el admin dejó marcados para eliminar.
+
+La acción "eliminar" del admin, por encima de CATALOGO_ADMIN_BORRADO_MAX
+productos, los oculta y marca con fecha_baja y los borra en un hilo de
+fondo. Si el proceso se reinicia antes (deploy, caída), las filas quedan
+ocultas y marcadas: este comando las borra, con sus archivos, de a
+LOTE_ELIMINACION por transacción. Conviene correrlo después de cada
+deploy o periódicamente (cron).
+
+Uso:
+    python manage.py eliminar_bajas
+"""
+from django.core.management.base import BaseCommand
+
+from catalogo.models import Producto
+
+
+class Command(BaseCommand):
+    help = "Borra los productos con baja pendiente (fecha_baja) que no llegó a borrar el admin"
+
+    def handle(self, *args, **options):
+        borrados = Producto.eliminar_bajas_pendientes()
+        self.stdout.write(self.style.SUCCESS(f"{borrados} producto(s) con baja pendiente eliminado(s)."))
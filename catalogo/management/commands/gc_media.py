@@ -0,0 +1,154 @@
+"""
+Recolector de archivos huérfanos del storage de media.
+
+Lista el prefijo (por defecto productos/) una sola vez, lo compara con
+todos los nombres referenciados (Producto.foto, sus variantes y los
+originales en cola de TrabajoImagen) y borra lo que sobra por lotes.
+
+- S3/MinIO (django-storages): una sola paginación de ListObjects (trae
+  tamaño y fecha) y DeleteObjects de a 1000 claves
+  (catalogo.almacenamiento.borrar_en_lote).
+- Disco local: un recorrido con os.scandir.
+- Otros storages: listdir recursivo y borrado uno a uno.
+
+No se borra nada modificado hace menos de --min-edad minutos: una subida
+en curso escribe el archivo antes de confirmar la fila en la base.
+
+Uso:
+    python manage.py gc_media --dry-run
+    python manage.py gc_media --min-edad 1440 --prefijo productos/
+"""
+import os
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import NamedTuple, Optional
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from catalogo.almacenamiento import borrar_en_lote, es_s3, prefijo_s3
+from catalogo.models import Producto, TrabajoImagen
+
+
+class Archivo(NamedTuple):
+    nombre: str
+    bytes: Optional[int]  # None si el storage no lo da al listar
+    modificado: Optional[datetime]
+
+
+def nombres_referenciados():
+    """Todos los nombres en uso: una consulta para Producto y otra para la cola."""
+    nombres = set()
+    for foto, variantes in Producto.objects.values_list('foto', 'variantes').iterator(chunk_size=2000):
+        if foto:
+            nombres.add(foto)
+        nombres.update((variantes or {}).values())
+    nombres.update(
+        TrabajoImagen.objects.filter(
+            estado__in=[TrabajoImagen.PENDIENTE, TrabajoImagen.PROCESANDO]
+        ).values_list('original', flat=True)
+    )
+    return nombres
+
+
+# --- Listado ---
+
+def listar_s3(storage, prefijo):
+    base = prefijo_s3(storage)
+    for objeto in storage.bucket.objects.filter(Prefix=base + prefijo):
+        yield Archivo(objeto.key[len(base):], objeto.size, objeto.last_modified)
+
+
+def listar_local(storage, prefijo):
+    raiz = storage.path('')
+    pendientes = [storage.path(prefijo)]
+    while pendientes:
+        try:
+            entradas = list(os.scandir(pendientes.pop()))
+        except FileNotFoundError:
+            continue
+        for entrada in entradas:
+            if entrada.is_dir(follow_symlinks=False):
+                pendientes.append(entrada.path)
+            elif entrada.is_file(follow_symlinks=False):
+                estado = entrada.stat()
+                nombre = os.path.relpath(entrada.path, raiz).replace(os.sep, '/')
+                yield Archivo(
+                    nombre, estado.st_size,
+                    datetime.fromtimestamp(estado.st_mtime, tz=dt_timezone.utc),
+                )
+
+
+def listar_generico(storage, prefijo):
+    directorios, archivos = storage.listdir(prefijo)
+    for nombre in archivos:
+        yield Archivo(f"{prefijo.rstrip('/')}/{nombre}", None, None)
+    for directorio in directorios:
+        yield from listar_generico(storage, f"{prefijo.rstrip('/')}/{directorio}")
+
+
+def listar(storage, prefijo):
+    if es_s3(storage):
+        return listar_s3(storage, prefijo)
+    try:
+        storage.path('')
+    except NotImplementedError:
+        return listar_generico(storage, prefijo)
+    return listar_local(storage, prefijo)
+
+
+class Command(BaseCommand):
+    help = "Borra del storage los archivos de media que ningún Producto referencia"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefijo', default='productos/', help="Prefijo del storage a revisar")
+        parser.add_argument(
+            '--min-edad', type=int, default=60,
+            help="No borrar archivos modificados hace menos de N minutos",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Sólo listar los huérfanos")
+
+    def handle(self, *args, **options):
+        storage = default_storage
+        inicio = time.perf_counter()
+        prefijo = options['prefijo']
+        limite = datetime.now(dt_timezone.utc) - timedelta(minutes=options['min_edad'])
+
+        en_uso = nombres_referenciados()
+
+        revisados = recientes = 0
+        huerfanos = []
+        for archivo in listar(storage, prefijo):
+            revisados += 1
+            if archivo.nombre in en_uso:
+                continue
+            # Los storages sin metadatos al listar sólo se consultan por huérfano
+            modificado = archivo.modificado or storage.get_modified_time(archivo.nombre)
+            if modificado.tzinfo is None:
+                modificado = modificado.replace(tzinfo=dt_timezone.utc)
+            if modificado > limite:
+                recientes += 1
+                continue
+            tamano = archivo.bytes if archivo.bytes is not None else storage.size(archivo.nombre)
+            huerfanos.append(archivo._replace(bytes=tamano))
+
+        total_bytes = sum(a.bytes for a in huerfanos)
+        if options['verbosity'] > 1 or options['dry_run']:
+            for archivo in huerfanos:
+                self.stdout.write(f"  {archivo.nombre} ({archivo.bytes / 1024:.0f} KB)")
+
+        errores = {}
+        if huerfanos and not options['dry_run']:
+            nombres = [a.nombre for a in huerfanos]
+            errores = borrar_en_lote(storage, nombres)
+            for nombre, error in errores.items():
+                self.stderr.write(f"No se pudo borrar {nombre}: {error}")
+
+        liberados = total_bytes - sum(a.bytes for a in huerfanos if a.nombre in errores)
+        accion = "se liberarían" if options['dry_run'] else "liberados"
+        self.stdout.write(self.style.SUCCESS(
+            f"{revisados} archivo(s) en '{prefijo}', {len(en_uso)} referenciado(s), "
+            f"{len(huerfanos)} huérfano(s) ({recientes} reciente(s) sin tocar), "
+            f"{len(errores)} error(es): {liberados / 2 ** 20:.1f} MB {accion} "
+            f"en {time.perf_counter() - inicio:.1f}s"
+        ))
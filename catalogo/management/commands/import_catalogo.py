@@ -0,0 +1,221 @@
+"""
+Importa productos en lote desde un manifiesto CSV o JSONL.
+
+Cada fila trae `titulo`, `descripcion`, `foto` (ruta relativa a
+--imagenes) y, opcionalmente, `activo` y `orden`. Las fotos se procesan
+en paralelo (ProcessPoolExecutor, mismo pipeline que Producto.save), una
+vez por foto distinta de cada lote, y los productos se insertan con
+bulk_create por lotes.
+
+El avance se guarda en `<manifiesto>.progreso` después de cada lote: si
+el comando se corta, volver a correrlo sigue desde la primera fila sin
+insertar.
+
+Uso:
+    python manage.py import_catalogo productos.csv --imagenes fotos/
+    python manage.py import_catalogo productos.jsonl --workers 8 --lote 500
+    python manage.py import_catalogo productos.csv --reiniciar   # ignorar el progreso
+"""
+import csv
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from catalogo.cache import incrementar_version_catalogo
+from catalogo.models import Producto
+from miwebsite.db import cerrar_conexiones
+from ._cache import agregar_opcion_cache_local, exigir_cache_compartida
+
+
+VERDADERO = ('true', '1', 't', 'si', 'sí', 'yes')
+
+
+def leer_manifiesto(ruta):
+    """Genera las filas (dict) del manifiesto, CSV o JSONL según la extensión."""
+    if ruta.lower().endswith(('.jsonl', '.ndjson')):
+        with open(ruta, encoding='utf-8') as archivo:
+            for linea in archivo:
+                if linea.strip():
+                    yield json.loads(linea)
+    else:
+        with open(ruta, encoding='utf-8-sig', newline='') as archivo:
+            yield from csv.DictReader(archivo)
+
+
+def procesar_foto(foto, directorio):
+    """
+    Corre en un proceso del pool: convierte la foto y la guarda en el
+    storage (deduplicada por contenido, ver Producto.procesar_imagen).
+
+    Retorna (campos, None, segundos) o (None, error, segundos), con los
+    campos de imagen que dejó Producto.procesar_imagen.
+    """
+    inicio = time.perf_counter()
+    try:
+        if not foto:
+            raise ValueError("fila sin 'foto'")
+        producto = Producto()
+        with open(os.path.join(directorio, foto), 'rb') as archivo:
+            producto.procesar_imagen(archivo)
+        campos = {
+            'foto': producto.foto.name,
+            'variantes': producto.variantes,
+            'estado_imagen': producto.estado_imagen,
+            'version_imagen': producto.version_imagen,
+        }
+        return campos, None, time.perf_counter() - inicio
+    except Exception as exc:
+        return None, f"{foto!r}: {exc}", time.perf_counter() - inicio
+
+
+def construir_producto(fila, campos):
+    """Producto sin guardar; ValueError si un campo de la fila no es válido."""
+    try:
+        orden = int(str(fila.get('orden') or 0).strip() or 0)
+    except (TypeError, ValueError):
+        raise ValueError(f"'orden' inválido: {fila.get('orden')!r}")
+    activo = fila.get('activo', True)
+    if isinstance(activo, str):
+        activo = activo.strip().lower() in VERDADERO if activo.strip() else True
+    return Producto(
+        titulo=(fila.get('titulo') or '')[:200],
+        descripcion=fila.get('descripcion') or '',
+        activo=bool(activo),
+        orden=orden,
+        **campos,
+    )
+
+
+class Command(BaseCommand):
+    help = "Importa productos desde un manifiesto CSV/JSONL procesando las fotos en paralelo"
+
+    def add_arguments(self, parser):
+        parser.add_argument('manifiesto', help="Archivo .csv o .jsonl")
+        parser.add_argument('--imagenes', help="Directorio de las fotos (por defecto, el del manifiesto)")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Procesos para las imágenes")
+        parser.add_argument('--lote', type=int, default=200, help="Filas por bulk_create")
+        parser.add_argument('--reiniciar', action='store_true', help="Ignorar el progreso guardado")
+        agregar_opcion_cache_local(parser)
+
+    def handle(self, *args, **options):
+        manifiesto = options['manifiesto']
+        if not os.path.exists(manifiesto):
+            raise CommandError(f"No existe {manifiesto}")
+        exigir_cache_compartida(options)
+        directorio = options['imagenes'] or os.path.dirname(os.path.abspath(manifiesto))
+        lote = max(1, options['lote'])
+
+        ruta_progreso = f"{manifiesto}.progreso"
+        hechas = 0 if options['reiniciar'] else self.leer_progreso(ruta_progreso, manifiesto)
+        if hechas:
+            self.stdout.write(f"Retomando desde la fila {hechas + 1} ({ruta_progreso}).")
+
+        filas = islice(leer_manifiesto(manifiesto), hechas, None)
+        insertados = errores = imagenes = 0
+        segundos_imagen = 0.0
+        inicio = time.perf_counter()
+
+        workers = max(1, options['workers'])
+        pool = None
+        if workers > 1:
+            # Cada proceso abre su propia conexión: no heredar las del padre
+            cerrar_conexiones()
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+
+        def procesar(bloque):
+            """
+            Lanza la conversión de las fotos del lote. Las filas que apuntan
+            a la misma foto se procesan una sola vez: sus productos todavía
+            no están en la base, así que la deduplicación por fila "lista"
+            de Producto.procesar_imagen no las vería.
+            """
+            fotos = list(dict.fromkeys(fila.get('foto') for fila in bloque))
+            mapear = pool.map if pool else map
+            return fotos, mapear(procesar_foto, fotos, [directorio] * len(fotos))
+
+        try:
+            # El lote siguiente ya se está procesando mientras se inserta el actual
+            bloque = list(islice(filas, lote))
+            resultados = procesar(bloque)
+            while bloque:
+                siguiente = list(islice(filas, lote))
+                resultados_siguiente = procesar(siguiente) if siguiente else None
+
+                fotos, convertidas = resultados
+                por_foto = dict(zip(fotos, convertidas))
+                imagenes += len(por_foto)
+                segundos_imagen += sum(segundos for _, _, segundos in por_foto.values())
+
+                productos = []
+                for numero, fila in enumerate(bloque, hechas + 1):
+                    campos, error, _ = por_foto[fila.get('foto')]
+                    if campos is not None:
+                        try:
+                            productos.append(construir_producto(fila, campos))
+                            continue
+                        except ValueError as exc:
+                            error = str(exc)
+                    errores += 1
+                    self.stderr.write(f"Fila {numero}: {error}")
+
+                with transaction.atomic():
+                    Producto.objects.bulk_create(productos, batch_size=lote)
+                hechas += len(bloque)
+                insertados += len(productos)
+                self.guardar_progreso(ruta_progreso, manifiesto, hechas)
+
+                transcurrido = time.perf_counter() - inicio
+                self.stdout.write(
+                    f"{hechas} filas | {insertados} insertadas, {errores} con error | "
+                    f"{insertados / transcurrido:.1f} filas/s"
+                )
+
+                bloque, resultados = siguiente, resultados_siguiente
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        # bulk_create no dispara post_save: invalidar a mano lo cacheado
+        if insertados:
+            incrementar_version_catalogo()
+
+        transcurrido = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"Importación terminada: {insertados} producto(s), {errores} error(es) en {transcurrido:.1f}s | "
+            f"{imagenes / transcurrido if transcurrido else 0:.1f} imágenes/s, "
+            f"{insertados / transcurrido if transcurrido else 0:.1f} filas/s "
+            f"({segundos_imagen / imagenes if imagenes else 0:.2f}s por imagen en cada worker)"
+        ))
+
+    # --- Progreso ---
+
+    @staticmethod
+    def huella(manifiesto):
+        """Identifica la versión del manifiesto (si cambia, el progreso no vale)."""
+        estado = os.stat(manifiesto)
+        return f"{estado.st_size}:{int(estado.st_mtime)}"
+
+    def leer_progreso(self, ruta, manifiesto):
+        try:
+            with open(ruta, encoding='utf-8') as archivo:
+                progreso = json.load(archivo)
+        except (OSError, ValueError):
+            return 0
+        if progreso.get('huella') != self.huella(manifiesto):
+            raise CommandError(
+                f"{manifiesto} cambió desde la última importación; usar --reiniciar "
+                f"(o borrar {ruta}) para empezar de nuevo"
+            )
+        return int(progreso.get('filas', 0))
+
+    def guardar_progreso(self, ruta, manifiesto, filas):
+        temporal = f"{ruta}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump({'filas': filas, 'huella': self.huella(manifiesto)}, archivo)
+        os.replace(temporal, ruta)
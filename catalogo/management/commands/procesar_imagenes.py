@@ -0,0 +1,108 @@
+"""
+Worker de la cola de imágenes (TrabajoImagen).
+
+Uso:
+    python manage.py procesar_imagenes                # todos los núcleos, sin fin
+    python manage.py procesar_imagenes --workers 2
+    python manage.py procesar_imagenes --una-vez      # vaciar la cola y salir
+
+Al terminar informa los tiempos por etapa del pipeline (ImageProcessor).
+El detalle por imagen se registra en el logger miwebsite.image_utils (DEBUG).
+"""
+import logging
+import multiprocessing
+import os
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from catalogo.models import TrabajoImagen
+from miwebsite.db import cerrar_conexiones
+from miwebsite.image_utils import ImageProcessor
+from ._cache import agregar_opcion_cache_local, exigir_cache_compartida
+
+logger = logging.getLogger(__name__)
+
+
+def bucle_trabajos(una_vez, intervalo):
+    """Toma y ejecuta trabajos hasta que no quede ninguno (o para siempre)."""
+    procesados = 0
+    while True:
+        trabajo = TrabajoImagen.tomar_pendiente()
+        if trabajo is None:
+            if una_vez:
+                return procesados
+            time.sleep(intervalo)
+            continue
+        try:
+            trabajo.ejecutar()
+        except Exception:
+            # Un trabajo roto no frena la cola: queda "procesando" y se
+            # reencola con --colgados-min
+            logger.exception("Falló el trabajo de imagen %s", trabajo.pk)
+            continue
+        procesados += 1
+
+
+def worker(una_vez, intervalo, resultados):
+    """Proceso hijo: al terminar le pasa al padre cuántas procesó y sus tiempos por etapa."""
+    procesados = bucle_trabajos(una_vez, intervalo)
+    resultados.put((os.getpid(), procesados, ImageProcessor.resumen()))
+
+
+class Command(BaseCommand):
+    help = "Procesa en segundo plano las fotos subidas con CATALOGO_IMAGENES_ASYNC"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help="Procesos en paralelo (por defecto, uno por núcleo)",
+        )
+        parser.add_argument('--una-vez', action='store_true', help="Salir cuando la cola esté vacía")
+        parser.add_argument('--intervalo', type=float, default=2.0, help="Segundos entre consultas a la cola vacía")
+        parser.add_argument(
+            '--colgados-min', type=int, default=15,
+            help="Reencolar trabajos 'procesando' sin cambios hace más de N minutos",
+        )
+        agregar_opcion_cache_local(parser)
+
+    def handle(self, *args, **options):
+        exigir_cache_compartida(options)
+        limite = timezone.now() - timedelta(minutes=options['colgados_min'])
+        reencolados = TrabajoImagen.objects.filter(
+            estado=TrabajoImagen.PROCESANDO, fecha_actualizacion__lt=limite
+        ).update(estado=TrabajoImagen.PENDIENTE)
+        if reencolados:
+            self.stdout.write(f"{reencolados} trabajo(s) colgado(s) reencolado(s).")
+
+        workers = max(1, options['workers'])
+        if workers == 1:
+            procesados = bucle_trabajos(options['una_vez'], options['intervalo'])
+            self.stdout.write(self.style.SUCCESS(f"{procesados} imagen(es) procesada(s)."))
+            self.stdout.write(f"Tiempos por etapa: {ImageProcessor.resumen()}")
+            return
+
+        # Cada proceso abre su propia conexión: no heredar las del padre
+        cerrar_conexiones()
+        contexto = multiprocessing.get_context('fork')
+        resultados = contexto.SimpleQueue()
+        procesos = [
+            contexto.Process(target=worker, args=(options['una_vez'], options['intervalo'], resultados))
+            for _ in range(workers)
+        ]
+        for proceso in procesos:
+            proceso.start()
+        self.stdout.write(f"{workers} worker(s) procesando imágenes...")
+        for proceso in procesos:
+            proceso.join()
+
+        # Un mensaje corto por worker: entra en el buffer del pipe, así que
+        # se puede leer después del join
+        total = 0
+        while not resultados.empty():
+            pid, procesados, resumen = resultados.get()
+            total += procesados
+            self.stdout.write(f"[pid {pid}] {resumen}")
+        self.stdout.write(self.style.SUCCESS(f"Cola de imágenes vacía: {total} imagen(es) procesada(s)."))
@@ -0,0 +1,32 @@
+"""
+Reconstruye los contadores desnormalizados de likes/dislikes de Producto.
+
+Uso:
+    python manage.py recalcular_contadores
+    python manage.py recalcular_contadores --ids 3 7 12
+"""
+from django.core.management.base import BaseCommand
+
+from catalogo.cache import invalidar_stats
+from catalogo.models import Producto
+
+
+class Command(BaseCommand):
+    help = "Recalcula likes_count/dislikes_count de Producto a partir de ProductoLike"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ids', nargs='+', type=int,
+            help="Recalcular sólo estos productos (por defecto, todos)",
+        )
+
+    def handle(self, *args, **options):
+        queryset = Producto.objects.all()
+        if options['ids']:
+            queryset = queryset.filter(pk__in=options['ids'])
+
+        actualizados = Producto.recalcular_contadores(queryset)
+        invalidar_stats(queryset.values_list('pk', flat=True))
+        self.stdout.write(self.style.SUCCESS(
+            f"Contadores recalculados para {actualizados} producto(s)."
+        ))
@@ -0,0 +1,120 @@
+"""
+Vuelve a procesar las fotos ya guardadas con el pipeline actual
+(ImageProcessor, perfil "producto").
+
+Sirve para migrar fotos anteriores a la conversión a WebP (los .jpg de
+media/productos/) y para aplicar cambios de IMAGEN_PERFILES /
+IMAGEN_FORMATOS. Las fotos ya generadas con la versión actual del
+pipeline no se leen; las de otra versión se reemplazan y las anteriores
+al pipeline sólo si el resultado pesa menos (ver
+Producto.reprocesar_imagen).
+
+Uso:
+    python manage.py reprocess_images --dry-run        # sólo estimar el ahorro
+    python manage.py reprocess_images --workers 4
+    python manage.py reprocess_images --ids 3 8 15 -v 2   # detalle por producto
+"""
+import multiprocessing
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from catalogo.models import Producto
+from miwebsite.db import cerrar_conexiones
+from miwebsite.image_utils import ImageProcessor
+from ._cache import agregar_opcion_cache_local, exigir_cache_compartida
+
+
+def reprocesar(producto, escribir):
+    """Corre en un proceso del pool. Retorna (pk, accion, antes, despues)."""
+    try:
+        accion, antes, despues = producto.reprocesar_imagen(escribir=escribir)
+    except Exception as exc:
+        return producto.pk, f"error: {exc}", 0, 0
+    return producto.pk, accion, antes, despues
+
+
+class Command(BaseCommand):
+    help = "Re-codifica las fotos existentes con el pipeline actual (sólo si cambia la versión o pesan menos)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="No escribir: sólo informar qué cambiaría")
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help="Procesos en paralelo (límite de concurrencia; por defecto, uno por núcleo)",
+        )
+        parser.add_argument('--ids', nargs='+', type=int, help="Sólo estos productos")
+        agregar_opcion_cache_local(parser)
+
+    def handle(self, *args, **options):
+        escribir = not options['dry_run']
+        workers = max(1, options['workers'])
+        if escribir:
+            exigir_cache_compartida(options)
+
+        productos = (
+            Producto.objects.filter(estado_imagen=Producto.ESTADO_LISTA)
+            .exclude(foto='')
+            .exclude(version_imagen=ImageProcessor('producto').version)
+            .only('id', 'titulo', 'foto', 'variantes', 'version_imagen')
+            .order_by('id')
+        )
+        if options['ids']:
+            productos = productos.filter(pk__in=options['ids'])
+
+        pool = None
+        if workers > 1:
+            # Los procesos se crean ahora, antes de abrir el cursor de
+            # .iterator(): ninguno hereda conexiones del padre
+            cerrar_conexiones()
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+            pool.submit(int).result()
+
+        acciones = Counter()
+        bytes_antes = bytes_despues = 0
+        inicio = time.perf_counter()
+
+        def registrar(resultado):
+            nonlocal bytes_antes, bytes_despues
+            pk, accion, antes, despues = resultado
+            if accion.startswith('error'):
+                acciones['error'] += 1
+                self.stderr.write(f"Producto {pk}: {accion}")
+                return
+            acciones[accion] += 1
+            bytes_antes += antes
+            # Lo que queda publicado: lo nuevo si se reemplaza, si no lo anterior
+            bytes_despues += despues if accion in ('reemplazada', 'reemplazaria') else antes
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Producto {pk}: {accion} ({antes / 1024:.0f} KB → {despues / 1024:.0f} KB)")
+
+        try:
+            if pool is None:
+                for producto in productos.iterator(chunk_size=200):
+                    registrar(reprocesar(producto, escribir))
+            else:
+                # Como mucho 2 trabajos en vuelo por worker: la memoria no
+                # crece con el tamaño del catálogo
+                en_vuelo = deque()
+                for producto in productos.iterator(chunk_size=200):
+                    en_vuelo.append(pool.submit(reprocesar, producto, escribir))
+                    if len(en_vuelo) >= workers * 2:
+                        registrar(en_vuelo.popleft().result())
+                while en_vuelo:
+                    registrar(en_vuelo.popleft().result())
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+        transcurrido = time.perf_counter() - inicio
+        total = sum(acciones.values())
+        ahorro = bytes_antes - bytes_despues
+        resumen = ", ".join(f"{n} {accion}" for accion, n in sorted(acciones.items())) or "nada que procesar"
+        self.stdout.write(self.style.SUCCESS(
+            f"{'[dry-run] ' if not escribir else ''}{total} foto(s) en {transcurrido:.1f}s: {resumen}. "
+            f"{bytes_antes / 2 ** 20:.1f} MB → {bytes_despues / 2 ** 20:.1f} MB "
+            f"(ahorro {ahorro / 2 ** 20:.1f} MB, {ahorro / bytes_antes * 100 if bytes_antes else 0:.0f}%)"
+        ))
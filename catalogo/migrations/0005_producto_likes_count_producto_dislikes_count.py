@@ -0,0 +1,41 @@
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def recalcular_contadores(apps, schema_editor):
+    Producto = apps.get_model('catalogo', 'Producto')
+    ProductoLike = apps.get_model('catalogo', 'ProductoLike')
+
+    conteos = (
+        ProductoLike.objects.values('producto_id')
+        .annotate(
+            likes=Count('id', filter=Q(tipo='like')),
+            dislikes=Count('id', filter=Q(tipo='dislike')),
+        )
+    )
+    for fila in conteos:
+        Producto.objects.filter(pk=fila['producto_id']).update(
+            likes_count=fila['likes'],
+            dislikes_count=fila['dislikes'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0004_remove_producto_precio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Me gusta'),
+        ),
+        migrations.AddField(
+            model_name='producto',
+            name='dislikes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='No me gusta'),
+        ),
+        migrations.RunPython(recalcular_contadores, migrations.RunPython.noop),
+    ]
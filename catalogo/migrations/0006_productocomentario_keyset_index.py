@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0005_producto_likes_count_producto_dislikes_count'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='productocomentario',
+            options={'ordering': ['-fecha_creacion', '-id'], 'verbose_name': 'Comentario', 'verbose_name_plural': 'Comentarios'},
+        ),
+        migrations.AddIndex(
+            model_name='productocomentario',
+            index=models.Index(fields=['producto', '-fecha_creacion', '-id'], name='catalogo_comentario_keyset'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0006_productocomentario_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Variantes'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0007_producto_variantes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='estado_imagen',
+            field=models.CharField(choices=[('lista', 'Lista'), ('procesando', 'Procesando'), ('error', 'Error')], default='lista', editable=False, max_length=12, verbose_name='Estado de la imagen'),
+        ),
+        migrations.CreateModel(
+            name='TrabajoImagen',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original', models.CharField(help_text='Subida sin procesar en el storage', max_length=255)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('listo', 'Listo'), ('error', 'Error')], default='pendiente', max_length=12)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_imagen', to='catalogo.producto')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de imagen',
+                'verbose_name_plural': 'Trabajos de imagen',
+                'indexes': [models.Index(fields=['estado', 'id'], name='catalogo_tr_estado_65e0f5_idx')],
+            },
+        ),
+    ]
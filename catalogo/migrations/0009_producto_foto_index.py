@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0008_trabajoimagen'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='producto',
+            name='foto',
+            field=models.ImageField(db_index=True, upload_to='productos/', verbose_name='Foto'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0009_producto_foto_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='version_imagen',
+            field=models.CharField(blank=True, default='', editable=False, max_length=12, verbose_name='Versión de imagen'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0010_producto_version_imagen'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['orden', '-fecha_creacion', '-id'], name='catalogo_producto_activos'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def completar_fecha_local(apps, schema_editor):
+    """
+    Día de Buenos Aires de cada comentario existente. Si un usuario ya
+    tenía más de uno el mismo día en un producto, sólo el primero lleva
+    la fecha (los demás quedan en NULL y no chocan con la restricción).
+    """
+    ProductoComentario = apps.get_model('catalogo', 'ProductoComentario')
+    zona = timezone.get_default_timezone()
+    anterior = None
+    pendientes = []
+    # En el orden del índice (producto, usuario_id, fecha_creacion): los
+    # repetidos quedan contiguos
+    comentarios = (
+        ProductoComentario.objects.order_by('producto_id', 'usuario_id', 'fecha_creacion', 'id')
+        .only('id', 'producto_id', 'usuario_id', 'fecha_creacion')
+    )
+    for comentario in comentarios.iterator(chunk_size=2000):
+        dia = timezone.localtime(comentario.fecha_creacion, zona).date()
+        clave = (comentario.producto_id, comentario.usuario_id, dia)
+        if clave == anterior:
+            continue
+        anterior = clave
+        comentario.fecha_local = dia
+        pendientes.append(comentario)
+        if len(pendientes) >= 2000:
+            ProductoComentario.objects.bulk_update(pendientes, ['fecha_local'])
+            pendientes = []
+    ProductoComentario.objects.bulk_update(pendientes, ['fecha_local'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0011_producto_activos_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productocomentario',
+            name='fecha_local',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(completar_fecha_local, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='productocomentario',
+            constraint=models.UniqueConstraint(fields=('producto', 'usuario_id', 'fecha_local'), name='catalogo_comentario_uno_por_dia'),
+        ),
+    ]
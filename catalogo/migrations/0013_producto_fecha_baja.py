@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalogo', '0012_productocomentario_fecha_local'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='fecha_baja',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Baja pendiente desde'),
+        ),
+    ]
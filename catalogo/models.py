@@ -1,190 +1,750 @@
+import hashlib
+import logging
+import os
+import threading
 import uuid
-import re
+from contextlib import contextmanager
+from datetime import datetime, time as dt_time, timedelta
 from io import BytesIO
 from PIL import Image
 
-from django.db import models
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models, connection, transaction, IntegrityError
+from django.db.models import Count, Exists, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
 from django.utils import timezone
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
 
-from django.db.models.signals import pre_save, post_delete
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 
+from miwebsite.image_utils import ImageProcessor
+
+from .almacenamiento import BorradorDiferido, borrar_en_lote
+from .cache import (
+    incrementar_version_catalogo,
+    incrementar_version_comentarios,
+    invalidar_stats,
+)
+
+logger = logging.getLogger(__name__)
+
 
 # ============================================================
-#  Función para generar nombres de archivo basados en el título
+#  Nombres de archivo por contenido (deduplicación)
 # ============================================================
 
-def clean_filename(text):
+def nombre_por_contenido(data, ext="webp"):
     """
-    Convierte el título del producto en un nombre seguro:
-    - minúsculas
-    - espacios -> guiones
-    - caracteres especiales -> eliminados
+    Nombre en storage derivado del hash de los bytes ya codificados:
+    la misma foto subida dos veces produce el mismo nombre, así que se
+    guarda una sola vez. Ejemplo: productos/3f2a...9c.webp
     """
-    text = text.lower()
-    text = re.sub(r'[^a-z0-9áéíóúñü ]', '', text)  # dejar solo letras/números/espacios
-    text = text.replace(" ", "-")
-    return text
+    return f"productos/{hashlib.sha256(data).hexdigest()[:40]}.{ext}"
 
 
-def generate_image_name(instance, ext="webp"):
+def guardar_por_contenido(nombre, data):
     """
-    Crea un nombre único basado en el título del producto.
-    Ejemplo: figura-gundam-azul_imagen.webp
+    Guarda `data` bajo `nombre` (derivado del contenido) sin consultar
+    antes si existe. Si ya existía, el storage lo sobrescribe con los
+    mismos bytes (S3) o guarda una copia renombrada (`<hash>_XXXX.webp`,
+    disco local) que se borra enseguida: un archivo con ese nombre tiene
+    el mismo contenido, así que se usa `nombre` y nunca la copia.
     """
-    base = clean_filename(instance.titulo)
-    filename = f"{base}_imagen.{ext}"
+    guardado = default_storage.save(nombre, ContentFile(data))
+    if guardado != nombre:
+        default_storage.delete(guardado)
+    return nombre
+
+
+# ============================================================
+#  Variantes responsive (srcset)
+# ============================================================
+
+# Anchos máximos de las variantes que se generan al subir una foto
+ANCHOS_VARIANTES = (320, 640, 1280)
 
-    # Verificar si ya existe en el storage → agregar sufijo único
-    storage_path = f"productos/{filename}"
-    if default_storage.exists(storage_path):
-        unique = uuid.uuid4().hex[:6]
-        filename = f"{base}_{unique}_imagen.{ext}"
 
-    return f"productos/{filename}"
+def nombre_variante(storage_path, ancho):
+    """productos/figura_imagen.webp → productos/figura_imagen_640w.webp"""
+    base, _ = os.path.splitext(storage_path)
+    # Las variantes siempre son WebP, sea cual sea el formato principal
+    return f"{base}_{ancho}w.webp"
+
+
+def generar_variantes(img, storage_path, ancho_principal, anchos=ANCHOS_VARIANTES):
+    """
+    Genera y guarda versiones WebP acotadas en ancho a partir de la imagen
+    ya decodificada. Cada variante se reduce desde la anterior (de mayor a
+    menor), así que el original se decodifica y recorre una sola vez. Los
+    nombres derivan del de la principal (ver guardar_por_contenido).
+
+    Retorna {"<ancho>": nombre_en_storage}, incluyendo la imagen principal.
+    """
+    variantes = {str(ancho_principal): storage_path}
+    actual = img
+    for ancho in sorted((a for a in anchos if a < ancho_principal), reverse=True):
+        alto = max(1, round(actual.height * ancho / actual.width))
+        actual = actual.resize((ancho, alto), Image.LANCZOS)
+
+        output = BytesIO()
+        actual.save(output, format="WEBP", quality=80, method=4)
+        variantes[str(ancho)] = guardar_por_contenido(nombre_variante(storage_path, ancho), output.getvalue())
+    return variantes
 
 
 # ============================================================
 #                         Modelo
 # ============================================================
 
+# Columnas que muestran las grillas del catálogo (bienvenida/_productos.html)
+COLUMNAS_GRILLA = ('titulo', 'descripcion', 'foto', 'variantes', 'orden', 'fecha_creacion')
+
+
 class Producto(models.Model):
     titulo = models.CharField(max_length=200, verbose_name="Título")
     descripcion = models.TextField(verbose_name="Descripción")
-    foto = models.ImageField(upload_to="productos/", verbose_name="Foto")
+    # Indexado: se busca por nombre para deduplicar y contar referencias
+    foto = models.ImageField(upload_to="productos/", db_index=True, verbose_name="Foto")
     activo = models.BooleanField(default=True, verbose_name="Activo")
     fecha_creacion = models.DateTimeField(default=timezone.now, verbose_name="Fecha de creación")
     orden = models.IntegerField(default=0, verbose_name="Orden")
 
+    # Contadores desnormalizados de ProductoLike (se mantienen en la misma
+    # transacción que el voto; `manage.py recalcular_contadores` los rehace)
+    likes_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Me gusta")
+    dislikes_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="No me gusta")
+
+    # {"<ancho en px>": "productos/..._640w.webp"} incluyendo la foto principal
+    variantes = models.JSONField(default=dict, blank=True, editable=False, verbose_name="Variantes")
+
+    ESTADO_LISTA = 'lista'
+    ESTADO_PROCESANDO = 'procesando'
+    ESTADO_ERROR = 'error'
+    ESTADO_IMAGEN_CHOICES = [
+        (ESTADO_LISTA, 'Lista'),
+        (ESTADO_PROCESANDO, 'Procesando'),
+        (ESTADO_ERROR, 'Error'),
+    ]
+    estado_imagen = models.CharField(
+        max_length=12, choices=ESTADO_IMAGEN_CHOICES, default=ESTADO_LISTA,
+        editable=False, verbose_name="Estado de la imagen",
+    )
+    # ImageProcessor.version con la que se generó la foto ('' = anterior
+    # al pipeline); `manage.py reprocess_images` rehace las desactualizadas
+    version_imagen = models.CharField(
+        max_length=12, blank=True, default='', editable=False, verbose_name="Versión de imagen",
+    )
+    # Baja masiva del admin pendiente: el producto ya está oculto y lo borra
+    # un hilo de fondo o, si el proceso se reinició antes, `manage.py
+    # eliminar_bajas` (la marca vive en la base, no en la memoria)
+    fecha_baja = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Baja pendiente desde")
+
     class Meta:
         verbose_name = "Producto"
         verbose_name_plural = "Productos"
         ordering = ["orden", "-fecha_creacion"]
+        indexes = [
+            # Listados del catálogo: WHERE activo ORDER BY orden,
+            # -fecha_creacion (-id desempata el cursor de api_productos).
+            # Parcial: los inactivos no ocupan lugar en el índice.
+            models.Index(
+                fields=['orden', '-fecha_creacion', '-id'],
+                condition=models.Q(activo=True),
+                name='catalogo_producto_activos',
+            ),
+        ]
 
     def __str__(self):
         return self.titulo
 
+    @classmethod
+    def activos(cls, *columnas):
+        """
+        Productos visibles en el orden del catálogo, leyendo sólo
+        `columnas` (por defecto, las que usa la grilla). El filtro y el
+        orden coinciden con el índice parcial catalogo_producto_activos.
+        """
+        return (
+            cls.objects.filter(activo=True)
+            .order_by('orden', '-fecha_creacion', '-id')
+            .only(*(columnas or COLUMNAS_GRILLA))
+        )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        instancia._recordar_foto()
+        return instancia
+
+    def _recordar_foto(self):
+        """
+        Guarda la foto tal como está en la base, para que pre_save detecte
+        el cambio sin volver a consultar la fila.
+        """
+        if "foto" in self.__dict__:
+            # variantes=None: diferida, pre_save la lee si hace falta
+            self._foto_inicial = (self.foto.name, self.__dict__.get("variantes"))
+
+    @property
+    def srcset(self):
+        """Valor para el atributo `srcset` de <img> ("url 320w, url 640w, ...")."""
+        if not self.variantes:
+            return ""
+        storage = self.foto.storage
+        return ", ".join(
+            f"{storage.url(nombre)} {ancho}w"
+            for ancho, nombre in sorted(self.variantes.items(), key=lambda kv: int(kv[0]))
+        )
+
+    def archivos_imagen(self):
+        """Nombres en storage de la foto y todas sus variantes."""
+        nombres = [self.foto.name] if self.foto and self.foto.name else []
+        nombres += [n for n in (self.variantes or {}).values() if n not in nombres]
+        return nombres
+
     # ============================================================
-    #  Procesamiento de imagen → conversión a WebP + 3MB máx
+    #  Contadores de votos
     # ============================================================
-    def save(self, *args, **kwargs):
-        try:
-            foto_field = getattr(self, "foto", None)
+    @classmethod
+    def aplicar_delta_votos(cls, producto_id, likes=0, dislikes=0):
+        """
+        Suma (o resta) votos a los contadores con un UPDATE atómico basado
+        en F(), sin leer la fila. Debe llamarse dentro de la misma
+        transacción que modifica ProductoLike.
+        """
+        cambios = {}
+        if likes:
+            cambios['likes_count'] = Greatest(F('likes_count') + likes, 0)
+        if dislikes:
+            cambios['dislikes_count'] = Greatest(F('dislikes_count') + dislikes, 0)
+        if cambios:
+            cls.objects.filter(pk=producto_id).update(**cambios)
+
+    @classmethod
+    def recalcular_contadores(cls, queryset=None):
+        """
+        Reconstruye likes_count/dislikes_count a partir de ProductoLike
+        con un único UPDATE correlacionado. Retorna la cantidad de filas.
+        """
+        def conteo(tipo):
+            return Subquery(
+                ProductoLike.objects
+                .filter(producto=OuterRef('pk'), tipo=tipo)
+                .order_by()
+                .values('producto')
+                .annotate(total=Count('id'))
+                .values('total')
+            )
+
+        queryset = cls.objects.all() if queryset is None else queryset
+        return queryset.update(
+            likes_count=Coalesce(conteo('like'), 0),
+            dislikes_count=Coalesce(conteo('dislike'), 0),
+        )
 
-            if foto_field and hasattr(foto_field, "file") and foto_field.file:
+    # ============================================================
+    #  Baja por lote (acción "eliminar" del admin)
+    # ============================================================
+    @classmethod
+    def eliminar_en_lote(cls, pks):
+        """
+        Borra los productos `pks` sin el trabajo por fila de las señales:
+        foto/variantes salen de un values_list, se encolan juntas para
+        después del COMMIT (un borrado por lote) y caché y versión del
+        catálogo se invalidan una sola vez.
 
-                # Leer imagen original
-                foto_field.file.seek(0)
-                img = Image.open(foto_field.file)
+        Retorna la cantidad de productos borrados.
+        """
+        filas = list(cls.objects.filter(pk__in=pks).values_list("pk", "foto", "variantes"))
+        if not filas:
+            return 0
+        ids = [pk for pk, _, _ in filas]
+        with transaction.atomic():
+            with senales_en_lote():
+                cls.objects.filter(pk__in=ids).delete()
+            programar_borrado([cls(pk=pk, foto=foto, variantes=variantes) for pk, foto, variantes in filas])
+        invalidar_stats(ids)
+        incrementar_version_catalogo()
+        return len(ids)
 
-                # Convertir modos
-                if img.mode in ("RGBA", "P"):
-                    img = img.convert("RGBA")
-                else:
-                    img = img.convert("RGB")
+    @classmethod
+    def marcar_baja(cls, pks):
+        """Oculta `pks` y los marca para borrar (ver eliminar_bajas_pendientes)."""
+        return cls.objects.filter(pk__in=pks).update(activo=False, fecha_baja=timezone.now())
 
-                # Convertir a WebP
-                output = BytesIO()
-                img.save(output, format="WEBP", quality=80, method=6)
-                output.seek(0)
+    @classmethod
+    def eliminar_bajas_pendientes(cls, pks=None):
+        """
+        Borra los productos marcados con marcar_baja (todos, o sólo los de
+        `pks`) de a LOTE_ELIMINACION por transacción. Los que volvieron a
+        activarse desde el admin no se tocan.
 
-                # Generar nombre basado en título
-                storage_path = generate_image_name(self, ext="webp")
+        Retorna la cantidad de productos borrados.
+        """
+        pendientes = cls.objects.filter(fecha_baja__isnull=False, activo=False)
+        if pks is not None:
+            pendientes = pendientes.filter(pk__in=pks)
+        ids = list(pendientes.order_by('pk').values_list('pk', flat=True))
+        return sum(
+            cls.eliminar_en_lote(ids[i:i + LOTE_ELIMINACION])
+            for i in range(0, len(ids), LOTE_ELIMINACION)
+        )
 
-                # Guardar en MinIO
-                default_storage.save(storage_path, ContentFile(output.read()))
+    # ============================================================
+    #  Procesamiento de imagen → conversión a WebP + 3MB máx
+    # ============================================================
+    def clean(self):
+        """Rechaza en el formulario subidas que el procesamiento no aceptaría."""
+        super().clean()
+        foto_field = getattr(self, "foto", None)
+        if not foto_field or foto_field._committed:
+            return
+        max_pixeles = ImageProcessor("producto").max_pixeles
+        try:
+            foto_field.file.seek(0)
+            with Image.open(foto_field.file) as img:
+                ancho, alto = img.size  # sólo lee el encabezado
+        except Exception:
+            return  # el ImageField ya valida que sea una imagen
+        finally:
+            foto_field.file.seek(0)
+        if ancho * alto > max_pixeles:
+            raise ValidationError({"foto": (
+                f"La imagen es demasiado grande ({ancho}x{alto}); "
+                f"máximo {max_pixeles // 1_000_000} megapíxeles."
+            )})
 
-                # Comprimir si pesa más de 3 MB
-                max_bytes = 3 * 1024 * 1024
+    def save(self, *args, **kwargs):
+        foto_field = getattr(self, "foto", None)
+
+        # Sólo se procesa una subida nueva: un archivo ya guardado en el
+        # storage no se vuelve a abrir ni a convertir en cada save()
+        if foto_field and not foto_field._committed:
+            if getattr(settings, 'CATALOGO_IMAGENES_ASYNC', False):
+                original = self._guardar_original_pendiente(foto_field)
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+                    TrabajoImagen.objects.create(producto=self, original=original)
+                self._recordar_foto()
+                return
+            # Sin try: si la imagen excede IMAGEN_MAX_PIXELES o no se puede
+            # decodificar, el error llega a quien llamó a save() (shell,
+            # scripts) y no se publica el original sin procesar
+            self.procesar_imagen(foto_field.file)
 
-                def current_size():
-                    try:
-                        return default_storage.size(storage_path)
-                    except Exception:
-                        return None
+        super().save(*args, **kwargs)
+        self._recordar_foto()
 
-                size = current_size()
+    def _guardar_original_pendiente(self, foto_field):
+        """
+        Guarda la subida tal cual en productos/originales/ y marca el
+        producto como "procesando"; la conversión la hace
+        `manage.py procesar_imagenes` fuera del request.
+
+        El original nunca se publica: `foto` vuelve a la foto procesada
+        anterior (o queda vacía en un alta, y la grilla muestra el
+        placeholder) hasta que el trabajo la reemplaza. Retorna el nombre
+        del original guardado.
+        """
+        nombre = os.path.basename(foto_field.name or "original")
+        guardado = default_storage.save(
+            f"productos/originales/{uuid.uuid4().hex[:8]}_{nombre}", foto_field.file
+        )
+        # La fila y no _foto_inicial: la instancia puede venir de un
+        # refresh_from_db o armada a mano (una consulta, sólo en este camino)
+        anterior = None
+        if self.pk:
+            anterior = Producto.objects.filter(pk=self.pk).values_list("foto", "variantes").first()
+        if anterior:
+            self.foto, self.variantes = anterior
+        else:
+            self.foto = ""
+            self.variantes = {}
+        self.estado_imagen = self.ESTADO_PROCESANDO
+        return guardado
+
+    def procesar_imagen(self, archivo):
+        """
+        Convierte `archivo` con el perfil "producto" de IMAGEN_PERFILES
+        (WebP, 3 MB máx), genera las variantes y deja `foto`/`variantes`
+        apuntando a lo guardado. No guarda el modelo.
+        """
+        # Perfil "producto" de IMAGEN_PERFILES: decodifica reducido al lado
+        # máximo, orienta, codifica y ajusta al peso, todo en memoria
+        procesador = ImageProcessor("producto")
+        self._guardar_procesada(procesador.process(archivo), procesador.version)
+
+    def _guardar_procesada(self, procesada, version):
+        """Guarda (o reutiliza) el resultado de ImageProcessor y sus variantes."""
+        # Nombre por hash del contenido: si otro Producto ya usa esta misma
+        # foto, se reutilizan archivo y variantes sin escribir nada
+        storage_path = nombre_por_contenido(procesada.data, procesada.extension)
+        existentes = (
+            Producto.objects.filter(foto=storage_path, estado_imagen=self.ESTADO_LISTA)
+            .values_list("variantes", flat=True)[:1]
+        )
+        if existentes:
+            self.foto = storage_path
+            self.variantes = existentes[0]
+        else:
+            # Sin fila lista puede igual existir el archivo (huérfano, otro
+            # worker o una fila del mismo lote aún sin insertar): se queda
+            # con el nombre por contenido, nunca con una copia renombrada
+            guardar_por_contenido(storage_path, procesada.data)
+
+            # Asignar el nombre ya guardado deja el archivo "committed":
+            # Django no vuelve a subir el original bajo productos/productos/
+            self.foto = storage_path
+
+            # Variantes para srcset, derivadas de la misma imagen decodificada
+            self.variantes = generar_variantes(procesada.image, storage_path, procesada.image.width)
+
+        self.estado_imagen = self.ESTADO_LISTA
+        self.version_imagen = version
+
+    def reprocesar_imagen(self, escribir=True):
+        """
+        Vuelve a pasar la foto guardada por el pipeline actual.
+
+        - Generada con la versión actual: no se toca (re-codificar lo ya
+          codificado sólo pierde calidad).
+        - Generada con otra versión (cambió IMAGEN_PERFILES/FORMATOS): se
+          reemplaza.
+        - Anterior al pipeline (version_imagen vacía, p. ej. los .jpg
+          originales): se reemplaza sólo si el resultado pesa menos; si no,
+          se queda como está pero con la versión actual.
+
+        Retorna (accion, bytes_antes, bytes_despues) con accion 'al dia',
+        'sin cambios', 'reemplazada' u 'omitida' (la foto cambió mientras
+        tanto). Con escribir=False no escribe nada ('reemplazaria').
+        """
+        procesador = ImageProcessor("producto")
+        if self.version_imagen == procesador.version:
+            return "al dia", 0, 0
+
+        anterior = Producto(pk=self.pk, foto=self.foto.name, variantes=self.variantes)
+        with default_storage.open(anterior.foto.name) as archivo:
+            datos = archivo.read()
+
+        procesada = procesador.process(BytesIO(datos))
+        antes, despues = len(datos), len(procesada.data)
+        if not self.version_imagen and despues >= antes:
+            if escribir:
+                # Se marca con la versión actual para no volver a
+                # decodificarla en cada corrida (si la foto no cambió)
+                Producto.objects.filter(pk=self.pk, foto=anterior.foto.name).update(
+                    version_imagen=procesador.version
+                )
+                self.version_imagen = procesador.version
+            return "sin cambios", antes, despues
+        if not escribir:
+            return "reemplazaria", antes, despues
+
+        nuevo = Producto(titulo=self.titulo)
+        nuevo._guardar_procesada(procesada, procesador.version)
+        if nuevo.foto.name == anterior.foto.name:
+            # Mismo contenido (p. ej. sólo cambió la versión)
+            Producto.objects.filter(pk=self.pk, foto=anterior.foto.name).update(
+                version_imagen=nuevo.version_imagen
+            )
+            return "sin cambios", antes, despues
+
+        # UPDATE condicional, como en TrabajoImagen.ejecutar
+        actualizado = Producto.objects.filter(pk=self.pk, foto=anterior.foto.name).update(
+            foto=nuevo.foto.name, variantes=nuevo.variantes, version_imagen=nuevo.version_imagen,
+        )
+        if actualizado:
+            # Como en TrabajoImagen.ejecutar: primero la versión, para que
+            # grilla, ETag y respaldo dejen de apuntar a la foto anterior
+            incrementar_version_catalogo()
+            borrar_archivos_sin_referencias([anterior], excluir=())
+            self.foto, self.variantes = nuevo.foto.name, nuevo.variantes
+            self.version_imagen = nuevo.version_imagen
+            return "reemplazada", antes, despues
+        borrar_archivos_sin_referencias([nuevo], excluir=())
+        return "omitida", antes, despues
 
-                # Reducir calidad progresivamente
-                if size and size > max_bytes:
-                    for quality in (70, 60, 50, 40, 30):
-                        temp = BytesIO()
-                        img.save(temp, format="WEBP", quality=quality, method=6)
-                        temp.seek(0)
 
-                        default_storage.delete(storage_path)
-                        default_storage.save(storage_path, ContentFile(temp.read()))
+# ============================================================
+#  Señales → borrar imagen al editar o eliminar producto
+# ============================================================
 
-                        size = current_size()
-                        if size and size <= max_bytes:
-                            break
+def borrar_archivos_sin_referencias(productos, storage=None, excluir=None):
+    """
+    Borra foto y variantes de `productos` salvo las fotos que otro
+    Producto todavía referencia: con nombres por contenido, varios
+    productos pueden compartir los mismos archivos. Una consulta para las
+    referencias y un borrado por lote (ver almacenamiento.borrar_en_lote).
 
-                # Redimensionar si aún supera el límite
-                if size and size > max_bytes:
-                    width, height = img.size
-                    scale = 0.9
-                    while size > max_bytes and min(width, height) > 200:
-                        width = int(width * scale)
-                        height = int(height * scale)
-                        resized = img.resize((width, height), Image.LANCZOS)
+    `excluir` son los pk cuyas filas no cuentan como referencia (por
+    defecto, los de `productos`: se están borrando o cambiando de foto).
 
-                        temp = BytesIO()
-                        resized.save(temp, format="WEBP", quality=30, method=6)
-                        temp.seek(0)
+    Retorna la cantidad de archivos borrados; los errores se registran.
+    """
+    storage = storage or default_storage
+    productos = [p for p in productos if p.foto and p.foto.name]
+    if not productos:
+        return 0
+    if excluir is None:
+        excluir = [p.pk for p in productos if p.pk]
+
+    en_uso = set(
+        Producto.objects
+        .filter(foto__in={p.foto.name for p in productos})
+        .exclude(pk__in=excluir)
+        .values_list("foto", flat=True)
+    )
+    nombres = []
+    for producto in productos:
+        if producto.foto.name not in en_uso:
+            nombres += producto.archivos_imagen()
+    errores = borrar_en_lote(storage, nombres)
+    for nombre, error in errores.items():
+        logger.warning("No se pudo borrar %s: %s", nombre, error)
+    return len(set(nombres)) - len(errores)
+
+
+# Los borrados que disparan las señales se hacen después del COMMIT y por
+# lotes en un hilo aparte: la consulta de referencias se hace recién
+# entonces (con la fila ya actualizada o borrada), así que no se excluye
+# ningún pk.
+borrador_media = BorradorDiferido(
+    lambda lote: borrar_archivos_sin_referencias(lote, excluir=())
+)
+
+
+def programar_borrado(productos):
+    """
+    Encola foto y variantes de `productos` para borrarlas cuando la
+    transacción actual confirme (si se revierte, no se borra nada).
+    """
+    archivos = [
+        Producto(pk=p.pk, foto=p.foto.name, variantes=p.variantes)
+        for p in productos if p.foto and p.foto.name
+    ]
+    if archivos:
+        transaction.on_commit(lambda: borrador_media.programar(archivos))
 
-                        default_storage.delete(storage_path)
-                        default_storage.save(storage_path, ContentFile(temp.read()))
 
-                        size = current_size()
-                        scale -= 0.05
+# Bajas masivas del admin: fuera del request, de a LOTE_ELIMINACION
+# productos por transacción. Lo que el hilo no llegue a borrar (deploy,
+# reinicio) sigue marcado con fecha_baja: no se vacía al salir, lo recoge
+# `manage.py eliminar_bajas`.
+LOTE_ELIMINACION = 200
 
-                # Reemplazar nombre final
-                self.foto.name = storage_path
+eliminador_productos = BorradorDiferido(
+    lambda pks: Producto.eliminar_bajas_pendientes(pks),
+    lote=10000, nombre='eliminador-productos', vaciar_al_salir=False,
+)
 
-        except Exception:
-            pass
 
-        super().save(*args, **kwargs)
+_estado_senales = threading.local()
 
 
-# ============================================================
-#  Señales → borrar imagen al editar o eliminar producto
-# ============================================================
+@contextmanager
+def senales_en_lote():
+    """
+    Dentro del bloque, las señales post_delete de Producto no encolan
+    archivos ni invalidan caché por fila: lo hace quien borra, una vez
+    (ver Producto.eliminar_en_lote).
+    """
+    anterior = getattr(_estado_senales, "en_lote", False)
+    _estado_senales.en_lote = True
+    try:
+        yield
+    finally:
+        _estado_senales.en_lote = anterior
+
+
+def _en_lote():
+    return getattr(_estado_senales, "en_lote", False)
+
 
 @receiver(pre_save, sender=Producto)
 def delete_old_file_on_change(sender, instance, **kwargs):
     """
-    Cuando se reemplaza la foto de un Producto,
-    borrar el archivo anterior del storage (MinIO).
+    Cuando se reemplaza la foto de un Producto, borrar el archivo anterior
+    del storage (MinIO) si ningún otro Producto lo usa, una vez confirmado
+    el cambio. La foto anterior sale del estado recordado al leer la fila
+    (from_db): editar sólo `orden` o `activo` no consulta nada.
     """
-    if not instance.pk:
-        return
+    if not instance.pk or "foto" not in instance.__dict__:
+        return  # alta, o foto diferida (only/defer) y por lo tanto sin cambios
 
-    try:
-        old = sender.objects.get(pk=instance.pk)
-    except sender.DoesNotExist:
-        return
+    foto_anterior, variantes_anteriores = getattr(instance, "_foto_inicial", (None, None))
+    if foto_anterior is not None and foto_anterior == instance.foto.name:
+        return  # el caso habitual: la foto no cambió
+
+    if foto_anterior is None or variantes_anteriores is None:
+        # Instancia armada a mano con pk, o variantes diferidas
+        fila = sender.objects.filter(pk=instance.pk).values_list("foto", "variantes").first()
+        if fila is None:
+            return
+        foto_anterior, variantes_anteriores = fila
 
-    if old.foto and old.foto != instance.foto:
-        storage = old.foto.storage
-        name = old.foto.name
-        if name:
-            storage.delete(name)
+    if foto_anterior and foto_anterior != instance.foto.name:
+        programar_borrado([Producto(pk=instance.pk, foto=foto_anterior, variantes=variantes_anteriores)])
 
 
 @receiver(post_delete, sender=Producto)
 def delete_file_on_delete(sender, instance, **kwargs):
     """
-    Cuando se borra un Producto, borrar también el archivo
-    de la foto en MinIO.
+    Cuando se borra un Producto, borrar también el archivo de la foto en
+    MinIO (si ningún otro Producto lo usa) al confirmar la transacción.
     """
-    if instance.foto:
-        storage = instance.foto.storage
-        name = instance.foto.name
-        if name:
-            storage.delete(name)
+    if instance.foto and not _en_lote():
+        programar_borrado([instance])
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def invalidar_stats_on_delete(sender, instance, **kwargs):
+    """
+    Descartar los contadores cacheados de un Producto borrado o editado
+    (si se ocultó, las stats dejan de servirse en vez de esperar al TTL).
+    """
+    if not _en_lote():
+        invalidar_stats([instance.pk])
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+def incrementar_version_on_change(sender, instance, **kwargs):
+    """
+    Cualquier alta, edición o baja de un Producto invalida lo cacheado a
+    partir del listado (ver catalogo.cache.version_catalogo).
+    """
+    if not _en_lote():
+        incrementar_version_catalogo()
+
+
+# ============================================================
+#  Modelo: TrabajoImagen (cola de procesamiento fuera del request)
+# ============================================================
+
+class TrabajoImagen(models.Model):
+    """
+    Conversión pendiente de la foto original de un Producto. La crea
+    Producto.save cuando CATALOGO_IMAGENES_ASYNC está activo y la consume
+    `manage.py procesar_imagenes` (uno o más procesos worker).
+    """
+    PENDIENTE = 'pendiente'
+    PROCESANDO = 'procesando'
+    LISTO = 'listo'
+    ERROR = 'error'
+    ESTADO_CHOICES = [
+        (PENDIENTE, 'Pendiente'),
+        (PROCESANDO, 'Procesando'),
+        (LISTO, 'Listo'),
+        (ERROR, 'Error'),
+    ]
+    MAX_INTENTOS = 3
+
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='trabajos_imagen')
+    original = models.CharField(max_length=255, help_text="Subida sin procesar en el storage")
+    estado = models.CharField(max_length=12, choices=ESTADO_CHOICES, default=PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Trabajo de imagen"
+        verbose_name_plural = "Trabajos de imagen"
+        indexes = [
+            models.Index(fields=['estado', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.producto_id} - {self.original} ({self.estado})"
+
+    @classmethod
+    def tomar_pendiente(cls):
+        """
+        Reserva el trabajo pendiente más antiguo y lo marca "procesando".
+        Con SKIP LOCKED varios workers toman trabajos distintos sin esperar.
+        """
+        with transaction.atomic():
+            pendientes = cls.objects.filter(estado=cls.PENDIENTE).order_by('id')
+            if connection.features.has_select_for_update_skip_locked:
+                pendientes = pendientes.select_for_update(skip_locked=True)
+            trabajo = pendientes.first()
+            if trabajo is None:
+                return None
+            trabajo.estado = cls.PROCESANDO
+            trabajo.intentos += 1
+            trabajo.save(update_fields=['estado', 'intentos', 'fecha_actualizacion'])
+        return trabajo
+
+    def _producto_vigente(self):
+        """
+        El Producto de este trabajo, salvo que lo hayan borrado o que haya
+        un trabajo más nuevo (volvieron a subir otra foto).
+        """
+        mas_nuevos = TrabajoImagen.objects.filter(producto=OuterRef('pk'), pk__gt=self.pk)
+        return Producto.objects.filter(pk=self.producto_id).exclude(Exists(mas_nuevos))
+
+    def ejecutar(self):
+        """
+        Procesa la foto original y la publica en el Producto. La foto que
+        se venía mostrando se borra recién después del reemplazo.
+        """
+        try:
+            producto = self._producto_vigente().first()
+            if producto is None:
+                # Producto borrado (y con él, este trabajo) o foto
+                # reemplazada mientras esperaba: el original ya no sirve
+                default_storage.delete(self.original)
+                self._terminar(self.LISTO)
+                return
+
+            anterior = Producto(pk=producto.pk, foto=producto.foto.name, variantes=producto.variantes)
+            with default_storage.open(self.original) as archivo:
+                producto.procesar_imagen(archivo)
+
+            # UPDATE condicional: si la foto cambió durante la conversión,
+            # no pisar la nueva y descartar lo generado
+            actualizado = self._producto_vigente().filter(foto=anterior.foto.name).update(
+                foto=producto.foto.name,
+                variantes=producto.variantes,
+                estado_imagen=Producto.ESTADO_LISTA,
+                version_imagen=producto.version_imagen,
+            )
+            if actualizado:
+                # Primero la versión: lo cacheado deja de apuntar a la
+                # foto anterior antes de borrarla
+                incrementar_version_catalogo()
+                if anterior.foto.name != producto.foto.name:
+                    borrar_archivos_sin_referencias([anterior], excluir=())
+            else:
+                # Lo generado puede estar en uso por otro Producto (o por
+                # este mismo, si volvieron a subir la misma foto)
+                borrar_archivos_sin_referencias([producto], excluir=())
+            default_storage.delete(self.original)
+            self._terminar(self.LISTO)
+
+        except Exception as exc:
+            if self.intentos >= self.MAX_INTENTOS:
+                # Sigue mostrando la foto anterior; el estado lo ve el admin
+                self._producto_vigente().update(estado_imagen=Producto.ESTADO_ERROR)
+                self._terminar(self.ERROR, repr(exc))
+            else:
+                self._terminar(self.PENDIENTE, repr(exc))
+
+    def _terminar(self, estado, error=''):
+        """
+        Con UPDATE y no save(): si borraron el Producto mientras se
+        procesaba, el CASCADE ya se llevó este trabajo y no hay nada que
+        marcar.
+        """
+        self.estado = estado
+        self.error = error
+        TrabajoImagen.objects.filter(pk=self.pk).update(
+            estado=estado, error=error, fecha_actualizacion=timezone.now()
+        )
 
 
 # ============================================================
@@ -214,45 +774,219 @@ class ProductoLike(models.Model):
     def __str__(self):
         return f"{self.usuario_id} - {self.producto.titulo} ({self.tipo})"
 
+    # ============================================================
+    #  Registrar voto (insertar / cambiar / quitar) + contadores
+    # ============================================================
+    @classmethod
+    def votar(cls, producto_id, usuario_id, tipo):
+        """
+        Aplica el voto `tipo` del usuario sobre el producto:
+        - sin voto previo → lo crea ('created')
+        - voto del otro tipo → lo cambia ('updated')
+        - voto del mismo tipo → lo quita ('removed')
+
+        Actualiza los contadores del producto en la misma transacción.
+        Retorna (accion, likes, dislikes) o None si el producto no existe.
+        En PostgreSQL todo se resuelve en una sola sentencia.
+        """
+        if connection.vendor == 'postgresql':
+            return cls._votar_postgresql(producto_id, usuario_id, tipo)
+        return cls._votar_orm(producto_id, usuario_id, tipo)
+
+    @classmethod
+    def _votar_postgresql(cls, producto_id, usuario_id, tipo):
+        otro = 'dislike' if tipo == 'like' else 'like'
+        sql = VOTO_SQL_POSTGRESQL.format(
+            voto=connection.ops.quote_name(cls._meta.db_table),
+            producto=connection.ops.quote_name(Producto._meta.db_table),
+            col=f'{tipo}s_count',
+            otro=f'{otro}s_count',
+        )
+        params = {'producto_id': producto_id, 'usuario_id': usuario_id, 'tipo': tipo}
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            fila = cursor.fetchone()
+        if fila is None:
+            return None
+        likes, dislikes, accion = fila
+        return accion, likes, dislikes
+
+    @classmethod
+    def _votar_orm(cls, producto_id, usuario_id, tipo):
+        """Misma semántica que la versión SQL, con sentencias condicionales."""
+        otro = 'dislike' if tipo == 'like' else 'like'
+        delta = {'like': 0, 'dislike': 0}
+        voto = cls.objects.filter(producto_id=producto_id, usuario_id=usuario_id)
+
+        with transaction.atomic():
+            if voto.filter(tipo=tipo).delete()[0]:
+                accion = 'removed'
+                delta[tipo] -= 1
+            elif voto.exclude(tipo=tipo).update(tipo=tipo):
+                accion = 'updated'
+                delta[tipo] += 1
+                delta[otro] -= 1
+            elif not Producto.objects.filter(pk=producto_id).exists():
+                return None
+            else:
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(
+                            producto_id=producto_id, usuario_id=usuario_id, tipo=tipo
+                        )
+                    accion = 'created'
+                    delta[tipo] += 1
+                except IntegrityError:
+                    # Otro request del mismo usuario ganó la carrera
+                    accion = 'unchanged'
+
+            Producto.aplicar_delta_votos(
+                producto_id, likes=delta['like'], dislikes=delta['dislike']
+            )
+            likes, dislikes = (
+                Producto.objects.filter(pk=producto_id)
+                .values_list('likes_count', 'dislikes_count')
+                .get()
+            )
+        return accion, likes, dislikes
+
+
+# Borrado, cambio e inserción son mutuamente excluyentes; cada CTE sólo
+# reporta una fila si realmente modificó ProductoLike, así que el delta
+# aplicado a los contadores siempre coincide con lo que cambió (incluso
+# con dobles clics concurrentes: el perdedor del ON CONFLICT no suma).
+VOTO_SQL_POSTGRESQL = """
+WITH borrado AS (
+    DELETE FROM {voto}
+    WHERE producto_id = %(producto_id)s AND usuario_id = %(usuario_id)s AND tipo = %(tipo)s
+    RETURNING 1
+),
+cambiado AS (
+    UPDATE {voto} SET tipo = %(tipo)s
+    WHERE producto_id = %(producto_id)s AND usuario_id = %(usuario_id)s AND tipo <> %(tipo)s
+    RETURNING 1
+),
+creado AS (
+    INSERT INTO {voto} (producto_id, usuario_id, tipo, fecha_creacion)
+    SELECT %(producto_id)s, %(usuario_id)s, %(tipo)s, NOW()
+    WHERE NOT EXISTS (SELECT 1 FROM borrado)
+      AND NOT EXISTS (SELECT 1 FROM cambiado)
+      AND EXISTS (SELECT 1 FROM {producto} WHERE id = %(producto_id)s)
+    ON CONFLICT (producto_id, usuario_id) DO NOTHING
+    RETURNING 1
+),
+efecto AS (
+    SELECT 'removed' AS accion, -1 AS d_tipo, 0 AS d_otro FROM borrado
+    UNION ALL SELECT 'updated', 1, -1 FROM cambiado
+    UNION ALL SELECT 'created', 1, 0 FROM creado
+)
+UPDATE {producto} SET
+    {col} = GREATEST({col} + COALESCE((SELECT d_tipo FROM efecto), 0), 0),
+    {otro} = GREATEST({otro} + COALESCE((SELECT d_otro FROM efecto), 0), 0)
+WHERE id = %(producto_id)s
+RETURNING likes_count, dislikes_count, COALESCE((SELECT accion FROM efecto), 'unchanged')
+"""
+
 
 # ============================================================
 #  Modelo: ProductoComentario
 # ============================================================
 
+def dia_local(momento=None):
+    """Fecha en la zona del sitio (TIME_ZONE, Buenos Aires) de `momento` o de ahora."""
+    return timezone.localtime(momento, timezone.get_default_timezone()).date()
+
+
+def rango_del_dia(dia):
+    """
+    [inicio, fin) en UTC del día `dia` de Buenos Aires. Filtrar
+    fecha_creacion con >= / < usa el índice por rango; `__date` le aplica
+    una conversión de zona a la columna y no.
+    """
+    zona = timezone.get_default_timezone()
+    inicio = datetime.combine(dia, dt_time.min, tzinfo=zona)
+    fin = datetime.combine(dia + timedelta(days=1), dt_time.min, tzinfo=zona)
+    return inicio, fin
+
+
 class ProductoComentario(models.Model):
     """
     Comentarios para productos.
     Restricciones:
     - Máximo 200 caracteres
-    - Solo 1 comentario por usuario/día por producto
+    - Solo 1 comentario por usuario/día por producto (día de Buenos
+      Aires; lo garantiza la restricción única sobre `fecha_local`)
     - Puede eliminarse pero no editarse (inmutable después de crear)
     """
     producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='comentarios')
     usuario_id = models.CharField(max_length=100, help_text="ID único del usuario o IP para anónimos")
     texto = models.CharField(max_length=200)
     fecha_creacion = models.DateTimeField(auto_now_add=True)
+    # Día local de fecha_creacion. NULL en los comentarios repetidos
+    # anteriores a la restricción (ver migración 0012), que no cuentan
+    fecha_local = models.DateField(null=True, editable=False)
     
     class Meta:
         verbose_name = "Comentario"
         verbose_name_plural = "Comentarios"
-        ordering = ['-fecha_creacion']
+        ordering = ['-fecha_creacion', '-id']
         indexes = [
             models.Index(fields=['producto', 'usuario_id', 'fecha_creacion']),
+            # Paginación por cursor en api_comentarios_lista
+            models.Index(
+                fields=['producto', '-fecha_creacion', '-id'],
+                name='catalogo_comentario_keyset',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['producto', 'usuario_id', 'fecha_local'],
+                name='catalogo_comentario_uno_por_dia',
+            ),
         ]
     
     def __str__(self):
         return f"{self.usuario_id} - {self.producto.titulo}: {self.texto[:50]}"
+
+    def save(self, *args, **kwargs):
+        if self.fecha_local is None and self._state.adding:
+            self.fecha_local = dia_local(self.fecha_creacion)
+        super().save(*args, **kwargs)
     
     @classmethod
     def puede_comentar_hoy(cls, producto_id, usuario_id):
         """
         Verifica si el usuario ya comentó hoy en este producto.
         Retorna True si PUEDE comentar (no hay comentario de hoy).
+
+        Sólo informativo: dos requests simultáneos pueden pasar los dos;
+        para crear usar `comentar`.
         """
-        hoy = timezone.now().date()
+        inicio, fin = rango_del_dia(dia_local())
         existe = cls.objects.filter(
             producto_id=producto_id,
             usuario_id=usuario_id,
-            fecha_creacion__date=hoy
+            fecha_creacion__gte=inicio,
+            fecha_creacion__lt=fin,
         ).exists()
         return not existe
+
+    @classmethod
+    def comentar(cls, producto_id, usuario_id, texto):
+        """
+        Crea el comentario del día. Retorna None si el usuario ya comentó
+        hoy en el producto: el INSERT choca con la restricción única, así
+        que no hay consulta previa ni carrera entre requests simultáneos.
+        """
+        try:
+            with transaction.atomic():
+                return cls.objects.create(producto_id=producto_id, usuario_id=usuario_id, texto=texto)
+        except IntegrityError:
+            return None
+
+
+@receiver(post_save, sender=ProductoComentario)
+@receiver(post_delete, sender=ProductoComentario)
+def incrementar_version_comentarios_on_change(sender, instance, **kwargs):
+    """Invalida el ETag de la lista de comentarios del producto."""
+    incrementar_version_comentarios(instance.producto_id)
@@ -0,0 +1,51 @@
+"""
+Paginación por cursor (keyset) para las APIs del catálogo.
+
+Un cursor es la clave de ordenamiento de la última fila entregada,
+serializada como valores separados por coma, p.ej.
+`2025-11-17T16:00:00.123456+00:00,42`. La página siguiente se obtiene
+buscando en el índice desde esa clave, sin OFFSET ni COUNT(*).
+"""
+from datetime import datetime
+
+from django.utils.dateparse import parse_datetime
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def format_cursor(*valores):
+    return ','.join(
+        v.isoformat() if isinstance(v, datetime) else str(v) for v in valores
+    )
+
+
+def parse_cursor(texto, tipos):
+    """
+    Convierte el texto del cursor a una tupla según `tipos` (int o datetime).
+    Lanza CursorInvalido si no coincide.
+    """
+    # Un '+' sin escapar en la query string llega como espacio
+    partes = texto.replace(' ', '+').split(',')
+    if len(partes) != len(tipos):
+        raise CursorInvalido(texto)
+
+    valores = []
+    for parte, tipo in zip(partes, tipos):
+        try:
+            valor = parse_datetime(parte) if tipo is datetime else tipo(parte)
+        except ValueError:
+            valor = None
+        if valor is None:
+            raise CursorInvalido(texto)
+        valores.append(valor)
+    return tuple(valores)
+
+
+def parse_limit(texto, default, maximo):
+    """Tamaño de página pedido, acotado a [1, maximo]."""
+    try:
+        return max(1, min(int(texto), maximo)) if texto else default
+    except ValueError:
+        return default
@@ -0,0 +1,129 @@
+"""
+Respaldo del catálogo activo ("último catálogo bueno").
+
+Cuando la versión del catálogo (catalogo.cache.version_catalogo) cambia y
+la base responde, `actualizar()` relee los productos activos (las
+columnas que usan la grilla y api_productos) y los guarda en memoria.
+Con la base caída o el circuito abierto (miwebsite.db.circuito_db), la
+home y api_productos sirven `productos()` en lugar de un catálogo vacío.
+
+Con CATALOGO_RESPALDO_ARCHIVO el respaldo también se escribe en disco:
+lo comparten los workers del mismo servidor y sobrevive a un reinicio,
+así que un proceso que arranca con la base caída también tiene qué
+mostrar.
+"""
+import json
+import logging
+import os
+import threading
+from typing import NamedTuple
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache import version_catalogo
+from .models import Producto
+
+logger = logging.getLogger(__name__)
+
+COLUMNAS = ('id', 'titulo', 'descripcion', 'foto', 'variantes', 'orden', 'fecha_creacion')
+
+
+class Respaldo(NamedTuple):
+    version: int
+    fecha: str  # ISO 8601, cuándo se leyó de la base
+    productos: list  # dicts con COLUMNAS (fecha_creacion en ISO 8601)
+
+
+_lock = threading.Lock()
+_respaldo = None
+
+
+def _ruta():
+    return getattr(settings, 'CATALOGO_RESPALDO_ARCHIVO', '')
+
+
+def actualizar():
+    """
+    Relee el catálogo activo si cambió desde el último respaldo (una
+    consulta por versión; si no cambió, ninguna). Puede levantar
+    DatabaseError: llamarlo dentro de circuito_db.proteger().
+    """
+    global _respaldo
+    version = version_catalogo()
+    if _respaldo is not None and _respaldo.version == version:
+        return False
+
+    limite = getattr(settings, 'CATALOGO_RESPALDO_MAX', 1000)
+    productos = list(Producto.activos(*COLUMNAS[1:]).values(*COLUMNAS)[:limite])
+    for producto in productos:
+        producto['fecha_creacion'] = producto['fecha_creacion'].isoformat()
+    nuevo = Respaldo(version, timezone.now().isoformat(), productos)
+    with _lock:
+        _respaldo = nuevo
+    _guardar_archivo(nuevo)
+    return True
+
+
+def leer():
+    """El último Respaldo (de memoria o, si no hay, del archivo) o None."""
+    global _respaldo
+    if _respaldo is None:
+        respaldo = _leer_archivo()
+        with _lock:
+            if _respaldo is None:
+                _respaldo = respaldo
+    return _respaldo
+
+
+def productos(respaldo=None):
+    """Producto sin guardar, en el orden del catálogo; None si no hay respaldo."""
+    respaldo = respaldo or leer()
+    if respaldo is None:
+        return None
+    return [
+        Producto(**{**fila, 'fecha_creacion': parse_datetime(fila['fecha_creacion'])})
+        for fila in respaldo.productos
+    ]
+
+
+def descartar():
+    """Olvida el respaldo (memoria y archivo)."""
+    global _respaldo
+    with _lock:
+        _respaldo = None
+    ruta = _ruta()
+    if ruta:
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+
+def _guardar_archivo(respaldo):
+    ruta = _ruta()
+    if not ruta:
+        return
+    # Temporal por proceso + os.replace: ningún worker lee un archivo a medias
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    try:
+        with open(temporal, 'w', encoding='utf-8') as archivo:
+            json.dump(respaldo._asdict(), archivo, ensure_ascii=False)
+        os.replace(temporal, ruta)
+    except OSError:
+        logger.exception("No se pudo guardar el respaldo del catálogo en %s", ruta)
+
+
+def _leer_archivo():
+    ruta = _ruta()
+    if not ruta:
+        return None
+    try:
+        with open(ruta, encoding='utf-8') as archivo:
+            return Respaldo(**json.load(archivo))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, TypeError):
+        logger.exception("Respaldo del catálogo ilegible en %s", ruta)
+        return None
@@ -1,5 +1,13 @@
+import json
+from datetime import timedelta
+from urllib.parse import quote
+
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.urls import reverse
+from catalogo import respaldo
 from catalogo.models import Producto
 from django.db import DatabaseError
 from unittest.mock import patch
@@ -8,10 +16,11 @@ from unittest.mock import patch
 class ApiProductosTests(TestCase):
     def setUp(self):
         self.client = Client()
+        respaldo.descartar()
 
     def test_api_productos_returns_products(self):
-        Producto.objects.create(titulo='P1', descripcion='d', precio=10)
-        Producto.objects.create(titulo='P2', descripcion='d2', precio=20, activo=False)
+        Producto.objects.create(titulo='P1', descripcion='d')
+        Producto.objects.create(titulo='P2', descripcion='d2', activo=False)
         # only activo=True should be returned
         resp = self.client.get('/api/productos/')
         assert resp.status_code == 200
@@ -27,3 +36,74 @@ class ApiProductosTests(TestCase):
             assert resp.status_code == 200
             data = resp.json()
             assert data.get('productos') == []
+
+    def test_api_productos_cursor_y_fields(self):
+        for i in range(5):
+            Producto.objects.create(titulo=f'P{i}', descripcion='larga', orden=i % 2)
+        esperado = list(
+            Producto.objects.order_by('orden', '-fecha_creacion', '-id').values_list('titulo', flat=True)
+        )
+
+        vistos, url = [], '/api/productos/?limit=2&fields=id,titulo'
+        while url:
+            data = self.client.get(url).json()
+            assert all(set(p) == {'id', 'titulo'} for p in data['productos'])
+            vistos.extend(p['titulo'] for p in data['productos'])
+            url = data['next'] and f"/api/productos/?limit=2&fields=id,titulo&cursor={quote(data['next'])}"
+        assert vistos == esperado
+
+        assert self.client.get('/api/productos/?fields=precio').status_code == 400
+
+    def test_api_productos_export_ndjson(self):
+        Producto.objects.create(titulo='P1', descripcion='d')
+        Producto.objects.create(titulo='P2', descripcion='d')
+        resp = self.client.get('/api/productos/?formato=ndjson&fields=titulo')
+        assert resp['Content-Type'] == 'application/x-ndjson'
+        lineas = b''.join(resp.streaming_content).decode().splitlines()
+        assert sorted(json.loads(l)['titulo'] for l in lineas) == ['P1', 'P2']
+
+
+class ListadoIndiceTests(TestCase):
+    """El listado del catálogo usa el índice parcial, sin ordenar en memoria."""
+
+    @classmethod
+    def setUpTestData(cls):
+        ahora = timezone.now()
+        Producto.objects.bulk_create(
+            (
+                Producto(
+                    titulo=f'P{i}', descripcion='d', foto=f'productos/{i}.webp',
+                    orden=i % 50, activo=i % 10 != 0,
+                    fecha_creacion=ahora - timedelta(seconds=i),
+                )
+                for i in range(100_000)
+            ),
+            batch_size=5000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE catalogo_producto' if connection.vendor == 'postgresql' else 'ANALYZE')
+
+    def test_primera_pagina_usa_el_indice(self):
+        plan = Producto.activos()[:20].explain()
+        assert 'catalogo_producto_activos' in plan, plan
+        if connection.vendor == 'postgresql':
+            assert 'Sort' not in plan and 'Seq Scan' not in plan, plan
+        else:
+            assert 'TEMP B-TREE' not in plan, plan
+
+    def test_pagina_por_cursor_usa_el_indice(self):
+        resp = self.client.get('/api/productos/?limit=20&fields=id,titulo')
+        assert len(resp.json()['productos']) == 20
+        siguiente = resp.json()['next']
+
+        with CaptureQueriesContext(connection) as consultas:
+            resp = self.client.get(f'/api/productos/?limit=20&fields=id,titulo&cursor={quote(siguiente)}')
+        assert len(resp.json()['productos']) == 20
+        sql = consultas.captured_queries[-1]['sql']
+        assert '"descripcion"' not in sql
+
+        with connection.cursor() as cursor:
+            explain = 'EXPLAIN' if connection.vendor == 'postgresql' else 'EXPLAIN QUERY PLAN'
+            cursor.execute(f'{explain} {sql}')
+            plan = '\n'.join(str(fila) for fila in cursor.fetchall())
+        assert 'catalogo_producto_activos' in plan, plan
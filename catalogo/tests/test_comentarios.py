@@ -0,0 +1,104 @@
+import json
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from urllib.parse import urlencode
+
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+
+from catalogo.cache import get_cache
+from catalogo.models import Producto, ProductoComentario, dia_local, rango_del_dia
+
+
+class ComentariosCursorTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = Client()
+        self.producto = Producto.objects.create(titulo='P1', descripcion='d')
+        ahora = timezone.now()
+        for i in range(7):
+            c = ProductoComentario.objects.create(
+                producto=self.producto, usuario_id=f'u{i}', texto=f'c{i}'
+            )
+            # Dos comentarios con la misma fecha para probar el desempate por id
+            fecha = ahora - timedelta(minutes=i if i != 4 else 3)
+            ProductoComentario.objects.filter(pk=c.pk).update(fecha_creacion=fecha)
+        self.url = f'/catalogo/api/productos/{self.producto.id}/comentarios/'
+
+    def test_recorrer_con_cursor_no_repite_ni_saltea(self):
+        vistos = []
+        params = {'limit': 3}
+        while True:
+            data = self.client.get(f'{self.url}?{urlencode(params)}').json()
+            vistos.extend(c['texto'] for c in data['comentarios'])
+            assert 'total' not in data
+            if not data['has_more']:
+                assert data['next'] is None
+                break
+            params['after'] = data['next']
+
+        esperado = list(
+            ProductoComentario.objects.filter(producto=self.producto)
+            .order_by('-fecha_creacion', '-id').values_list('texto', flat=True)
+        )
+        assert vistos == esperado
+
+    def test_total_solo_si_se_pide(self):
+        data = self.client.get(f'{self.url}?total=1').json()
+        assert data['total'] == 7
+
+    def test_cursor_invalido_y_producto_inexistente(self):
+        assert self.client.get(f'{self.url}?after=ayer,1').status_code == 400
+        resp = self.client.get('/catalogo/api/productos/999999/comentarios/')
+        assert resp.status_code == 404
+
+    def test_modo_pagina_se_mantiene(self):
+        data = self.client.get(f'{self.url}?page=1').json()
+        assert (data['total'], data['page'], data['total_pages']) == (7, 1, 1)
+
+    def test_etag_cambia_al_comentar(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            assert self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+        ProductoComentario.objects.create(producto=self.producto, usuario_id='x', texto='nuevo')
+        assert self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+class ComentarioDiarioTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = Client()
+        self.producto = Producto.objects.create(titulo='P1', descripcion='d')
+        self.url = reverse('catalogo:api_comentario_crear', args=[self.producto.id])
+
+    def comentar(self, texto='hola'):
+        return self.client.post(self.url, json.dumps({'texto': texto}), content_type='application/json')
+
+    def test_segundo_comentario_del_dia_responde_429(self):
+        assert self.comentar().status_code == 201
+        assert self.comentar('otro').status_code == 429
+        assert ProductoComentario.objects.filter(producto=self.producto).count() == 1
+
+    def test_la_restriccion_vale_aunque_se_saltee_el_chequeo(self):
+        assert ProductoComentario.comentar(self.producto.id, 'u1', 'a') is not None
+        assert ProductoComentario.comentar(self.producto.id, 'u1', 'b') is None
+        assert ProductoComentario.comentar(self.producto.id, 'u2', 'c') is not None
+        assert not ProductoComentario.puede_comentar_hoy(self.producto.id, 'u1')
+
+    def test_el_dia_es_el_de_buenos_aires(self):
+        # 02:30 UTC del 2 de enero son las 23:30 del 1 en Buenos Aires
+        assert dia_local(datetime(2026, 1, 2, 2, 30, tzinfo=dt_timezone.utc)) == date(2026, 1, 1)
+        inicio, fin = rango_del_dia(date(2026, 1, 1))
+        assert inicio == datetime(2026, 1, 1, 3, 0, tzinfo=dt_timezone.utc)
+        assert fin == datetime(2026, 1, 2, 3, 0, tzinfo=dt_timezone.utc)
+
+    def test_comentario_de_ayer_no_bloquea(self):
+        ayer = dia_local() - timedelta(days=1)
+        inicio, fin = rango_del_dia(ayer)
+        c = ProductoComentario.comentar(self.producto.id, '127.0.0.1', 'ayer')
+        # Último minuto de ayer (hora local)
+        ProductoComentario.objects.filter(pk=c.pk).update(
+            fecha_creacion=fin - timedelta(minutes=1), fecha_local=ayer
+        )
+        assert self.comentar().status_code == 201
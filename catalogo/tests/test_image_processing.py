@@ -1,22 +1,39 @@
-from django.test import TestCase, override_settings
-from catalogo.models import Producto
+from django.contrib.admin.sites import site
+from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.test import RequestFactory, TestCase, override_settings
+from catalogo import models
+from catalogo.cache import version_catalogo
+from catalogo.models import Producto, TrabajoImagen
 from django.core.files.uploadedfile import SimpleUploadedFile
-from io import BytesIO
+from io import BytesIO, StringIO
+from unittest import mock
 from PIL import Image
 import tempfile
 import shutil
 import os
+import time
 
 
-def create_test_image(format='PNG'):
-    img = Image.new('RGB', (100, 100), color='red')
+def create_test_image(format='PNG', size=(100, 100)):
+    img = Image.new('RGB', size, color='red')
     buf = BytesIO()
     img.save(buf, format=format)
     buf.seek(0)
     return buf.getvalue()
 
 
+MEDIA_TMP = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TMP, CATALOGO_BORRADO_DIFERIDO=False)
 class ImageProcessingTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_TMP, ignore_errors=True)
+
     def test_saved_image_is_converted_to_webp_and_random_name(self):
         """
         Verifica que, tras guardar, el campo `foto` tenga un nombre generado
@@ -28,10 +45,353 @@ class ImageProcessingTests(TestCase):
         """
         img_bytes = create_test_image('PNG')
         upload = SimpleUploadedFile('test.png', img_bytes, content_type='image/png')
-        p = Producto(titulo='Img', descripcion='d', precio=1)
+        p = Producto(titulo='Img', descripcion='d')
         p.foto = upload
         p.save()
 
         # The stored filename should end with .webp and be under productos/
         assert p.foto.name.endswith('.webp')
         assert p.foto.name.startswith('productos/')
+
+    def test_variantes_responsive(self):
+        upload = SimpleUploadedFile('big.png', create_test_image('PNG', (1000, 500)))
+        p = Producto(titulo='Grande', descripcion='d')
+        p.foto = upload
+        p.save()
+
+        assert sorted(p.variantes, key=int) == ['320', '640', '1000']
+        assert p.variantes['1000'] == p.foto.name
+        with Image.open(os.path.join(MEDIA_TMP, p.variantes['320'])) as v:
+            assert v.size == (320, 160)
+        assert p.srcset.endswith(' 1000w') and '_320w.webp 320w' in p.srcset
+
+        with self.captureOnCommitCallbacks(execute=True):
+            p.delete()
+        assert not any(os.path.exists(os.path.join(MEDIA_TMP, n)) for n in p.variantes.values())
+
+    @override_settings(CATALOGO_IMAGENES_ASYNC=True)
+    def test_procesamiento_en_segundo_plano(self):
+        p = Producto(titulo='Async', descripcion='d')
+        p.foto = SimpleUploadedFile('a.png', create_test_image('PNG', (800, 400)))
+        p.save()
+
+        # El original no se publica: sin foto (placeholder) hasta procesarlo
+        assert p.estado_imagen == Producto.ESTADO_PROCESANDO and not p.foto
+        trabajo = TrabajoImagen.objects.get(producto=p)
+        original = trabajo.original
+        assert original.startswith('productos/originales/')
+        assert trabajo.estado == TrabajoImagen.PENDIENTE
+
+        call_command('procesar_imagenes', '--una-vez', '--workers', '1', '--cache-local', stdout=StringIO())
+
+        p.refresh_from_db()
+        assert p.estado_imagen == Producto.ESTADO_LISTA
+        assert p.foto.name.endswith('.webp') and '640' in p.variantes
+        assert not os.path.exists(os.path.join(MEDIA_TMP, original))
+        assert TrabajoImagen.objects.get(producto=p).estado == TrabajoImagen.LISTO
+
+        # Al cambiar la foto se sigue mostrando la anterior hasta el reemplazo
+        procesada = p.foto.name
+        with self.captureOnCommitCallbacks(execute=True):
+            p.foto = SimpleUploadedFile('c.png', create_test_image('PNG', (640, 320)))
+            p.save()
+        p.refresh_from_db()
+        assert p.foto.name == procesada and p.estado_imagen == Producto.ESTADO_PROCESANDO
+        assert os.path.exists(os.path.join(MEDIA_TMP, procesada))
+
+        call_command('procesar_imagenes', '--una-vez', '--workers', '1', '--cache-local', stdout=StringIO())
+        p.refresh_from_db()
+        assert p.foto.name != procesada and p.estado_imagen == Producto.ESTADO_LISTA
+        assert not os.path.exists(os.path.join(MEDIA_TMP, procesada))
+
+    @override_settings(CATALOGO_IMAGENES_ASYNC=True)
+    def test_producto_borrado_durante_el_trabajo(self):
+        p = Producto(titulo='Async', descripcion='d')
+        p.foto = SimpleUploadedFile('b.png', create_test_image('PNG', (600, 300)))
+        p.save()
+
+        trabajo = TrabajoImagen.tomar_pendiente()
+        with self.captureOnCommitCallbacks(execute=True):
+            p.delete()  # CASCADE: el trabajo también desaparece
+        trabajo.ejecutar()
+
+        assert not TrabajoImagen.objects.exists()
+        assert trabajo.estado == TrabajoImagen.LISTO
+
+    def test_misma_foto_se_guarda_una_vez(self):
+        datos = create_test_image('PNG', (700, 350))
+        a = Producto(titulo='A', descripcion='d', foto=SimpleUploadedFile('a.png', datos))
+        a.save()
+
+        with mock.patch.object(default_storage, 'save', wraps=default_storage.save) as guardar:
+            b = Producto(titulo='B', descripcion='d', foto=SimpleUploadedFile('b.png', datos))
+            b.save()
+        guardar.assert_not_called()
+        assert b.foto.name == a.foto.name and b.variantes == a.variantes
+
+        # Se borra sólo cuando ningún Producto la referencia
+        ruta = os.path.join(MEDIA_TMP, a.foto.name)
+        with self.captureOnCommitCallbacks(execute=True):
+            a.delete()
+        assert os.path.exists(ruta)
+        with self.captureOnCommitCallbacks(execute=True):
+            b.delete()
+        assert not os.path.exists(ruta)
+
+    def test_reutiliza_archivo_existente_sin_fila_lista(self):
+        datos = create_test_image('PNG', (720, 360))
+        a = Producto(titulo='A', descripcion='d', foto=SimpleUploadedFile('a.png', datos))
+        a.save()
+        # El archivo existe pero ninguna fila "lista" lo referencia (huérfano,
+        # trabajo pendiente, fila de otro worker todavía sin insertar)
+        Producto.objects.filter(pk=a.pk).update(estado_imagen=Producto.ESTADO_PROCESANDO)
+        os.remove(os.path.join(MEDIA_TMP, a.variantes['320']))
+
+        b = Producto(titulo='B', descripcion='d', foto=SimpleUploadedFile('b.png', datos))
+        b.save()
+        # Mismos nombres por contenido (la variante que faltaba se rehízo)
+        # y ninguna copia renombrada
+        assert b.foto.name == a.foto.name and b.variantes == a.variantes
+        base = os.path.splitext(os.path.basename(a.foto.name))[0]
+        assert sorted(n for n in os.listdir(os.path.join(MEDIA_TMP, 'productos')) if n.startswith(base)) == sorted(
+            os.path.basename(n) for n in a.variantes.values()
+        )
+
+    def test_borrado_tras_commit_sin_select(self):
+        p = Producto(titulo='Foto', descripcion='d', foto=SimpleUploadedFile('c.png', create_test_image('PNG', (640, 320))))
+        p.save()
+        p = Producto.objects.get(pk=p.pk)
+        ruta = os.path.join(MEDIA_TMP, p.foto.name)
+
+        # Editar sólo el orden: un UPDATE, sin releer la fila ni tocar el storage
+        p.orden = 5
+        with self.assertNumQueries(1):
+            p.save()
+
+        # Cambio de foto revertido: el archivo anterior sigue ahí
+        from django.db import transaction
+        try:
+            with transaction.atomic():
+                p.foto = SimpleUploadedFile('d.png', create_test_image('PNG', (500, 250)))
+                p.save()
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        assert os.path.exists(ruta)
+
+        p = Producto.objects.get(pk=p.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            p.foto = SimpleUploadedFile('d.png', create_test_image('PNG', (500, 250)))
+            p.save()
+        assert not os.path.exists(ruta)
+
+    def test_reprocess_images(self):
+        # Foto "legada": JPEG guardado antes del pipeline, sin versión
+        os.makedirs(os.path.join(MEDIA_TMP, 'productos'), exist_ok=True)
+        legado = os.path.join(MEDIA_TMP, 'productos', 'legado.jpg')
+        Image.effect_noise((900, 600), 40).convert('RGB').save(legado, quality=98)
+        p = Producto.objects.create(titulo='Viejo', descripcion='d', foto='productos/legado.jpg')
+
+        salida = StringIO()
+        call_command('reprocess_images', '--dry-run', '--workers', '1', stdout=salida)
+        assert '1 reemplazaria' in salida.getvalue()
+        p.refresh_from_db()
+        assert p.foto.name == 'productos/legado.jpg'
+
+        # La versión del catálogo cambia antes de borrar la foto reemplazada
+        version = version_catalogo()
+        borrar = models.borrar_archivos_sin_referencias
+
+        def borrar_tras_invalidar(*args, **kwargs):
+            self.assertNotEqual(version_catalogo(), version)
+            return borrar(*args, **kwargs)
+
+        with mock.patch.object(models, 'borrar_archivos_sin_referencias', side_effect=borrar_tras_invalidar) as borrado:
+            call_command('reprocess_images', '--workers', '1', '--cache-local', stdout=StringIO())
+        borrado.assert_called_once()
+        p.refresh_from_db()
+        assert p.foto.name.endswith('.webp') and p.version_imagen and '640' in p.variantes
+        assert not os.path.exists(legado)
+
+        # Ya está al día: no se vuelve a leer
+        salida = StringIO()
+        call_command('reprocess_images', '--workers', '1', '--cache-local', stdout=salida)
+        assert 'nada que procesar' in salida.getvalue()
+
+    def test_reprocess_images_sin_cambios_queda_al_dia(self):
+        # JPEG legado que ya pesa menos de lo que daría el pipeline
+        os.makedirs(os.path.join(MEDIA_TMP, 'productos'), exist_ok=True)
+        Image.effect_noise((600, 400), 60).convert('RGB').save(
+            os.path.join(MEDIA_TMP, 'productos', 'liviano.jpg'), quality=5
+        )
+        p = Producto.objects.create(titulo='Liviano', descripcion='d', foto='productos/liviano.jpg')
+
+        salida = StringIO()
+        call_command('reprocess_images', '--workers', '1', '--cache-local', stdout=salida)
+        assert '1 sin cambios' in salida.getvalue()
+        p.refresh_from_db()
+        assert p.foto.name == 'productos/liviano.jpg' and p.version_imagen
+
+        # La corrida siguiente ya no la decodifica
+        salida = StringIO()
+        call_command('reprocess_images', '--workers', '1', '--cache-local', stdout=salida)
+        assert 'nada que procesar' in salida.getvalue()
+
+    def test_gc_media(self):
+        p = Producto(titulo='Con foto', descripcion='d', foto=SimpleUploadedFile('g.png', create_test_image('PNG', (660, 330))))
+        p.save()
+
+        anidado = os.path.join(MEDIA_TMP, 'productos', 'productos')
+        os.makedirs(anidado, exist_ok=True)
+        viejo = os.path.join(anidado, 'huerfano.webp')
+        nuevo = os.path.join(MEDIA_TMP, 'productos', 'subiendo.webp')
+        for ruta in (viejo, nuevo):
+            with open(ruta, 'wb') as f:
+                f.write(b'x' * 2048)
+        hace_un_dia = time.time() - 86400
+        os.utime(viejo, (hace_un_dia, hace_un_dia))
+
+        salida = StringIO()
+        call_command('gc_media', '--dry-run', stdout=salida)
+        assert 'productos/productos/huerfano.webp' in salida.getvalue()
+        assert os.path.exists(viejo)
+
+        call_command('gc_media', stdout=StringIO())
+        assert not os.path.exists(viejo)
+        assert os.path.exists(nuevo)  # reciente: puede ser una subida en curso
+        assert all(os.path.exists(os.path.join(MEDIA_TMP, n)) for n in p.archivos_imagen())
+
+    def test_admin_delete_queryset(self):
+        fotos = []
+        for i, lado in enumerate((420, 440, 460)):
+            p = Producto(titulo=f'P{i}', descripcion='d', foto=SimpleUploadedFile('x.png', create_test_image('PNG', (lado, lado))))
+            p.save()
+            fotos.append(os.path.join(MEDIA_TMP, p.foto.name))
+        modelo_admin = site._registry[Producto]
+        request = RequestFactory().post('/')
+
+        # Pocos: en el request, archivos borrados tras el COMMIT
+        with self.captureOnCommitCallbacks(execute=True):
+            modelo_admin.delete_queryset(request, Producto.objects.filter(titulo='P0'))
+        assert not Producto.objects.filter(titulo='P0').exists()
+        assert not os.path.exists(fotos[0])
+
+        # Por encima del límite: se ocultan y se borran en segundo plano
+        with self.settings(CATALOGO_ADMIN_BORRADO_MAX=1), mock.patch('catalogo.admin.messages.info'):
+            with self.captureOnCommitCallbacks() as callbacks:
+                modelo_admin.delete_queryset(request, Producto.objects.all())
+            assert not Producto.objects.filter(activo=True).exists()
+            with self.captureOnCommitCallbacks(execute=True):
+                for callback in callbacks:
+                    callback()
+        assert not Producto.objects.exists()
+        assert not any(os.path.exists(f) for f in fotos)
+
+    def test_baja_pendiente_sobrevive_un_reinicio(self):
+        fotos = []
+        for i, lado in enumerate((420, 440, 460)):
+            p = Producto(titulo=f'P{i}', descripcion='d', foto=SimpleUploadedFile('x.png', create_test_image('PNG', (lado, lado))))
+            p.save()
+            fotos.append(os.path.join(MEDIA_TMP, p.foto.name))
+
+        # El proceso se reinicia antes de que corra el hilo de fondo: los
+        # callbacks de on_commit nunca se ejecutan
+        with self.settings(CATALOGO_ADMIN_BORRADO_MAX=1), mock.patch('catalogo.admin.messages.info'):
+            with self.captureOnCommitCallbacks():
+                site._registry[Producto].delete_queryset(RequestFactory().post('/'), Producto.objects.all())
+        assert Producto.objects.filter(activo=False, fecha_baja__isnull=False).count() == 3
+
+        # Uno se reactivó desde el admin mientras tanto: no se borra
+        Producto.objects.filter(titulo='P2').update(activo=True)
+
+        salida = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('eliminar_bajas', stdout=salida)
+        assert '2 producto(s)' in salida.getvalue()
+        assert list(Producto.objects.values_list('titulo', flat=True)) == ['P2']
+        assert [os.path.exists(f) for f in fotos] == [False, False, True]
+
+
+class EncodeToBudgetTests(TestCase):
+    def test_respeta_presupuesto_con_pocas_codificaciones(self):
+        """Ruido (poco compresible): debe bajar la calidad sin exceder el límite."""
+        from miwebsite.image_utils import encode_to_budget
+        img = Image.effect_noise((800, 600), 64).convert('RGB')
+        completo = encode_to_budget(img, 'WEBP', max_bytes=10 ** 9)
+        presupuesto = len(completo.data) // 2
+
+        r = encode_to_budget(img, 'WEBP', max_bytes=presupuesto)
+        self.assertLessEqual(len(r.data), presupuesto)
+        self.assertLess(r.quality, 80)
+        self.assertLessEqual(r.encodes, 4)
+
+
+class AbrirImagenTests(TestCase):
+    def test_jpeg_se_decodifica_reducido(self):
+        from miwebsite.image_utils import abrir_imagen
+        img = abrir_imagen(BytesIO(create_test_image('JPEG', (4000, 2000))), max_size=(1000, 1000))
+        self.assertEqual(img.size, (1000, 500))
+
+    @override_settings(IMAGEN_MAX_PIXELES=10_000, MEDIA_ROOT=MEDIA_TMP)
+    def test_rechaza_exceso_de_pixeles(self):
+        from miwebsite.image_utils import abrir_imagen, ImagenDemasiadoGrande
+        with self.assertRaises(ImagenDemasiadoGrande):
+            abrir_imagen(BytesIO(create_test_image('PNG', (200, 200))))
+
+        upload = SimpleUploadedFile('x.png', create_test_image('PNG', (200, 200)), content_type='image/png')
+        p = Producto(titulo='Grande', descripcion='d', foto=upload)
+        with self.assertRaises(ValidationError) as ctx:
+            p.full_clean()
+        self.assertEqual(list(ctx.exception.message_dict), ['foto'])
+
+        # Fuera del admin (sin clean()) save() también la rechaza y no
+        # guarda el original tal cual
+        upload.seek(0)
+        with self.assertRaises(ImagenDemasiadoGrande):
+            Producto(titulo='Grande', descripcion='d', foto=upload).save()
+        self.assertFalse(Producto.objects.exists())
+        self.assertFalse(os.path.exists(os.path.join(MEDIA_TMP, 'productos', 'x.png')))
+
+
+class ImageProcessorTests(TestCase):
+    def test_perfil_web_aplana_alpha_y_respeta_limites(self):
+        from miwebsite.image_utils import ImageProcessor
+        img = Image.new('RGBA', (3000, 1500), (0, 0, 255, 0))
+        buf = BytesIO()
+        img.save(buf, format='PNG')
+
+        r = ImageProcessor('web').process(buf)
+        self.assertEqual((r.formato, r.extension), ('JPEG', 'jpg'))
+        self.assertEqual(r.image.size, (1920, 960))
+        self.assertEqual(r.image.mode, 'RGB')
+        self.assertEqual(set(r.tiempos), set(ImageProcessor.ETAPAS))
+        with Image.open(BytesIO(r.data)) as salida:
+            self.assertEqual(salida.getpixel((0, 0)), (255, 255, 255))
+
+    def test_orientacion_exif(self):
+        from miwebsite.image_utils import ImageProcessor
+        img = Image.new('RGB', (400, 200), 'red')
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotar 90°
+        buf = BytesIO()
+        img.save(buf, format='JPEG', exif=exif)
+
+        r = ImageProcessor('producto', max_size=(100, 100)).process(buf)
+        self.assertEqual(r.image.size, (50, 100))
+
+    def test_etapas_invalidas(self):
+        from miwebsite.image_utils import ImageProcessor
+        with self.assertRaises(ValueError):
+            ImageProcessor('producto', etapas=('decode', 'budget'))
+
+
+@override_settings(CATALOGO_BORRADO_DIFERIDO=True)
+class BorradorDiferidoTests(TestCase):
+    def test_junta_pedidos_en_un_lote(self):
+        from catalogo.almacenamiento import BorradorDiferido
+        lotes = []
+        borrador = BorradorDiferido(lotes.append, espera=0.2)
+        borrador.programar(['a', 'b'])
+        borrador.programar(['c'])
+        self.assertTrue(borrador.esperar(timeout=5))
+        self.assertEqual(lotes, [['a', 'b', 'c']])
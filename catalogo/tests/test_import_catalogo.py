@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from catalogo.models import Producto
+
+
+MEDIA_TMP = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TMP)
+class ImportCatalogoTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        for i, color in enumerate(['red', 'blue']):
+            Image.new('RGB', (500, 300), color).save(os.path.join(self.dir, f'{i}.jpg'))
+        self.manifiesto = os.path.join(self.dir, 'productos.csv')
+        with open(self.manifiesto, 'w', encoding='utf-8') as f:
+            f.write("titulo,descripcion,foto,activo,orden\n")
+            f.write("Rojo,d,0.jpg,1,2\n")
+            f.write("Azul,d,1.jpg,0,1\n")
+            f.write("Rojo bis,d,0.jpg,,3\n")
+            f.write("Roto,d,falta.jpg,,4\n")
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_TMP, ignore_errors=True)
+
+    def importar(self, *args):
+        call_command('import_catalogo', self.manifiesto, '--workers', '1', '--lote', '2', '--cache-local',
+                     *args, stdout=StringIO(), stderr=StringIO())
+
+    def test_importa_por_lotes_y_retoma(self):
+        self.importar()
+
+        productos = {p.titulo: p for p in Producto.objects.all()}
+        self.assertEqual(sorted(productos), ['Azul', 'Rojo', 'Rojo bis'])
+        self.assertFalse(productos['Azul'].activo)
+        self.assertEqual(productos['Rojo'].foto.name, productos['Rojo bis'].foto.name)
+        self.assertIn('320', productos['Rojo'].variantes)
+
+        # Con el progreso guardado no vuelve a insertar nada
+        self.importar()
+        self.assertEqual(Producto.objects.count(), 3)
+        self.importar('--reiniciar')
+        self.assertEqual(Producto.objects.count(), 6)
+
+    def test_misma_foto_en_un_lote_se_guarda_una_vez(self):
+        # Todas las filas en un solo lote: ninguna está en la base todavía
+        self.importar('--lote', '10')
+
+        rojos = Producto.objects.filter(titulo__startswith='Rojo')
+        self.assertEqual(len({p.foto.name for p in rojos}), 1)
+        rojo = rojos.first()
+        base = os.path.splitext(os.path.basename(rojo.foto.name))[0]
+        guardados = [n for n in os.listdir(os.path.join(MEDIA_TMP, 'productos')) if n.startswith(base)]
+        self.assertEqual(sorted(guardados), sorted(os.path.basename(n) for n in rojo.variantes.values()))
+
+    def test_orden_invalido_es_error_de_fila(self):
+        with open(self.manifiesto, 'a', encoding='utf-8') as f:
+            f.write("Verde,d,1.jpg,1,primero\n")
+        errores = StringIO()
+        call_command('import_catalogo', self.manifiesto, '--workers', '1', '--cache-local',
+                     stdout=StringIO(), stderr=errores)
+
+        self.assertIn("Fila 5: 'orden' inválido: 'primero'", errores.getvalue())
+        self.assertEqual(Producto.objects.count(), 3)
+
+    def test_exige_cache_compartida(self):
+        # Con LocMemCache los procesos web no verían la nueva versión
+        with self.assertRaisesMessage(CommandError, 'LocMemCache'):
+            call_command('import_catalogo', self.manifiesto, '--workers', '1', stdout=StringIO())
+        self.assertEqual(Producto.objects.count(), 0)
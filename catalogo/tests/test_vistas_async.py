@@ -0,0 +1,74 @@
+import json
+
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import path
+
+from bienvenida import views_async as bienvenida_async
+from catalogo import respaldo, views_async
+from catalogo.cache import get_cache
+from catalogo.models import Producto, ProductoComentario
+
+# Las mismas URLs que con VISTAS_ASYNC=True
+urlpatterns = [
+    path('api/productos/', bienvenida_async.api_productos),
+    path('catalogo/api/productos/<int:producto_id>/like/', views_async.api_producto_like),
+    path('catalogo/api/productos/<int:producto_id>/stats/', views_async.api_producto_stats),
+    path('catalogo/api/productos/<int:producto_id>/comentarios/', views_async.api_comentarios_lista),
+    path('catalogo/api/productos/<int:producto_id>/comentarios/crear/', views_async.api_comentario_crear),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class VistasAsyncTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        respaldo.descartar()
+        self.client = AsyncClient()
+        self.producto = Producto.objects.create(titulo='P1', descripcion='d')
+        self.base = f'/catalogo/api/productos/{self.producto.id}'
+
+    async def test_votar_y_stats(self):
+        resp = await self.client.post(
+            f'{self.base}/like/', json.dumps({'tipo': 'like'}), content_type='application/json'
+        )
+        assert resp.json() == {'success': True, 'accion': 'created', 'likes': 1, 'dislikes': 0}
+
+        resp = await self.client.get(f'{self.base}/stats/')
+        assert resp.json() == {'likes': 1, 'dislikes': 0, 'voto_actual': 'like'}
+        resp = await self.client.get(f'{self.base}/stats/', headers={'if-none-match': resp['ETag']})
+        assert resp.status_code == 304
+
+        resp = await self.client.post(
+            '/catalogo/api/productos/999999/like/', json.dumps({'tipo': 'like'}),
+            content_type='application/json',
+        )
+        assert resp.status_code == 404
+
+    async def test_comentar_una_vez_por_dia_y_listar(self):
+        url = f'{self.base}/comentarios/crear/'
+        resp = await self.client.post(url, json.dumps({'texto': 'hola'}), content_type='application/json')
+        assert resp.status_code == 201
+        resp = await self.client.post(url, json.dumps({'texto': 'otra'}), content_type='application/json')
+        assert resp.status_code == 429
+
+        data = (await self.client.get(f'{self.base}/comentarios/?total=1')).json()
+        assert [c['texto'] for c in data['comentarios']] == ['hola']
+        assert data['total'] == 1 and data['has_more'] is False
+        assert await ProductoComentario.objects.acount() == 1
+
+        resp = await self.client.get('/catalogo/api/productos/999999/comentarios/')
+        assert resp.status_code == 404
+
+    async def test_api_productos_pagina_y_ndjson(self):
+        await Producto.objects.acreate(titulo='P2', descripcion='d')
+        await Producto.objects.acreate(titulo='oculto', descripcion='d', activo=False)
+
+        data = (await self.client.get('/api/productos/?limit=1&fields=titulo')).json()
+        assert len(data['productos']) == 1 and data['next']
+
+        resp = await self.client.get('/api/productos/?formato=ndjson&fields=titulo')
+        lineas = b''.join([parte async for parte in resp.streaming_content]).decode().splitlines()
+        assert sorted(json.loads(l)['titulo'] for l in lineas) == ['P1', 'P2']
+
+        resp = await self.client.get('/api/productos/?fields=precio')
+        assert resp.status_code == 400
@@ -0,0 +1,136 @@
+import json
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, Client
+
+from catalogo.cache import get_cache
+from catalogo.models import Producto, ProductoLike
+
+
+class VotosTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = Client()
+        self.producto = Producto.objects.create(titulo='P1', descripcion='d')
+
+    def votar(self, tipo, ip='10.0.0.1'):
+        resp = self.client.post(
+            f'/catalogo/api/productos/{self.producto.id}/like/',
+            data=json.dumps({'tipo': tipo}),
+            content_type='application/json',
+            REMOTE_ADDR=ip,
+        )
+        assert resp.status_code == 200
+        return resp.json()
+
+    def test_contadores_siguen_creacion_cambio_y_toggle(self):
+        assert self.votar('like')['accion'] == 'created'
+        data = self.votar('dislike')
+        assert (data['accion'], data['likes'], data['dislikes']) == ('updated', 0, 1)
+        data = self.votar('dislike')
+        assert (data['accion'], data['likes'], data['dislikes']) == ('removed', 0, 0)
+
+        self.votar('like', ip='10.0.0.2')
+        self.producto.refresh_from_db()
+        assert (self.producto.likes_count, self.producto.dislikes_count) == (1, 0)
+
+    def test_stats_lee_contadores(self):
+        self.votar('like')
+        get_cache().clear()
+        with self.assertNumQueries(2):
+            resp = self.client.get(
+                f'/catalogo/api/productos/{self.producto.id}/stats/', REMOTE_ADDR='10.0.0.1'
+            )
+        assert resp.json() == {'likes': 1, 'dislikes': 0, 'voto_actual': 'like'}
+
+    def test_recalcular_contadores(self):
+        ProductoLike.objects.create(producto=self.producto, usuario_id='a', tipo='like')
+        ProductoLike.objects.create(producto=self.producto, usuario_id='b', tipo='dislike')
+        ProductoLike.objects.create(producto=self.producto, usuario_id='c', tipo='like')
+
+        salida = StringIO()
+        call_command('recalcular_contadores', stdout=salida)
+        assert 'Contadores recalculados para 1 producto(s).' in salida.getvalue()
+
+        self.producto.refresh_from_db()
+        assert (self.producto.likes_count, self.producto.dislikes_count) == (2, 1)
+
+    def test_voto_en_postgresql_es_una_sola_sentencia(self):
+        if connection.vendor != 'postgresql':
+            self.skipTest('Sentencia única sólo en PostgreSQL')
+        self.votar('like')
+        with self.assertNumQueries(1):
+            self.votar('dislike')
+
+    def test_producto_inexistente_devuelve_404(self):
+        resp = self.client.post(
+            '/catalogo/api/productos/999999/like/',
+            data=json.dumps({'tipo': 'like'}),
+            content_type='application/json',
+        )
+        assert resp.status_code == 404
+        assert not ProductoLike.objects.exists()
+
+    def test_stats_en_lote(self):
+        otro = Producto.objects.create(titulo='P2', descripcion='d')
+        self.votar('like')
+        self.votar('dislike', ip='10.0.0.2')
+        get_cache().clear()
+
+        with self.assertNumQueries(2):
+            resp = self.client.get(
+                f'/catalogo/api/productos/stats/?ids={self.producto.id},{otro.id},999999',
+                REMOTE_ADDR='10.0.0.1',
+            )
+        assert resp.status_code == 200
+        assert resp.json()['stats'] == {
+            str(self.producto.id): {'likes': 1, 'dislikes': 1, 'voto_actual': 'like'},
+            str(otro.id): {'likes': 0, 'dislikes': 0, 'voto_actual': None},
+        }
+
+    def test_stats_omiten_productos_ocultos(self):
+        oculto = Producto.objects.create(titulo='Oculto', descripcion='d')
+        self.client.get(f'/catalogo/api/productos/{oculto.id}/stats/')  # queda en caché
+        oculto.activo = False
+        oculto.save()
+
+        resp = self.client.get(f'/catalogo/api/productos/stats/?ids={self.producto.id},{oculto.id}')
+        assert list(resp.json()['stats']) == [str(self.producto.id)]
+        assert self.client.get(f'/catalogo/api/productos/{oculto.id}/stats/').status_code == 404
+
+    def test_stats_con_base_caida_responden_json(self):
+        get_cache().clear()
+        with patch('catalogo.views.consultas_stats', side_effect=DatabaseError('DB down')):
+            resp = self.client.get(f'/catalogo/api/productos/{self.producto.id}/stats/')
+        assert resp.status_code == 500 and 'error' in resp.json()
+        assert 'ETag' not in resp
+
+    def test_stats_en_lote_valida_ids(self):
+        assert self.client.get('/catalogo/api/productos/stats/').status_code == 400
+        assert self.client.get('/catalogo/api/productos/stats/?ids=1,x').status_code == 400
+
+    def test_stats_salen_de_cache_tras_votar(self):
+        self.votar('like')
+        url = f'/catalogo/api/productos/{self.producto.id}/stats/'
+        with self.assertNumQueries(0):
+            resp = self.client.get(url, REMOTE_ADDR='10.0.0.1')
+        assert resp.json() == {'likes': 1, 'dislikes': 0, 'voto_actual': 'like'}
+
+        # Otro cliente: sólo falta su voto, se lee de la base y se cachea
+        self.client.get(url, REMOTE_ADDR='10.0.0.9')
+        with self.assertNumQueries(0):
+            resp = self.client.get(url, REMOTE_ADDR='10.0.0.9')
+        assert resp.json() == {'likes': 1, 'dislikes': 0, 'voto_actual': None}
+
+    def test_stats_responden_304_hasta_votar(self):
+        url = f'/catalogo/api/productos/{self.producto.id}/stats/'
+        resp = self.client.get(url, REMOTE_ADDR='10.0.0.1')
+        assert 'private' in resp['Cache-Control']
+        etag = resp['ETag']
+        assert self.client.get(url, HTTP_IF_NONE_MATCH=etag, REMOTE_ADDR='10.0.0.1').status_code == 304
+
+        self.votar('like')
+        assert self.client.get(url, HTTP_IF_NONE_MATCH=etag, REMOTE_ADDR='10.0.0.1').status_code == 200
@@ -1,5 +1,9 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, views_async
+
+# Perfil ASGI: las APIs con E/S en su variante async (mismas URLs y nombres)
+api = views_async if settings.VISTAS_ASYNC else views
 
 app_name = 'catalogo'
 
@@ -8,11 +12,12 @@ urlpatterns = [
     path('productos/', views.lista_productos, name='lista_productos'),
     
     # API: Likes/Dislikes
-    path('api/productos/<int:producto_id>/like/', views.api_producto_like, name='api_like'),
-    path('api/productos/<int:producto_id>/stats/', views.api_producto_stats, name='api_stats'),
+    path('api/productos/stats/', views.api_productos_stats, name='api_stats_lote'),
+    path('api/productos/<int:producto_id>/like/', api.api_producto_like, name='api_like'),
+    path('api/productos/<int:producto_id>/stats/', api.api_producto_stats, name='api_stats'),
     
     # API: Comentarios
-    path('api/productos/<int:producto_id>/comentarios/', views.api_comentarios_lista, name='api_comentarios_lista'),
-    path('api/productos/<int:producto_id>/comentarios/crear/', views.api_comentario_crear, name='api_comentario_crear'),
+    path('api/productos/<int:producto_id>/comentarios/', api.api_comentarios_lista, name='api_comentarios_lista'),
+    path('api/productos/<int:producto_id>/comentarios/crear/', api.api_comentario_crear, name='api_comentario_crear'),
     path('api/comentarios/<int:comentario_id>/eliminar/', views.api_comentario_eliminar, name='api_comentario_eliminar'),
 ]
\ No newline at end of file
@@ -2,11 +2,16 @@ from django.shortcuts import render, get_object_or_404
 from django.core.paginator import Paginator
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
+from django.db import DatabaseError
+from django.db.models import Q
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
 import json
 
 from .models import Producto, ProductoLike, ProductoComentario
+from . import cache as cache_catalogo
+from miwebsite.http_utils import etag_condicional
+from .paginacion import CursorInvalido, format_cursor, parse_cursor, parse_limit
 from .forms import ProductoComentarioForm
 
 
@@ -19,18 +24,22 @@ def get_client_id(request):
     if request.user.is_authenticated:
         return f"user_{request.user.id}"
     else:
-        # Obtener IP del cliente
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return f"ip_{ip}"
+        return client_id_anonimo(request)
+
+
+def client_id_anonimo(request):
+    """ID de un cliente sin sesión: su IP (la primera de X-Forwarded-For)."""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        ip = x_forwarded_for.split(',')[0]
+    else:
+        ip = request.META.get('REMOTE_ADDR')
+    return f"ip_{ip}"
 
 
 def lista_productos(request):
     """Vista principal de productos."""
-    productos_list = Producto.objects.filter(activo=True).order_by('orden', '-fecha_creacion')
+    productos_list = Producto.activos()
     
     paginator = Paginator(productos_list, 20)
     page_number = request.GET.get('page', 1)
@@ -38,7 +47,7 @@ def lista_productos(request):
     
     context = {
         'productos': productos,
-        'total_productos': productos_list.count(),
+        'total_productos': paginator.count,
     }
     
     return render(request, 'catalogo/lista_productos.html', context)
@@ -58,43 +67,28 @@ def api_producto_like(request, producto_id):
     }
     """
     try:
-        producto = get_object_or_404(Producto, id=producto_id)
-        cliente_id = get_client_id(request)
-        
         data = json.loads(request.body)
         tipo = data.get('tipo')
         
         if tipo not in ['like', 'dislike']:
             return JsonResponse({'error': 'Tipo inválido. Debe ser "like" o "dislike".'}, status=400)
         
-        # Obtener o crear el like/dislike
-        like_obj, created = ProductoLike.objects.get_or_create(
-            producto=producto,
-            usuario_id=cliente_id,
-            defaults={'tipo': tipo}
-        )
-        
-        # Si ya existe, actualizar el tipo (cambiar de like a dislike o viceversa)
-        if not created:
-            if like_obj.tipo == tipo:
-                # Si es el mismo tipo, eliminar el voto (toggle off)
-                like_obj.delete()
-                return JsonResponse({
-                    'success': True,
-                    'accion': 'removed',
-                    'likes': producto.likes.filter(tipo='like').count(),
-                    'dislikes': producto.likes.filter(tipo='dislike').count(),
-                })
-            else:
-                # Cambiar de tipo
-                like_obj.tipo = tipo
-                like_obj.save()
-        
+        # Insertar / cambiar / quitar el voto y actualizar los contadores
+        # del producto en una sola operación (ver ProductoLike.votar)
+        cliente_id = get_client_id(request)
+        resultado = ProductoLike.votar(producto_id, cliente_id, tipo)
+        if resultado is None:
+            return JsonResponse({'error': 'Producto no encontrado.'}, status=404)
+        accion, likes, dislikes = resultado
+
+        # Write-through: las lecturas siguientes salen de la caché
+        cache_catalogo.registrar_voto(producto_id, cliente_id, accion, tipo, likes, dislikes)
+
         return JsonResponse({
             'success': True,
-            'accion': 'created' if created else 'updated',
-            'likes': producto.likes.filter(tipo='like').count(),
-            'dislikes': producto.likes.filter(tipo='dislike').count(),
+            'accion': accion,
+            'likes': likes,
+            'dislikes': dislikes,
         })
     
     except json.JSONDecodeError:
@@ -103,31 +97,129 @@ def api_producto_like(request, producto_id):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+def obtener_stats(producto_ids, cliente_id):
+    """
+    Stats de votos {producto_id: {likes, dislikes, voto_actual}}.
+    Primero se consulta la caché; los productos que falten se leen de la
+    base (contadores + votos del cliente) y se cachean. Los ids
+    inexistentes u ocultos (activo=False) no aparecen en el resultado.
+    """
+    stats = cache_catalogo.leer_stats(producto_ids, cliente_id)
+    faltantes = [pk for pk in producto_ids if pk not in stats]
+
+    if faltantes:
+        votos, contadores = consultas_stats(faltantes, cliente_id)
+        desde_db = armar_stats(contadores, dict(votos))
+        cache_catalogo.guardar_stats(desde_db, cliente_id)
+        stats.update(desde_db)
+
+    return stats
+
+
+def consultas_stats(producto_ids, cliente_id):
+    """Querysets de (producto_id, tipo) del cliente y (pk, likes, dislikes)."""
+    votos = (
+        ProductoLike.objects
+        .filter(producto_id__in=producto_ids, usuario_id=cliente_id)
+        .values_list('producto_id', 'tipo')
+    )
+    # Sólo productos visibles, como la grilla: los ocultos (activo=False,
+    # p. ej. los que se están eliminando en segundo plano) no tienen stats
+    contadores = (
+        Producto.activos()
+        .filter(pk__in=producto_ids)
+        .order_by()
+        .values_list('pk', 'likes_count', 'dislikes_count')
+    )
+    return votos, contadores
+
+
+def armar_stats(contadores, votos):
+    return {
+        pk: {
+            'likes': likes,
+            'dislikes': dislikes,
+            'voto_actual': votos.get(pk),
+        }
+        for pk, likes, dislikes in contadores
+    }
+
+
+def stats_del_request(request, producto_id):
+    """
+    Stats de un producto leídas una sola vez por request: el validador
+    (etag_stats) y la vista usan el mismo resultado.
+    """
+    if not hasattr(request, '_stats_producto'):
+        request._stats_producto = obtener_stats([producto_id], get_client_id(request)).get(producto_id)
+    return request._stats_producto
+
+
+def formato_etag_stats(stats):
+    if stats is None:
+        return None
+    return "stats-{likes}-{dislikes}-{voto_actual}".format(**stats)
+
+
+def etag_stats(request, producto_id):
+    """
+    Validador de las stats: los propios valores (salen de la caché). Si la
+    base falla no hay validador y la vista responde su propio error.
+    """
+    try:
+        return formato_etag_stats(stats_del_request(request, producto_id))
+    except DatabaseError:
+        return None
+
+
 @require_http_methods(["GET"])
+@etag_condicional(etag_stats, privado=True)
 def api_producto_stats(request, producto_id):
     """Obtiene estadísticas de likes/dislikes de un producto."""
     try:
-        producto = get_object_or_404(Producto, id=producto_id)
-        cliente_id = get_client_id(request)
-        
-        # Obtener voto del usuario actual
-        voto_actual = None
-        try:
-            voto = ProductoLike.objects.get(producto=producto, usuario_id=cliente_id)
-            voto_actual = voto.tipo
-        except ProductoLike.DoesNotExist:
-            pass
-        
-        return JsonResponse({
-            'likes': producto.likes.filter(tipo='like').count(),
-            'dislikes': producto.likes.filter(tipo='dislike').count(),
-            'voto_actual': voto_actual,
-        })
+        stats = stats_del_request(request, producto_id)
+        if stats is None:
+            return JsonResponse({'error': 'Producto no encontrado.'}, status=404)
+        return JsonResponse(stats)
     
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
+# Máximo de productos por consulta en el endpoint de stats en lote
+MAX_IDS_STATS = 100
+
+
+@require_http_methods(["GET"])
+def api_productos_stats(request):
+    """
+    Estadísticas de likes/dislikes de varios productos en una sola respuesta.
+
+    GET ?ids=1,2,3 → {
+        "stats": {"1": {"likes": 4, "dislikes": 1, "voto_actual": "like"}, ...}
+    }
+    Los ids inexistentes u ocultos se omiten. Como mucho son dos consultas sin
+    importar la cantidad de productos: una lectura de contadores y una de
+    votos propios (y ninguna si todo está en caché).
+    """
+    try:
+        ids = sorted({int(x) for x in request.GET.get('ids', '').split(',') if x.strip()})
+    except ValueError:
+        return JsonResponse({'error': 'El parámetro "ids" debe ser una lista de enteros.'}, status=400)
+
+    if not ids:
+        return JsonResponse({'error': 'Falta el parámetro "ids".'}, status=400)
+    if len(ids) > MAX_IDS_STATS:
+        return JsonResponse({'error': f'Máximo {MAX_IDS_STATS} productos por consulta.'}, status=400)
+
+    try:
+        stats = obtener_stats(ids, get_client_id(request))
+        return JsonResponse({'stats': {str(pk): datos for pk, datos in stats.items()}})
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
 # ============================================================
 #  API Endpoints para comentarios
 # ============================================================
@@ -145,12 +237,6 @@ def api_comentario_crear(request, producto_id):
         producto = get_object_or_404(Producto, id=producto_id)
         cliente_id = get_client_id(request)
         
-        # Verificar que pueda comentar hoy
-        if not ProductoComentario.puede_comentar_hoy(producto_id, cliente_id):
-            return JsonResponse({
-                'error': 'Ya has comentado en este producto hoy. Intenta mañana.'
-            }, status=429)  # 429 Too Many Requests
-        
         data = json.loads(request.body)
         texto = data.get('texto', '').strip()
         
@@ -160,12 +246,13 @@ def api_comentario_crear(request, producto_id):
         if len(texto) > 200:
             return JsonResponse({'error': 'El comentario no puede exceder 200 caracteres.'}, status=400)
         
-        # Crear el comentario
-        comentario = ProductoComentario.objects.create(
-            producto=producto,
-            usuario_id=cliente_id,
-            texto=texto
-        )
+        # Crear el comentario; la restricción única por día decide si
+        # puede comentar hoy (sin consulta previa ni carrera)
+        comentario = ProductoComentario.comentar(producto.id, cliente_id, texto)
+        if comentario is None:
+            return JsonResponse({
+                'error': 'Ya has comentado en este producto hoy. Intenta mañana.'
+            }, status=429)  # 429 Too Many Requests
         
         return JsonResponse({
             'success': True,
@@ -183,9 +270,103 @@ def api_comentario_crear(request, producto_id):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+COMENTARIOS_POR_PAGINA = 20
+MAX_COMENTARIOS_POR_PAGINA = 50
+
+
+def serializar_comentario(c):
+    return {
+        'id': c.id,
+        'texto': c.texto,
+        'usuario_id': c.usuario_id,
+        'fecha_creacion': c.fecha_creacion.isoformat(),
+    }
+
+
+def etag_comentarios(request, producto_id):
+    try:
+        # Con DatabaseCache la versión sale de la base
+        return f"comentarios-{producto_id}-{cache_catalogo.version_comentarios(producto_id)}"
+    except DatabaseError:
+        return None
+
+
 @require_http_methods(["GET"])
+@etag_condicional(etag_comentarios)
 def api_comentarios_lista(request, producto_id):
-    """Obtiene lista de comentarios de un producto."""
+    """
+    Obtiene lista de comentarios de un producto, del más nuevo al más viejo.
+
+    Modo cursor (por defecto):
+        GET ?after=<fecha_creacion,id>&limit=20[&total=1]
+        → {"comentarios": [...], "next": "<cursor>" | null, "has_more": bool}
+        Busca en el índice (producto, -fecha_creacion, -id) desde el cursor;
+        el total (COUNT) sólo se calcula si se pide con total=1.
+
+    Modo página (compatibilidad): GET ?page=N → total, page, total_pages.
+    """
+    if 'page' in request.GET:
+        return _comentarios_por_pagina(request, producto_id)
+
+    try:
+        after = request.GET.get('after')
+        limit = parse_limit(
+            request.GET.get('limit'), COMENTARIOS_POR_PAGINA, MAX_COMENTARIOS_POR_PAGINA
+        )
+
+        try:
+            comentarios_qs = consulta_comentarios(producto_id, after)
+        except CursorInvalido:
+            return JsonResponse({'error': 'Cursor "after" inválido.'}, status=400)
+
+        filas = list(comentarios_qs[:limit + 1])
+
+        if not filas and not after and not Producto.objects.filter(pk=producto_id).exists():
+            return JsonResponse({'error': 'Producto no encontrado.'}, status=404)
+
+        data = pagina_comentarios(filas, limit)
+        if request.GET.get('total') in ('1', 'true'):
+            data['total'] = ProductoComentario.objects.filter(producto_id=producto_id).count()
+
+        return JsonResponse(data)
+    
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+def consulta_comentarios(producto_id, after=None):
+    """
+    Comentarios del producto del más nuevo al más viejo, desde el cursor
+    `after` si viene. Levanta CursorInvalido si no se puede leer.
+    """
+    comentarios_qs = (
+        ProductoComentario.objects
+        .filter(producto_id=producto_id)
+        .only('id', 'texto', 'usuario_id', 'fecha_creacion')
+        .order_by('-fecha_creacion', '-id')
+    )
+    if after:
+        fecha, ultimo_id = parse_cursor(after, (datetime, int))
+        # fecha <= f acota el rango del índice; el OR desempata por id
+        comentarios_qs = comentarios_qs.filter(fecha_creacion__lte=fecha).filter(
+            Q(fecha_creacion__lt=fecha) | Q(id__lt=ultimo_id)
+        )
+    return comentarios_qs
+
+
+def pagina_comentarios(filas, limit):
+    """Cuerpo de la respuesta a partir de hasta `limit` + 1 filas leídas."""
+    has_more = len(filas) > limit
+    filas = filas[:limit]
+    return {
+        'comentarios': [serializar_comentario(c) for c in filas],
+        'next': format_cursor(filas[-1].fecha_creacion, filas[-1].id) if has_more else None,
+        'has_more': has_more,
+    }
+
+
+def _comentarios_por_pagina(request, producto_id):
+    """Paginación clásica por número de página (OFFSET + COUNT)."""
     try:
         producto = get_object_or_404(Producto, id=producto_id)
         
@@ -193,22 +374,12 @@ def api_comentarios_lista(request, producto_id):
         page = request.GET.get('page', 1)
         paginator = Paginator(
             producto.comentarios.all(),
-            20  # 20 comentarios por página
+            COMENTARIOS_POR_PAGINA
         )
         comments_page = paginator.get_page(page)
         
-        comentarios = [
-            {
-                'id': c.id,
-                'texto': c.texto,
-                'usuario_id': c.usuario_id,
-                'fecha_creacion': c.fecha_creacion.isoformat(),
-            }
-            for c in comments_page
-        ]
-        
         return JsonResponse({
-            'comentarios': comentarios,
+            'comentarios': [serializar_comentario(c) for c in comments_page],
             'total': paginator.count,
             'page': comments_page.number,
             'total_pages': paginator.num_pages,
@@ -0,0 +1,203 @@
+"""
+Variantes async (ASGI) de las APIs de votos y comentarios.
+
+Mismo contrato que catalogo.views (URLs, respuestas, códigos y ETag);
+catalogo.urls las enruta en su lugar con settings.VISTAS_ASYNC (perfil
+ASGI, ver miwebsite/asgi.py). Lo que sale de la caché no ocupa ningún
+hilo; las lecturas usan el ORM async (aget, aexists, acount,
+aiterator) y lo que necesita transacción o SQL crudo
+(ProductoLike.votar, ProductoComentario.comentar) corre con
+sync_to_async. En ambos casos Django ejecuta la consulta en el hilo del
+request (una conexión por request: usar DB_POOL).
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import DatabaseError
+from django.http import JsonResponse
+from django.shortcuts import aget_object_or_404
+from django.views.decorators.http import require_http_methods
+
+from miwebsite.http_utils import etag_condicional
+from . import cache as cache_catalogo
+from .models import Producto, ProductoComentario, ProductoLike
+from .paginacion import CursorInvalido, parse_limit
+from .views import (
+    COMENTARIOS_POR_PAGINA,
+    MAX_COMENTARIOS_POR_PAGINA,
+    _comentarios_por_pagina,
+    armar_stats,
+    client_id_anonimo,
+    consulta_comentarios,
+    consultas_stats,
+    etag_comentarios,
+    formato_etag_stats,
+    pagina_comentarios,
+)
+
+leer_stats = cache_catalogo.asincrono(cache_catalogo.leer_stats)
+guardar_stats = cache_catalogo.asincrono(cache_catalogo.guardar_stats)
+registrar_voto = cache_catalogo.asincrono(cache_catalogo.registrar_voto)
+
+
+async def get_client_id(request):
+    """Como views.get_client_id; el usuario se carga con request.auser()."""
+    user = await request.auser()
+    if user.is_authenticated:
+        return f"user_{user.id}"
+    return client_id_anonimo(request)
+
+
+async def obtener_stats(producto_ids, cliente_id):
+    """Como views.obtener_stats: caché primero, lo que falte de la base."""
+    stats = await leer_stats(producto_ids, cliente_id)
+    faltantes = [pk for pk in producto_ids if pk not in stats]
+
+    if faltantes:
+        votos, contadores = consultas_stats(faltantes, cliente_id)
+        votos = {pk: tipo async for pk, tipo in votos}
+        desde_db = armar_stats([fila async for fila in contadores], votos)
+        await guardar_stats(desde_db, cliente_id)
+        stats.update(desde_db)
+
+    return stats
+
+
+async def stats_del_request(request, producto_id):
+    """Como views.stats_del_request."""
+    if not hasattr(request, '_stats_producto'):
+        stats = await obtener_stats([producto_id], await get_client_id(request))
+        request._stats_producto = stats.get(producto_id)
+    return request._stats_producto
+
+
+async def etag_stats(request, producto_id):
+    try:
+        return formato_etag_stats(await stats_del_request(request, producto_id))
+    except DatabaseError:
+        return None
+
+
+# ============================================================
+#  API Endpoints para likes/dislikes
+# ============================================================
+
+@require_http_methods(["POST"])
+async def api_producto_like(request, producto_id):
+    """POST {"tipo": "like" | "dislike"} (ver views.api_producto_like)."""
+    try:
+        data = json.loads(request.body)
+        tipo = data.get('tipo')
+
+        if tipo not in ['like', 'dislike']:
+            return JsonResponse({'error': 'Tipo inválido. Debe ser "like" o "dislike".'}, status=400)
+
+        cliente_id = await get_client_id(request)
+        resultado = await sync_to_async(ProductoLike.votar)(producto_id, cliente_id, tipo)
+        if resultado is None:
+            return JsonResponse({'error': 'Producto no encontrado.'}, status=404)
+        accion, likes, dislikes = resultado
+
+        await registrar_voto(producto_id, cliente_id, accion, tipo, likes, dislikes)
+
+        return JsonResponse({
+            'success': True,
+            'accion': accion,
+            'likes': likes,
+            'dislikes': dislikes,
+        })
+
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+@etag_condicional(etag_stats, privado=True)
+async def api_producto_stats(request, producto_id):
+    """Estadísticas de likes/dislikes de un producto."""
+    try:
+        stats = await stats_del_request(request, producto_id)
+        if stats is None:
+            return JsonResponse({'error': 'Producto no encontrado.'}, status=404)
+        return JsonResponse(stats)
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+# ============================================================
+#  API Endpoints para comentarios
+# ============================================================
+
+@require_http_methods(["POST"])
+async def api_comentario_crear(request, producto_id):
+    """POST {"texto": "..."} (ver views.api_comentario_crear)."""
+    try:
+        producto = await aget_object_or_404(Producto.objects.only('id'), id=producto_id)
+        cliente_id = await get_client_id(request)
+
+        data = json.loads(request.body)
+        texto = data.get('texto', '').strip()
+
+        if not texto:
+            return JsonResponse({'error': 'El comentario no puede estar vacío.'}, status=400)
+
+        if len(texto) > 200:
+            return JsonResponse({'error': 'El comentario no puede exceder 200 caracteres.'}, status=400)
+
+        comentario = await sync_to_async(ProductoComentario.comentar)(producto.id, cliente_id, texto)
+        if comentario is None:
+            return JsonResponse({
+                'error': 'Ya has comentado en este producto hoy. Intenta mañana.'
+            }, status=429)  # 429 Too Many Requests
+
+        return JsonResponse({
+            'success': True,
+            'comentario': {
+                'id': comentario.id,
+                'texto': comentario.texto,
+                'usuario_id': comentario.usuario_id,
+                'fecha_creacion': comentario.fecha_creacion.isoformat(),
+            }
+        }, status=201)
+
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'JSON inválido'}, status=400)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+@etag_condicional(cache_catalogo.asincrono(etag_comentarios))
+async def api_comentarios_lista(request, producto_id):
+    """Comentarios del más nuevo al más viejo (ver views.api_comentarios_lista)."""
+    if 'page' in request.GET:
+        # Compatibilidad (OFFSET + COUNT): se deja en la versión sync
+        return await sync_to_async(_comentarios_por_pagina)(request, producto_id)
+
+    try:
+        after = request.GET.get('after')
+        limit = parse_limit(
+            request.GET.get('limit'), COMENTARIOS_POR_PAGINA, MAX_COMENTARIOS_POR_PAGINA
+        )
+
+        try:
+            comentarios_qs = consulta_comentarios(producto_id, after)
+        except CursorInvalido:
+            return JsonResponse({'error': 'Cursor "after" inválido.'}, status=400)
+
+        filas = [c async for c in comentarios_qs[:limit + 1]]
+
+        if not filas and not after and not await Producto.objects.filter(pk=producto_id).aexists():
+            return JsonResponse({'error': 'Producto no encontrado.'}, status=404)
+
+        data = pagina_comentarios(filas, limit)
+        if request.GET.get('total') in ('1', 'true'):
+            data['total'] = await ProductoComentario.objects.filter(producto_id=producto_id).acount()
+
+        return JsonResponse(data)
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
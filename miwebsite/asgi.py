@@ -3,6 +3,23 @@ ASGI config for miwebsite project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Perfil ASGI (un proceso por CPU, cada uno con su event loop):
+
+    gunicorn miwebsite.asgi:application -k uvicorn_worker.UvicornWorker -w 2
+
+- VISTAS_ASYNC=True por defecto: las APIs de votos, comentarios y
+  api_productos usan sus variantes async. Un 304 o un hit de caché no
+  ocupa ningún hilo, y la concurrencia por worker deja de estar atada a
+  --threads.
+- Cada consulta del ORM (también las async) corre en un hilo propio del
+  request, con su propia conexión: las conexiones persistentes quedarían
+  colgadas de hilos que ya terminaron. Por eso DB_CONN_MAX_AGE=0 y, en
+  PostgreSQL, DB_POOL=True; DB_POOL_MAX_SIZE acota cuántos requests por
+  worker consultan la base a la vez (el resto espera DB_POOL_TIMEOUT).
+- Las variables del entorno (o de .env) tienen prioridad.
+
+`manage.py bench_asgi` compara este perfil con gunicorn sync bajo carga.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -10,7 +27,13 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from dotenv import load_dotenv
 
+# .env antes que los valores del perfil (load_dotenv no pisa lo ya definido)
+load_dotenv()
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'miwebsite.settings')
+os.environ.setdefault('VISTAS_ASYNC', 'True')
+os.environ.setdefault('DB_CONN_MAX_AGE', '0')
+os.environ.setdefault('DB_POOL', 'True')
 
 application = get_asgi_application()
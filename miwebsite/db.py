@@ -0,0 +1,141 @@
+"""
+Utilidades de conexión a la base compartidas por las apps y los comandos.
+
+- cerrar_conexiones(): antes de hacer fork.
+- Circuito / circuito_db: corta el acceso a la base después de varios
+  errores de conexión seguidos y la sondea en segundo plano hasta que
+  vuelve, para que los requests no esperen cada uno el timeout.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DatabaseError, InterfaceError, OperationalError, connections
+
+logger = logging.getLogger(__name__)
+
+
+def cerrar_conexiones():
+    """
+    Cierra las conexiones abiertas y, con DB_POOL, también los pools.
+
+    Llamar antes de hacer fork: un hijo que hereda el socket (o las
+    conexiones libres de un pool) lo compartiría con el padre. Django
+    vuelve a conectar (o a crear el pool) en la siguiente consulta.
+    """
+    for conexion in connections.all(initialized_only=True):
+        conexion.close()
+        if hasattr(conexion, 'close_pool'):
+            conexion.close_pool()
+
+
+# ============================================================
+#  Circuit breaker
+# ============================================================
+
+class CircuitoAbierto(DatabaseError):
+    """La base se da por caída: ni se intenta la consulta."""
+
+
+class Circuito:
+    """
+    Circuit breaker de proceso.
+
+    Cerrado: todo pasa; `umbral` errores de conexión seguidos lo abren
+    (OperationalError / InterfaceError: los de integridad o de datos no
+    cuentan). Abierto: `proteger()` levanta CircuitoAbierto sin tocar la
+    base, y un hilo daemon ejecuta `sonda()` cada `intervalo` segundos;
+    el primer éxito lo vuelve a cerrar. Ningún request hace de sonda, así
+    que la base que se recupera no recibe ráfagas de tráfico.
+
+    CircuitoAbierto es un DatabaseError: las vistas que ya manejan la base
+    caída no necesitan otro except.
+    """
+
+    ERRORES = (OperationalError, InterfaceError)
+
+    def __init__(self, sonda, umbral=3, intervalo=5.0, nombre='circuito-db'):
+        self.sonda = sonda
+        self.umbral = umbral
+        self.intervalo = intervalo
+        self.nombre = nombre
+        self._lock = threading.Lock()
+        self._fallos = 0
+        self._abierto_desde = None
+        self._hilo = None
+
+    @property
+    def abierto(self):
+        return self._abierto_desde is not None
+
+    @contextmanager
+    def proteger(self):
+        if self.abierto:
+            # Tras un fork el hilo de sonda del padre no existe en el hijo
+            self._asegurar_sonda()
+            raise CircuitoAbierto(f"{self.nombre} abierto desde hace {self.segundos_abierto():.0f}s")
+        try:
+            yield
+        except self.ERRORES:
+            self.registrar_fallo()
+            raise
+        else:
+            self._fallos = 0
+
+    def registrar_fallo(self):
+        with self._lock:
+            self._fallos += 1
+            if self._fallos < self.umbral or self.abierto:
+                return
+            self._abierto_desde = time.monotonic()
+        logger.error("%s: %d errores seguidos, se abre el circuito", self.nombre, self._fallos)
+        self._asegurar_sonda()
+
+    def segundos_abierto(self):
+        inicio = self._abierto_desde
+        return time.monotonic() - inicio if inicio is not None else 0.0
+
+    def cerrar(self):
+        with self._lock:
+            estaba_abierto = self.abierto
+            self._fallos = 0
+            self._abierto_desde = None
+        if estaba_abierto:
+            logger.warning("%s: la base responde, se cierra el circuito", self.nombre)
+
+    def _asegurar_sonda(self):
+        with self._lock:
+            if self._hilo is None or not self._hilo.is_alive():
+                self._hilo = threading.Thread(target=self._sondear, name=self.nombre, daemon=True)
+                self._hilo.start()
+
+    def _sondear(self):
+        while self.abierto:
+            time.sleep(self.intervalo)
+            if not self.abierto:
+                break
+            try:
+                self.sonda()
+            except Exception as exc:
+                logger.info("%s: la sonda falló (%s)", self.nombre, exc)
+                continue
+            self.cerrar()
+
+
+def sondear_base(alias='default'):
+    """SELECT 1 con una conexión propia del hilo, que se cierra al terminar."""
+    conexion = connections[alias]
+    try:
+        with conexion.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    finally:
+        conexion.close()
+
+
+circuito_db = Circuito(
+    sondear_base,
+    umbral=getattr(settings, 'DB_CIRCUITO_UMBRAL', 3),
+    intervalo=getattr(settings, 'DB_CIRCUITO_INTERVALO', 5.0),
+)
@@ -0,0 +1,38 @@
+"""
+WhiteNoise apto para ASGI.
+
+WhiteNoiseMiddleware sólo es sync: bajo ASGI Django ejecuta con
+sync_to_async todo lo que queda debajo de él en MIDDLEWARE (vistas async
+incluidas), así que cada request retiene un hilo de principio a fin.
+Esta subclase también es async: en ese modo sólo pasa por un hilo lo que
+resulta ser un estático (abrir el archivo y armar la respuesta) y el
+resto sigue en el event loop. Bajo WSGI se comporta igual que WhiteNoise.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class WhiteNoiseAsync(WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # DEBUG: find_file busca en disco
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,74 @@
+"""
+Utilidades HTTP compartidas por las apps
+"""
+from functools import wraps
+from inspect import isawaitable
+
+from asgiref.sync import iscoroutinefunction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+
+def etag_condicional(etag_func, privado=False):
+    """
+    Decorador de GET condicional basado en un validador barato.
+
+    `etag_func(request, *args, **kwargs)` calcula el ETag (o None) antes de
+    ejecutar la vista; si coincide con If-None-Match se responde 304 sin
+    consultar, serializar ni renderizar. A diferencia de
+    `django.views.decorators.http.condition`, no agrega ETag a respuestas
+    marcadas como `no-store` (p.ej. el catálogo vacío por base caída), para
+    que el navegador no revalide contra ellas cuando la base vuelva.
+
+    Todas las respuestas llevan `Cache-Control: no-cache` (revalidar
+    siempre) y `private` si dependen del cliente.
+
+    Sirve también para vistas async; en ese caso `etag_func` puede ser
+    sync o async.
+    """
+    def con_etag(response, etag):
+        no_store = 'no-store' in response.get('Cache-Control', '')
+        if etag and response.status_code == 200 and not no_store:
+            response.headers.setdefault('ETag', etag)
+        return response
+
+    def con_cache_control(response):
+        if 'no-store' not in response.get('Cache-Control', ''):
+            if privado:
+                patch_cache_control(response, private=True, no_cache=True)
+            else:
+                patch_cache_control(response, no_cache=True)
+        return response
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def inner(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return await view(request, *args, **kwargs)
+
+                etag = etag_func(request, *args, **kwargs)
+                if isawaitable(etag):
+                    etag = await etag
+                etag = quote_etag(str(etag)) if etag is not None else None
+
+                response = get_conditional_response(request, etag=etag)
+                if response is None:
+                    response = con_etag(await view(request, *args, **kwargs), etag)
+                return con_cache_control(response)
+            return inner
+
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+
+            etag = etag_func(request, *args, **kwargs)
+            etag = quote_etag(str(etag)) if etag is not None else None
+
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = con_etag(view(request, *args, **kwargs), etag)
+            return con_cache_control(response)
+        return inner
+    return decorator
@@ -1,15 +1,388 @@
 """
 Utilidades para procesamiento de imágenes
 """
-from PIL import Image
+from PIL import Image, ImageOps
+import hashlib
 import io
+import logging
+import math
 import os
-from typing import Tuple, Optional
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+from typing import NamedTuple, Tuple, Optional
+from django.conf import settings
 from django.core.files.uploadedfile import UploadedFile
 
+logger = logging.getLogger(__name__)
+
+
+# Guarda contra "bombas" de descompresión: se controla con el encabezado,
+# antes de decodificar. 8K (7680x4320) son ~33 Mpx.
+MAX_PIXELES = 50_000_000
+
+
+class ImagenDemasiadoGrande(ValueError):
+    """La imagen excede el máximo de píxeles permitido"""
+
+
+class ImagenCodificada(NamedTuple):
+    """Resultado de encode_to_budget"""
+    data: bytes
+    image: Image.Image  # imagen efectivamente codificada (puede estar reducida)
+    quality: int
+    encodes: int  # codificaciones a resolución completa
+    sondas: int  # codificaciones de la sonda reducida
+
+
+def encode_to_budget(
+    image: Image.Image,
+    format: str = 'WEBP',
+    max_bytes: int = 3 * 1024 * 1024,
+    quality: int = 80,
+    min_quality: int = 30,
+    min_side: int = 200,
+    probe_side: int = 512,
+    inicial: Optional[bytes] = None,
+    **save_kwargs,
+) -> ImagenCodificada:
+    """
+    Codifica `image` con la mayor calidad posible que entre en `max_bytes`,
+    todo en memoria (el llamador escribe el resultado una sola vez).
+
+    1. Prueba con `quality`: si entra, listo (el caso habitual).
+    2. Busca la calidad por bisección sobre una sonda reducida a
+       `probe_side` px, escalando su tamaño con la relación medida entre
+       imagen completa y sonda; después verifica a resolución completa.
+    3. Si ni `min_quality` entra, reduce dimensiones en proporción a
+       sqrt(presupuesto / tamaño) hasta entrar o llegar a `min_side`.
+
+    Args:
+        image: Imagen ya decodificada (modo compatible con `format`)
+        format: Formato de Pillow ('WEBP', 'JPEG', ...)
+        max_bytes: Presupuesto en bytes
+        inicial: Bytes ya codificados a `quality` (se reutilizan en el paso 1)
+        save_kwargs: Parámetros extra para Image.save (method, optimize...)
+
+    Returns:
+        ImagenCodificada: bytes, imagen usada, calidad y cantidad de codificaciones
+    """
+    contador = {'encodes': 0, 'sondas': 0}
+
+    def encode(img, q, tipo='encodes'):
+        contador[tipo] += 1
+        buffer = io.BytesIO()
+        img.save(buffer, format=format, quality=q, **save_kwargs)
+        return buffer.getvalue()
+
+    def resultado(data, img, q):
+        return ImagenCodificada(data, img, q, contador['encodes'], contador['sondas'])
+
+    data = inicial if inicial is not None else encode(image, quality)
+    if len(data) <= max_bytes:
+        return resultado(data, image, quality)
+
+    # Margen para que la estimación no quede justo en el borde
+    objetivo = max_bytes * 0.97
+
+    # --- Calidad: bisección sobre la sonda, recalibrando con cada medición real ---
+    sonda = image
+    if max(image.size) > probe_side:
+        sonda = image.copy()
+        sonda.thumbnail((probe_side, probe_side), Image.Resampling.BILINEAR)
+    tamanos_sonda = {}
+
+    def tamano_sonda(q):
+        if q not in tamanos_sonda:
+            tamanos_sonda[q] = max(1, len(encode(sonda, q, 'sondas')))
+        return tamanos_sonda[q]
+
+    relacion = len(data) / tamano_sonda(quality)
+    tope = quality - 1
+    while tope >= min_quality:
+        bajo, alto, elegida = min_quality, tope, None
+        while bajo <= alto:
+            medio = (bajo + alto) // 2
+            if tamano_sonda(medio) * relacion <= objetivo:
+                elegida, bajo = medio, medio + 1
+            else:
+                alto = medio - 1
+        if elegida is None:
+            break
+
+        data = encode(image, elegida)
+        if len(data) <= max_bytes:
+            return resultado(data, image, elegida)
+        # La sonda subestimó: ajustar la relación con este punto y seguir más abajo
+        relacion = len(data) / tamano_sonda(elegida)
+        tope = elegida - 1
+
+    # --- Dimensiones: ni la calidad mínima entra ---
+    # El tamaño crece ~ con el área: escalar cada lado por sqrt(objetivo / tamaño)
+    estimado = tamano_sonda(min_quality) * relacion
+    actual = image
+    escala = 1.0
+    while estimado > max_bytes:
+        escala *= math.sqrt(objetivo / estimado)
+        ancho = int(image.width * escala)
+        alto_px = int(image.height * escala)
+        if min(ancho, alto_px) < min_side:
+            break
+        actual = image.resize((ancho, alto_px), Image.Resampling.LANCZOS)
+        data = encode(actual, min_quality)
+        estimado = len(data)
+    if actual is image:
+        data = encode(image, min_quality)
+    return resultado(data, actual, min_quality)
+
+
+# ============================================================
+#  Pipeline único: decode → orient → resize → encode → budget
+# ============================================================
+
+# Parámetros por formato de salida; IMAGEN_FORMATOS en settings.py los
+# pisa clave por clave.
+FORMATOS = {
+    'WEBP': {'extension': 'webp', 'quality': 80, 'min_quality': 30, 'alpha': True, 'save': {'method': 6}},
+    'JPEG': {'extension': 'jpg', 'quality': 85, 'min_quality': 30, 'alpha': False, 'save': {'optimize': True}},
+    'PNG': {'extension': 'png', 'alpha': True, 'save': {'optimize': True}},
+}
+
+# Qué produce cada uso; IMAGEN_PERFILES en settings.py.
+PERFILES = {
+    'producto': {'formato': 'WEBP', 'max_size': (3840, 3840), 'max_bytes': 3 * 1024 * 1024},
+    'web': {'formato': 'JPEG', 'max_size': (1920, 1080), 'max_bytes': 2 * 1024 * 1024},
+}
+
+
+class ImagenProcesada(NamedTuple):
+    """Resultado de ImageProcessor.process"""
+    data: Optional[bytes]  # None si el pipeline no incluye "encode"
+    image: Image.Image  # imagen final (la codificada, si hubo encode)
+    formato: str
+    extension: str
+    quality: Optional[int]
+    tiempos: dict  # etapa -> segundos
+
+
+class ImageProcessor:
+    """
+    Procesa una imagen subida según un perfil de IMAGEN_PERFILES.
+
+    Etapas (cada una es un método `etapa_<nombre>` y se cronometra):
+        decode  abre, rechaza exceso de píxeles y, en JPEG, decodifica
+                reducido con draft()
+        orient  aplica la orientación EXIF
+        resize  reduce a `max_size` (reduce() por bloques + LANCZOS)
+        encode  ajusta el modo (alpha o fondo blanco) y codifica a `quality`
+        budget  si excede `max_bytes`, busca calidad/escala (encode_to_budget)
+
+    `etapas` permite armar pipelines parciales (p. ej. sólo decodificar) y
+    las opciones sueltas pisan las del perfil:
+
+        ImageProcessor('web', max_bytes=1024 * 1024).process(archivo)
+
+    Los tiempos se acumulan por proceso en `ImageProcessor.totales` para
+    que los comandos masivos puedan reportarlos (ver `resumen()`).
+    """
+    ETAPAS = ('decode', 'orient', 'resize', 'encode', 'budget')
+
+    totales = defaultdict(float)
+    procesadas = 0
+
+    def __init__(self, perfil: Optional[str] = None, etapas=None, **opciones):
+        config = {}
+        if perfil is not None:
+            perfiles = getattr(settings, 'IMAGEN_PERFILES', PERFILES)
+            config.update(perfiles[perfil])
+        config.update(opciones)
+
+        formato = config.get('formato', 'WEBP').upper()
+        por_formato = {
+            **FORMATOS.get(formato, {}),
+            **getattr(settings, 'IMAGEN_FORMATOS', {}).get(formato, {}),
+        }
+
+        self.perfil = perfil
+        self.formato = formato
+        self.extension = por_formato.get('extension', formato.lower())
+        self.quality = config.get('quality', por_formato.get('quality', 80))
+        self.min_quality = config.get('min_quality', por_formato.get('min_quality', 30))
+        self.alpha = config.get('alpha', por_formato.get('alpha', False))
+        self.save_kwargs = {**por_formato.get('save', {}), **config.get('save', {})}
+        self.max_size = tuple(config['max_size']) if config.get('max_size') else None
+        self.max_bytes = config.get('max_bytes')
+        self.max_pixeles = config.get(
+            'max_pixeles', getattr(settings, 'IMAGEN_MAX_PIXELES', MAX_PIXELES)
+        )
+
+        self.etapas = tuple(etapas or self.ETAPAS)
+        desconocidas = set(self.etapas) - set(self.ETAPAS)
+        if desconocidas or 'decode' not in self.etapas:
+            raise ValueError(f"Etapas inválidas: {self.etapas}")
+        if 'budget' in self.etapas and 'encode' not in self.etapas:
+            raise ValueError("La etapa 'budget' necesita 'encode'")
+
+    @property
+    def version(self) -> str:
+        """
+        Huella de la configuración de salida: si cambia (calidad, formato,
+        dimensiones, peso...), lo procesado antes quedó desactualizado.
+        """
+        config = (
+            self.formato, self.quality, self.min_quality, self.alpha,
+            sorted(self.save_kwargs.items()), self.max_size, self.max_bytes,
+        )
+        return hashlib.sha1(repr(config).encode()).hexdigest()[:12]
+
+    def descripcion(self) -> str:
+        """Texto para formularios: qué se hace con la imagen subida."""
+        texto = f"La imagen se optimiza y convierte a {self.formato}"
+        if self.max_bytes:
+            texto += f" (máximo {self.max_bytes / (1024 * 1024):g} MB)"
+        return texto
+
+    def process(self, archivo) -> ImagenProcesada:
+        estado = SimpleNamespace(archivo=archivo, image=None, data=None, quality=None)
+        tiempos = {}
+        for etapa in self.etapas:
+            inicio = time.perf_counter()
+            getattr(self, f'etapa_{etapa}')(estado)
+            tiempos[etapa] = time.perf_counter() - inicio
+
+        ImageProcessor.procesadas += 1
+        for etapa, segundos in tiempos.items():
+            ImageProcessor.totales[etapa] += segundos
+        logger.debug(
+            "imagen %s %dx%d: %s", self.perfil, estado.image.width, estado.image.height,
+            ", ".join(f"{e} {s * 1000:.0f}ms" for e, s in tiempos.items()),
+        )
+        return ImagenProcesada(
+            estado.data, estado.image, self.formato, self.extension, estado.quality, tiempos
+        )
+
+    # --- Etapas ---
+
+    def etapa_decode(self, estado):
+        archivo = estado.archivo
+        if hasattr(archivo, 'seek'):
+            archivo.seek(0)
+        img = Image.open(archivo)
+        ancho, alto = img.size
+        if ancho * alto > self.max_pixeles:
+            raise ImagenDemasiadoGrande(
+                f"{ancho}x{alto} supera el máximo de {self.max_pixeles} píxeles"
+            )
+
+        destino = self._destino(img)
+        if destino is not None and img.format == 'JPEG':
+            # El DCT decodifica a 1/2, 1/4 o 1/8; se deja margen de 2x
+            # (como reducing_gap) para que el LANCZOS final conserve detalle
+            img.draft(img.mode, (destino[0] * 2, destino[1] * 2))
+        img.load()
+
+        # Las paletas no se pueden reescalar con LANCZOS
+        if img.mode in ('P', '1'):
+            img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+        estado.image = img
+
+    def etapa_orient(self, estado):
+        if estado.image.getexif().get(0x0112, 1) != 1:
+            estado.image = ImageOps.exif_transpose(estado.image)
+
+    def etapa_resize(self, estado):
+        img = estado.image
+        if self.max_size and (img.width > self.max_size[0] or img.height > self.max_size[1]):
+            img.thumbnail(self.max_size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+    def etapa_encode(self, estado):
+        img = estado.image
+        con_alpha = img.mode in ('RGBA', 'LA', 'PA') or 'transparency' in img.info
+        if con_alpha and self.alpha:
+            img = img.convert('RGBA')
+        elif con_alpha:
+            # Formato sin transparencia: aplanar sobre fondo blanco
+            img = img.convert('RGBA')
+            fondo = Image.new('RGB', img.size, (255, 255, 255))
+            fondo.paste(img, mask=img.split()[-1])
+            img = fondo
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        buffer = io.BytesIO()
+        img.save(buffer, format=self.formato, quality=self.quality, **self.save_kwargs)
+        estado.image = img
+        estado.data = buffer.getvalue()
+        estado.quality = self.quality
+
+    def etapa_budget(self, estado):
+        if not self.max_bytes or len(estado.data) <= self.max_bytes:
+            return
+        codificada = encode_to_budget(
+            estado.image, self.formato, self.max_bytes,
+            quality=self.quality, min_quality=self.min_quality,
+            inicial=estado.data, **self.save_kwargs,
+        )
+        estado.data = codificada.data
+        estado.image = codificada.image
+        estado.quality = codificada.quality
+
+    # --- Auxiliares ---
+
+    def _destino(self, img):
+        """Tamaño final tras resize (teniendo en cuenta la rotación EXIF), o None."""
+        if not self.max_size or 'resize' not in self.etapas:
+            return None
+        ancho, alto = img.size
+        if 'orient' in self.etapas and img.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+            ancho, alto = alto, ancho
+        ratio = min(self.max_size[0] / ancho, self.max_size[1] / alto)
+        if ratio >= 1:
+            return None
+        destino = (max(1, round(ancho * ratio)), max(1, round(alto * ratio)))
+        if (ancho, alto) != img.size:
+            destino = destino[::-1]
+        return destino
+
+    @classmethod
+    def resumen(cls) -> str:
+        """Tiempos acumulados por etapa en este proceso."""
+        if not cls.procesadas:
+            return "0 imágenes procesadas"
+        total = sum(cls.totales.values())
+        etapas = ", ".join(
+            f"{etapa} {cls.totales[etapa]:.2f}s" for etapa in cls.ETAPAS if etapa in cls.totales
+        )
+        return (
+            f"{cls.procesadas} imagen(es): {etapas} | total {total:.2f}s "
+            f"({total / cls.procesadas:.2f}s/imagen)"
+        )
+
+    @classmethod
+    def reiniciar_totales(cls):
+        cls.totales = defaultdict(float)
+        cls.procesadas = 0
+
+
+def abrir_imagen(archivo, max_size: Optional[Tuple[int, int]] = None,
+                 max_pixeles: Optional[int] = None) -> Image.Image:
+    """
+    Decodifica (reducida a `max_size`) y orienta una imagen, sin codificar.
+
+    Raises:
+        ImagenDemasiadoGrande: si supera `max_pixeles`
+    """
+    opciones = {'max_size': max_size}
+    if max_pixeles is not None:
+        opciones['max_pixeles'] = max_pixeles
+    procesador = ImageProcessor(etapas=('decode', 'orient', 'resize'), **opciones)
+    return procesador.process(archivo).image
+
+
 def process_image_for_web(image_file: UploadedFile, max_size_mb: int = 2) -> Tuple[bytes, str]:
     """
-    Procesa una imagen para web: reescala, convierte a WebP y limita el tamaño
+    Procesa una imagen para web con el perfil "web" de IMAGEN_PERFILES:
+    reescala, convierte (JPEG por defecto) y limita el tamaño
     
     Args:
         image_file: Archivo de imagen subido
@@ -18,73 +391,14 @@ def process_image_for_web(image_file: UploadedFile, max_size_mb: int = 2) -> Tup
     Returns:
         Tuple[bytes, str]: (datos_imagen_procesada, nuevo_nombre_archivo)
     """
-    # Abrir imagen con Pillow
-    image = Image.open(image_file)
-    
-    # Convertir a RGB si es necesario (para WebP)
-    if image.mode in ('RGBA', 'LA'):
-        # Para imágenes con transparencia, usar fondo blanco
-        background = Image.new('RGB', image.size, (255, 255, 255))
-        if image.mode == 'RGBA':
-            background.paste(image, mask=image.split()[-1])  # usar canal alpha como máscara
-        else:
-            background.paste(image)
-        image = background
-    elif image.mode != 'RGB':
-        image = image.convert('RGB')
-    
-    # Obtener dimensiones originales
-    original_width, original_height = image.size
+    # Perfil "web" de IMAGEN_PERFILES (JPEG, 1920x1080, fondo blanco)
+    procesada = ImageProcessor('web', max_bytes=max_size_mb * 1024 * 1024).process(image_file)
     
-    # Calcular nuevas dimensiones manteniendo proporción
-    # Máximo 1920px de ancho para pantallas Full HD
-    max_width = 1920
-    max_height = 1080
-    
-    if original_width > max_width or original_height > max_height:
-        # Calcular ratio para mantener proporción
-        ratio = min(max_width / original_width, max_height / original_height)
-        new_width = int(original_width * ratio)
-        new_height = int(original_height * ratio)
-        
-        # Reescalar imagen
-        image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-    
-    # Generar nuevo nombre de archivo con extensión .jpg (más compatible)
+    # Nuevo nombre con la extensión del formato de salida
     original_name = os.path.splitext(image_file.name)[0]
-    new_filename = f"{original_name}.jpg"
-    
-    # Convertir a JPEG con diferentes calidades hasta conseguir tamaño objetivo
-    max_size_bytes = max_size_mb * 1024 * 1024
-    quality = 85
-    
-    while quality >= 30:  # Mínima calidad aceptable
-        buffer = io.BytesIO()
-        image.save(buffer, format='JPEG', quality=quality, optimize=True)
-        image_bytes = buffer.getvalue()
-        
-        if len(image_bytes) <= max_size_bytes:
-            break
-            
-        quality -= 10
+    new_filename = f"{original_name}.{procesada.extension}"
     
-    # Si aún es muy grande, reducir dimensiones
-    if len(image_bytes) > max_size_bytes:
-        scale_factor = 0.8
-        while len(image_bytes) > max_size_bytes and scale_factor > 0.3:
-            current_width, current_height = image.size
-            new_width = int(current_width * scale_factor)
-            new_height = int(current_height * scale_factor)
-            
-            resized_image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-            buffer = io.BytesIO()
-            resized_image.save(buffer, format='JPEG', quality=75, optimize=True)
-            image_bytes = buffer.getvalue()
-            
-            image = resized_image
-            scale_factor -= 0.1
-    
-    return image_bytes, new_filename
+    return procesada.data, new_filename
 
 
 def validate_image_file(image_file: UploadedFile) -> bool:
@@ -102,6 +416,11 @@ def validate_image_file(image_file: UploadedFile) -> bool:
         image = Image.open(image_file)
         image.verify()  # Verificar integridad
         
+        # Rechazar imágenes gigantes antes de que alguien las decodifique
+        max_pixeles = getattr(settings, 'IMAGEN_MAX_PIXELES', MAX_PIXELES)
+        if image.size[0] * image.size[1] > max_pixeles:
+            return False
+        
         # Resetear el puntero del archivo
         image_file.seek(0)
         
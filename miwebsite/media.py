@@ -0,0 +1,170 @@
+"""
+Servido de MEDIA_ROOT (FileSystemStorage) sin un servidor aparte.
+
+- FileResponse: con gunicorn (wsgi.file_wrapper) el archivo sale con
+  sendfile, sin pasar por Python.
+- ETag fuerte (tamaño + mtime) y Last-Modified: 304 con un stat.
+- Range de un solo tramo (206/416), con If-Range.
+- Los nombres por contenido (productos/<sha256[:40]>.webp y sus variantes
+  _<ancho>w) nunca cambian de bytes: `immutable` por un año. El resto
+  (fotos anteriores al hash) se revalida siempre.
+- Con MEDIA_X_ACCEL_PREFIX la vista sólo valida y responde
+  X-Accel-Redirect: nginx manda el archivo desde una location `internal`.
+- Las subidas sin procesar (productos/originales/, cola de TrabajoImagen)
+  no se sirven nunca.
+"""
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+# Ver catalogo.models.nombre_por_contenido / nombre_variante
+NOMBRE_POR_CONTENIDO = re.compile(r'^productos/[0-9a-f]{40}(?:_\d+w)?\.[a-z0-9]+$')
+UN_ANIO = 365 * 24 * 60 * 60
+BLOQUE = 64 * 1024  # lectura por bloque cuando no hay sendfile
+RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Ver catalogo.models.Producto._guardar_original_pendiente
+PREFIJOS_PRIVADOS = ('productos/originales/',)
+
+
+class _Tramo:
+    """
+    Vista de lectura de `largo` bytes de `archivo` a partir de `inicio`.
+
+    Expone fileno() para que el file_wrapper del servidor use sendfile
+    (desde la posición actual y hasta Content-Length); sin sendfile,
+    FileResponse lee con read() y no pasa del final del tramo.
+    """
+
+    def __init__(self, archivo, inicio, largo):
+        archivo.seek(inicio)
+        self._archivo = archivo
+        self._restante = largo
+
+    def read(self, n=-1):
+        if n is None or n < 0 or n > self._restante:
+            n = self._restante
+        data = self._archivo.read(n) if n else b''
+        self._restante -= len(data)
+        return data
+
+    def fileno(self):
+        return self._archivo.fileno()
+
+    def close(self):
+        self._archivo.close()
+
+
+def etag_archivo(estado):
+    return f'"{estado.st_size:x}-{estado.st_mtime_ns:x}"'
+
+
+def parsear_rango(encabezado, tamano):
+    """
+    'bytes=a-b' → (inicio, fin) inclusivos; None si no aplica (sin Range,
+    varios tramos o sintaxis desconocida: se responde el archivo entero);
+    False si no se puede satisfacer (416).
+    """
+    coincidencia = RANGO.match(encabezado.strip()) if encabezado else None
+    if not coincidencia:
+        return None
+    inicio, fin = coincidencia.groups()
+    if not inicio:
+        if not fin:
+            return None
+        # bytes=-N: los últimos N bytes
+        sufijo = int(fin)
+        if sufijo == 0 or tamano == 0:
+            return False
+        return max(0, tamano - sufijo), tamano - 1
+    inicio = int(inicio)
+    fin = min(int(fin), tamano - 1) if fin else tamano - 1
+    if inicio >= tamano or fin < inicio:
+        return False
+    return inicio, fin
+
+
+def _cache_control(response, ruta):
+    if NOMBRE_POR_CONTENIDO.match(ruta):
+        patch_cache_control(response, public=True, max_age=UN_ANIO, immutable=True)
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+
+
+@require_safe
+def servir_media(request, ruta):
+    try:
+        absoluta = safe_join(settings.MEDIA_ROOT, ruta)
+    except SuspiciousFileOperation:
+        raise Http404("Ruta inválida")
+    # Sobre la ruta ya normalizada: productos/x/../originales/ también cuenta
+    relativa = os.path.relpath(absoluta, os.path.abspath(settings.MEDIA_ROOT)).replace(os.sep, '/')
+    if relativa.startswith(PREFIJOS_PRIVADOS):
+        raise Http404("No existe")
+    try:
+        archivo = open(absoluta, 'rb')
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError, PermissionError):
+        raise Http404("No existe")
+
+    try:
+        estado = os.fstat(archivo.fileno())
+        if not stat.S_ISREG(estado.st_mode):
+            raise Http404("No existe")
+
+        etag = etag_archivo(estado)
+        ultima_modificacion = http_date(estado.st_mtime)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=int(estado.st_mtime)
+        )
+        if response is not None:
+            archivo.close()
+            if response.status_code == 304:
+                # RFC 9110 §15.4.5: el 304 repite el ETag del 200
+                response['ETag'] = etag
+            _cache_control(response, ruta)
+            return response
+
+        tipo, codificacion = mimetypes.guess_type(absoluta)
+        if codificacion or not tipo:
+            tipo = 'application/octet-stream'
+
+        rango = None
+        if_range = request.headers.get('If-Range')
+        if if_range is None or if_range in (etag, ultima_modificacion):
+            rango = parsear_rango(request.headers.get('Range'), estado.st_size)
+
+        if rango is False:
+            archivo.close()
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{estado.st_size}'
+        elif getattr(settings, 'MEDIA_X_ACCEL_PREFIX', ''):
+            # nginx resuelve Range por su cuenta con la location interna
+            archivo.close()
+            response = HttpResponse(content_type=tipo)
+            response['X-Accel-Redirect'] = settings.MEDIA_X_ACCEL_PREFIX.rstrip('/') + '/' + ruta
+        elif rango is None:
+            response = FileResponse(archivo, content_type=tipo)
+        else:
+            inicio, fin = rango
+            largo = fin - inicio + 1
+            response = FileResponse(_Tramo(archivo, inicio, largo), content_type=tipo, status=206)
+            response['Content-Length'] = str(largo)
+            response['Content-Range'] = f'bytes {inicio}-{fin}/{estado.st_size}'
+    except BaseException:
+        archivo.close()
+        raise
+
+    response.block_size = BLOQUE
+    response['ETag'] = etag
+    response['Last-Modified'] = ultima_modificacion
+    response['Accept-Ranges'] = 'bytes'
+    _cache_control(response, ruta)
+    return response
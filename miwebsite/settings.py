@@ -1,6 +1,7 @@
 # miwebsite/settings.py
 from pathlib import Path
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -42,8 +43,9 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
 
-    # WhiteNoise para servir estáticos en producción
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # WhiteNoise para servir estáticos en producción (también async, ver
+    # miwebsite/estaticos.py)
+    'miwebsite.estaticos.WhiteNoiseAsync',
 
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -104,6 +106,97 @@ else:
         }
     }
 
+# --- Conexiones a la base ---
+# Por defecto cada hilo del servidor conserva su conexión hasta
+# DB_CONN_MAX_AGE segundos (se evita el handshake TCP + TLS + auth por
+# request) y la verifica antes de reusarla (DB_CONN_HEALTH_CHECKS).
+# DB_POOL=True usa en cambio el pool de psycopg 3 (psycopg[pool]),
+# compartido por los hilos del proceso: con muchos hilos y pocos
+# requests simultáneos abre menos conexiones. Son excluyentes: con pool,
+# CONN_MAX_AGE queda en 0 (Django lo exige).
+# Los timeouts sólo se aplican a PostgreSQL (0 = sin límite).
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', '60'))
+DB_CONN_HEALTH_CHECKS = os.getenv('DB_CONN_HEALTH_CHECKS', 'True').lower() in ('true', '1', 't')
+DB_POOL = os.getenv('DB_POOL', 'False').lower() in ('true', '1', 't')
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '2'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))  # espera por una conexión libre (s)
+DB_CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', '5'))  # s
+DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', '15000'))  # ms
+
+# Circuit breaker de la home y api_productos (miwebsite.db.circuito_db):
+# tras DB_CIRCUITO_UMBRAL errores de conexión seguidos dejan de consultar
+# y sirven el último catálogo bueno; un hilo prueba la base cada
+# DB_CIRCUITO_INTERVALO segundos hasta que responde.
+DB_CIRCUITO_UMBRAL = int(os.getenv('DB_CIRCUITO_UMBRAL', '3'))
+DB_CIRCUITO_INTERVALO = float(os.getenv('DB_CIRCUITO_INTERVALO', '5'))
+
+# Perfil ASGI (ver miwebsite/asgi.py): con VISTAS_ASYNC las APIs de
+# votos, comentarios y api_productos se enrutan a sus variantes async
+# (catalogo.views_async, bienvenida.views_async). Bajo WSGI conviene
+# dejarlo en False: Django correría cada vista async en su propio loop.
+VISTAS_ASYNC = os.getenv('VISTAS_ASYNC', 'False').lower() in ('true', '1', 't')
+
+_db = DATABASES['default']
+_db['CONN_HEALTH_CHECKS'] = DB_CONN_HEALTH_CHECKS
+_db['CONN_MAX_AGE'] = 0 if DB_POOL else DB_CONN_MAX_AGE
+if _db['ENGINE'] == 'django.db.backends.postgresql':
+    _opciones = _db.setdefault('OPTIONS', {})
+    if DB_CONNECT_TIMEOUT:
+        _opciones.setdefault('connect_timeout', DB_CONNECT_TIMEOUT)
+    if DB_STATEMENT_TIMEOUT:
+        # Corta consultas colgadas antes que el timeout del worker de gunicorn
+        _opciones['options'] = f"{_opciones.get('options', '')} -c statement_timeout={DB_STATEMENT_TIMEOUT}".strip()
+    if DB_POOL:
+        _opciones['pool'] = {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+        }
+
+# --- Caché ---
+# `catalogo` guarda contadores de votos y voto por cliente (ver catalogo/cache.py).
+# Por defecto memoria local del proceso, acotada por TTL y MAX_ENTRIES; con
+# varios workers usar un backend compartido, p.ej.:
+#   CATALOGO_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+#   CATALOGO_CACHE_LOCATION=redis://localhost:6379/1
+# procesar_imagenes, reprocess_images e import_catalogo lo exigen (salvo
+# --cache-local): la versión del catálogo que incrementan tiene que verse
+# en los procesos web.
+CATALOGO_CACHE_BACKEND = os.getenv(
+    'CATALOGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+)
+CATALOGO_CACHE_OPTIONS = {}
+if CATALOGO_CACHE_BACKEND.rsplit('.', 1)[-1] in ('LocMemCache', 'FileBasedCache', 'DatabaseCache'):
+    CATALOGO_CACHE_OPTIONS['MAX_ENTRIES'] = int(os.getenv('CATALOGO_CACHE_MAX_ENTRIES', '10000'))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalogo': {
+        'BACKEND': CATALOGO_CACHE_BACKEND,
+        'LOCATION': os.getenv('CATALOGO_CACHE_LOCATION', 'catalogo'),
+        'TIMEOUT': int(os.getenv('CATALOGO_CACHE_TTL', '300')),
+        'KEY_PREFIX': 'catalogo',
+        'OPTIONS': CATALOGO_CACHE_OPTIONS,
+    },
+}
+
+# Workers web por instancia (gunicorn toma WEB_CONCURRENCY como valor por
+# defecto de --workers; Render lo define). Con más de uno y `catalogo` en
+# LocMemCache, las versiones del catálogo y de los comentarios son por
+# proceso: catalogo/checks.py lo avisa al arrancar.
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))
+
+# Identificador del deploy: entra en el ETag de la home y en la clave de la
+# grilla cacheada, así que un cambio de templates o estáticos no sigue
+# respondiendo 304 con el HTML viejo. Render define RENDER_GIT_COMMIT; sin
+# ninguno de los dos, cada arranque cuenta como un deploy nuevo.
+VERSION_DEPLOY = (
+    os.getenv('VERSION_DEPLOY') or os.getenv('RENDER_GIT_COMMIT') or str(int(time.time()))
+)[:12]
+
 # --- Password validators ---
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -142,6 +235,61 @@ STORAGES = {
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Django sirve /media/ (miwebsite/media.py: sendfile, Range, ETag). Con
+# nginx delante, MEDIA_X_ACCEL_PREFIX apunta a una location `internal`
+# con `alias` a MEDIA_ROOT y la vista sólo responde X-Accel-Redirect.
+MEDIA_SERVIR = os.getenv('MEDIA_SERVIR', 'True').lower() in ('true', '1', 't')
+MEDIA_X_ACCEL_PREFIX = os.getenv('MEDIA_X_ACCEL_PREFIX', '')
+
+# Procesamiento de imágenes fuera del request: el admin sólo guarda la
+# subida y `python manage.py procesar_imagenes` hace la conversión.
+CATALOGO_IMAGENES_ASYNC = os.getenv('CATALOGO_IMAGENES_ASYNC', 'False').lower() in ('true', '1', 't')
+
+# Los archivos que dejan de usarse se borran del storage después del
+# COMMIT, por lotes, en un hilo aparte (catalogo.almacenamiento). False
+# los borra en el mismo on_commit (útil en tests y scripts).
+CATALOGO_BORRADO_DIFERIDO = os.getenv('CATALOGO_BORRADO_DIFERIDO', 'True').lower() in ('true', '1', 't')
+
+# Último catálogo activo que se leyó bien de la base (catalogo.respaldo):
+# se sirve mientras la base está caída. Por defecto vive en la memoria de
+# cada proceso; con una ruta (p.ej. /var/tmp/miweb-catalogo.json) se
+# guarda también en disco, la comparten los workers y sobrevive a un
+# reinicio.
+CATALOGO_RESPALDO_ARCHIVO = os.getenv('CATALOGO_RESPALDO_ARCHIVO', '')
+CATALOGO_RESPALDO_MAX = int(os.getenv('CATALOGO_RESPALDO_MAX', '1000'))
+
+# La acción "eliminar" del admin borra en el request hasta esta cantidad
+# de productos; con más, los oculta y los borra en segundo plano.
+CATALOGO_ADMIN_BORRADO_MAX = int(os.getenv('CATALOGO_ADMIN_BORRADO_MAX', '200'))
+
+# Lado máximo de la imagen principal (4K) y tope de píxeles aceptados en
+# una subida; se controla con el encabezado, antes de decodificar.
+CATALOGO_IMAGEN_MAX_LADO = int(os.getenv('CATALOGO_IMAGEN_MAX_LADO', '3840'))
+IMAGEN_MAX_PIXELES = int(os.getenv('IMAGEN_MAX_PIXELES', '50000000'))
+
+# Pipeline de imágenes (miwebsite.image_utils.ImageProcessor)
+# Parámetros por formato de salida: calidad inicial y mínima para la
+# búsqueda por presupuesto, si conserva transparencia y kwargs de Pillow.
+IMAGEN_FORMATOS = {
+    'WEBP': {'quality': 80, 'min_quality': 30, 'alpha': True, 'save': {'method': 6}},
+    'JPEG': {'quality': 85, 'min_quality': 30, 'alpha': False, 'save': {'optimize': True}},
+}
+# Perfiles: qué formato, dimensiones y peso máximo produce cada uso.
+#   producto → Producto.save / cola de imágenes / formularios del catálogo
+#   web      → image_utils.process_image_for_web
+IMAGEN_PERFILES = {
+    'producto': {
+        'formato': 'WEBP',
+        'max_size': (CATALOGO_IMAGEN_MAX_LADO, CATALOGO_IMAGEN_MAX_LADO),
+        'max_bytes': 3 * 1024 * 1024,
+    },
+    'web': {
+        'formato': 'JPEG',
+        'max_size': (1920, 1080),
+        'max_bytes': 2 * 1024 * 1024,
+    },
+}
+
 # ==========================
 # Límites de tamaño de subida (3 MB)
 # ==========================
@@ -21,6 +21,8 @@ from django.views.generic import TemplateView
 from django.conf import settings
 import os
 
+from miwebsite.media import servir_media
+
 def robots_txt(request):
     robots_path = os.path.join(settings.BASE_DIR, 'robots.txt')
     with open(robots_path, 'r') as f:
@@ -43,4 +45,9 @@ urlpatterns = [
     path('sitemap.xml', sitemap_xml, name='sitemap_xml'),
 ]
 
-# Nota: El proyecto usa MinIO/S3 para media; no se sirve /media/ desde el filesystem local.
+# Media desde MEDIA_ROOT (FileSystemStorage); ver miwebsite/media.py.
+# Con un proxy que ya sirve /media/, desactivar con MEDIA_SERVIR=False.
+if settings.MEDIA_SERVIR:
+    urlpatterns += [
+        path(f"{settings.MEDIA_URL.lstrip('/')}<path:ruta>", servir_media, name='media'),
+    ]